@@ -21,6 +21,27 @@ class ApplicationConfig:
     SOLR_PORT = 10196
     SOLR_PATH = '../../../solr-9.3.0/'
     SOLR_CORES = []
+    SOLR_POOL_SIZE = 10
+    SOLR_TIMEOUT = 120
+    SOLR_MAX_RETRIES = 3
+    SOLR_RETRY_BACKOFF = 0.5
+    SOLR_QUERY_PARALLELISM = 6
+    SOLR_QUERY_DEADLINE = 120
+    SOLR_GZIP_REQUESTS = False
+    SOLR_GZIP_MIN_BYTES = 4096
+    SOLR_COMBINED_FACETS = True
+    SOLR_COMBINED_FACETS_MAX_COST = 250
+    SOLR_VECTORISED_REPORTS = True
+    SOLR_TOPIC_SAMPLING = 'stratified'
+    EMBEDDING_STORE_ENABLED = True
+    EMBEDDING_STORE_DIR = '../../.embeddingStore'
+    SEARCH_CACHE_ENABLED = True
+    SEARCH_CACHE_MAX_BYTES = 256 * 1024 * 1024
+    SEARCH_CACHE_DIR = None
+    SEARCH_CACHE_DISK_MAX_BYTES = 2 * 1024 * 1024 * 1024
+    JOBS_MAX_WORKERS = 2
+    JOBS_MAX_PER_USER = 2
+    JOBS_RESULT_TTL = 900
     SOLR_NETWORKS = {'reply': {'field': 'repliesTimes', 'time': True},
         'retweet': {'field': 'retweetTimes', 'time': True}}
     SOLR_COMMUNITIES = {'reply': {'interactionCommunity': 'replyCommunity',
@@ -73,6 +94,38 @@ class ApplicationConfig:
     SNA_THRESHOLD = 1
     LIMITED_RESOURCE = False
     BATCH_SIZE = 100
+    UPDATER_QUEUE_SIZE = 4
+    UPDATER_CHECKPOINT_DIR = '../.checkpoints'
+    SENTIMENT_UPDATER_WORKERS = 2
+    SENTIMENT_BATCH_SIZE = 32
+    SENTIMENT_MAX_BATCH_TOKENS = 8192
+    SENTIMENT_TORCH_THREADS = 0
+    SENTIMENT_BACKEND = 'torch'
+    SENTIMENT_ONNX_DIR = '../../.onnxModels'
+    SENTIMENT_ONNX_THREADS = 0
+    SENTIMENT_CACHE_ENABLED = True
+    SENTIMENT_CACHE_PATH = '../../.sentimentCache/predictions.db'
+    SENTIMENT_CACHE_MAX_ENTRIES = 5000000
+    LOCATION_CACHE_SIZE = 100000
+    LOCATION_STORE_ENABLED = True
+    LOCATION_STORE_PATH = '../../.locationStore/locations.db'
+    LOCATION_GAZETTEER_PATH = './resources/gazetteer.bin'
+    LANGUAGE_LOW_MEMORY = False
+    LANGUAGE_BATCH_SIZE = 1024
+    LANGUAGE_CACHE_SIZE = 200000
+    DESCRIPTION_CACHE_SIZE = 100000
+    EXTRACTION_WORKERS = 1
+    EXTRACTION_CHUNK_SIZE_MB = 256
+    EXTRACTION_MAX_TASKS_PER_WORKER = 32
+    EXTRACTION_JOIN_ENABLED = True
+    EXTRACTION_JOIN_KEEP_STORE = False
+    EXTRACTION_JOIN_STORE_PATH = None
+    EXTRACTION_JOIN_LINK_MAX_RUNS = 3
+    EXTRACTION_STREAM_TO_SOLR = False
+    EXTRACTION_SOLR_BATCH_SIZE = 50000
+    EXTRACTION_SOLR_QUEUE_SIZE = 2
+    EXTRACTION_SOLR_MAX_FAILED = 100000
+    EXTRACTION_SOLR_ARCHIVE = True
 
 
 class ApplicationPaths:
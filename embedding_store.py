@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+from configs import ApplicationConfig
+import os
+import json
+import time
+import threading
+import numpy as np
+from os.path import join, exists
+from utils import create_logger
+logger = create_logger(f"Embedding Store", file=f"solr_class")
+
+"""This file contains the per-core embedding store used by the topic modelling. The 5D and 2D embeddings of a core are
+kept as float32 matrices in .npy files, next to the sorted array of the document ids that indexes their rows. The files
+are memory-mapped by the readers (the Flask API), so that gathering the vectors of a set of ids only reads their rows.
+The store is written by 5_import_embeddings_to_solr.py each time it imports embeddings into Solr. Each write publishes
+a new version of the files through an atomically replaced manifest, so readers never see a partially written store.
+"""
+
+EMBEDDING_FIELDS = {'embedding_5d': 5, 'embedding_2d': 2}
+
+
+class EmbeddingStore:
+    """ Memory-mapped embedding matrices of a Solr core, indexed by document id.
+    """
+
+    def __init__(self, core, store_dir=None):
+        """ Initialises the store of a core. Nothing is read until the store is used.
+
+        Args:
+            :core: (str) Name of the Solr core.
+            :store_dir: (str, optional) Root folder of the stores. Defaults to EMBEDDING_STORE_DIR.
+        """
+        self.core = core
+        self.path = join(store_dir or ApplicationConfig.EMBEDDING_STORE_DIR, core)
+        self._lock = threading.Lock()
+        self._version = None
+        self._ids = None
+        self._matrices = dict()
+
+    def _file_path(self, name, version):
+        return join(self.path, f"{name}.{version}.npy")
+
+    def _read_manifest(self):
+        try:
+            with open(join(self.path, 'manifest.json'), 'r') as fin:
+                return json.load(fin)
+        except Exception:
+            return None
+
+    def load(self):
+        """ Maps the current version of the store, if it changed since it was last mapped.
+
+        Returns:
+            :bool: Whether the store exists.
+        """
+        manifest = self._read_manifest()
+        if manifest is None:
+            return False
+        with self._lock:
+            if manifest['version'] != self._version:
+                version = manifest['version']
+                self._ids = np.load(self._file_path('ids', version), mmap_mode='r')
+                self._matrices = {field: np.load(self._file_path(field, version), mmap_mode='r') for field in EMBEDDING_FIELDS}
+                self._version = version
+                logger.info(f"Embedding store of {self.core} mapped: {len(self._ids)} documents (version {version})")
+        return True
+
+    def __len__(self):
+        return 0 if self._ids is None else len(self._ids)
+
+    def gather(self, ids):
+        """ Gathers the embeddings of the given documents.
+
+        Args:
+            :ids: (list[str]) The document ids.
+
+        Returns:
+            :tuple: A boolean array telling which ids are in the store, and a dictionary with the float32 matrix of \
+                each embedding field (one row per id found, in the order of the ids).
+        """
+        with self._lock:
+            store_ids, matrices = self._ids, self._matrices
+        ids = np.asarray(ids, dtype=str)
+        if store_ids is None or len(store_ids) == 0 or len(ids) == 0:
+            return np.zeros(len(ids), dtype=bool), {field: np.empty((0, dim), dtype=np.float32) for field, dim in EMBEDDING_FIELDS.items()}
+        rows = np.minimum(np.searchsorted(store_ids, ids), len(store_ids) - 1)
+        found = store_ids[rows] == ids
+        rows = rows[found]
+        return found, {field: np.asarray(matrix[rows]) for field, matrix in matrices.items()}
+
+    def update(self, ids, embeddings):
+        """ Merges embeddings into the store (replacing the vectors of the ids already stored) and publishes the \
+        result as a new version.
+
+        Args:
+            :ids: (list[str]) The document ids. For repeated ids, the first occurrence is kept.
+            :embeddings: (dict) The vectors of each embedding field, as sequences aligned with the ids.
+
+        Returns:
+            :int: The number of documents in the store.
+        """
+        if not exists(self.path):
+            os.makedirs(self.path)
+        new_ids, first = np.unique(np.asarray(ids, dtype=str), return_index=True)
+        merged = {field: np.asarray(list(embeddings[field]), dtype=np.float32).reshape(-1, dim)[first] for field, dim in EMBEDDING_FIELDS.items()}
+        old_version = self._version if self.load() else None
+        if old_version is not None:
+            keep = ~np.isin(self._ids, new_ids)
+            merged_ids = np.concatenate([np.asarray(self._ids[keep]), new_ids])
+            order = np.argsort(merged_ids, kind='stable')
+            merged_ids = merged_ids[order]
+            merged = {field: np.concatenate([np.asarray(self._matrices[field][keep]), merged[field]])[order] for field in EMBEDDING_FIELDS}
+        else:
+            merged_ids = new_ids
+
+        version = max(int(time.time() * 1000), (old_version or 0) + 1)
+        np.save(self._file_path('ids', version), merged_ids)
+        for field in EMBEDDING_FIELDS:
+            np.save(self._file_path(field, version), np.ascontiguousarray(merged[field]))
+        tmp_path = join(self.path, f"manifest.json.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as fout:
+            json.dump({'version': version, 'documents': int(len(merged_ids)), 'fields': EMBEDDING_FIELDS}, fout)
+        os.replace(tmp_path, join(self.path, 'manifest.json'))
+
+        # Files of older versions can be removed: the readers that mapped them keep them open until they reload.
+        for file_name in os.listdir(self.path):
+            if file_name.endswith('.npy') and not file_name.endswith(f".{version}.npy"):
+                os.remove(join(self.path, file_name))
+        self.load()
+        logger.info(f"Embedding store of {self.core} updated: {len(merged_ids)} documents (version {version})")
+        return len(merged_ids)
+
+
+_embedding_stores = dict()
+_embedding_stores_lock = threading.Lock()
+
+
+def get_embedding_store(core):
+    """ Returns the process-wide embedding store of a core, mapping its latest version.
+
+    Args:
+        :core: (str) Name of the Solr core.
+
+    Returns:
+        :EmbeddingStore: The store, or None if the store is disabled or the core has no store.
+    """
+    if not ApplicationConfig.EMBEDDING_STORE_ENABLED:
+        return None
+    with _embedding_stores_lock:
+        if core not in _embedding_stores:
+            _embedding_stores[core] = EmbeddingStore(core)
+        store = _embedding_stores[core]
+    try:
+        return store if store.load() else None
+    except Exception as exp:
+        logger.warning(f"Embedding store of {core} could not be loaded: {exp}")
+        return None
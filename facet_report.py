@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+import numpy as np
+import pandas as pd
+from operator import itemgetter
+
+"""This file contains the columnar post-processing of the facets of the search report. Each function produces exactly the
+same report entries as the corresponding loop-based method of SolrClass (compute_positive_negative and get_all_languages),
+but turns the bucket lists into arrays once and computes the sums, ratios and top-n selections with numpy.
+"""
+
+get_val = itemgetter('val')
+get_count = itemgetter('count')
+
+LOCATION_FEATURES = ['users_locations_by_sentiments', 'tweets_locations_by_sentiments', 'users_languages_by_sentiments', 'tweets_languages_by_sentiments']
+
+
+def buckets_to_columns(report_object, groups):
+    """ Concatenates the bucket lists of the given groups (e.g. sentiments) into columns.
+
+    Args:
+        :report_object: (dict[list]) The bucket lists ({'val', 'count'}) per group.
+        :groups: (list[str]) The groups to concatenate, in order.
+
+    Returns:
+        :tuple: The group of each bucket, the index of its value in the unique values (in order of first appearance), \
+            its count, and the unique values.
+    """
+    bucket_groups, vals, counts = [], [], []
+    for group in groups:
+        try:
+            group_vals = list(map(get_val, report_object[group]))
+            group_counts = list(map(get_count, report_object[group]))
+        except Exception:
+            continue
+        if len(set(group_vals)) < len(group_vals):
+            # Same as building a dict per group: a repeated value keeps its first position and its last count.
+            group_buckets = dict(zip(group_vals, group_counts))
+            group_vals, group_counts = list(group_buckets.keys()), list(group_buckets.values())
+        bucket_groups += [group] * len(group_vals)
+        vals += group_vals
+        counts += group_counts
+    codes, uniques = pd.factorize(np.array(vals, dtype=object), sort=False)
+    return np.array(bucket_groups, dtype=object), codes, np.array(counts, dtype=np.int64), uniques
+
+
+def top_n_items(uniques, values, top_n, reverse=True, mutliply_by=1):
+    """ Returns the top n values as sort_dict_with_names does, i.e. sorted by value (ties kept in order of first \
+    appearance), as a list of {'val', 'count'} dicts.
+
+    Args:
+        :uniques: (np.ndarray) The values, in order of first appearance.
+        :values: (np.ndarray) The value of each of them.
+        :top_n: (int) The number of top values to be returned.
+        :reverse: (bool, optional) Whether to return the largest (True) or smallest (False) values.
+        :mutliply_by: (int, optional) A factor applied to the returned values.
+
+    Returns:
+        :list[dict]: The top n values.
+    """
+    order = np.argsort(-values if reverse else values, kind='stable')[:min(len(values), top_n)]
+    counts = (values[order] * mutliply_by).tolist() if mutliply_by != 1 else values[order].tolist()
+    return [{'val': val, 'count': count} for val, count in zip(uniques[order].tolist(), counts)]
+
+
+def first_counts(buckets):
+    """ Maps each value of a bucket list to the count of its first bucket.
+    """
+    return dict(zip(map(get_val, reversed(buckets)), map(get_count, reversed(buckets))))
+
+
+def compute_positive_negative(report_object, feature, top_n):
+    """ Columnar version of SolrClass.compute_positive_negative: computes the counts for all sentiments and the \
+    relative positive to negative counts (pos_neg = (v(pos) - v(neg)) / (v(pos) + v(neu) + v(neg))) of a feature.
+
+    Args:
+        :report_object: (dict[dict]) Part of the report object that holds the sentiments for each feature.
+        :feature: (str) Feature name.
+        :top_n: (int) Length of the returned list of each sorted items.
+    """
+    sentiments = [s for s in report_object if len(report_object[s]) > 0 and s not in ['All Sentiments', 'Positive_Negative']]
+    bucket_sentiments, codes, counts, uniques = buckets_to_columns(report_object, sentiments)
+
+    all_counts = np.zeros(len(uniques), dtype=np.int64)
+    np.add.at(all_counts, codes, counts)
+
+    polar = (bucket_sentiments == "Positive") | (bucket_sentiments == "Negative")
+    polar_codes = pd.unique(codes[polar])
+    signed = np.where(bucket_sentiments == "Negative", -counts, counts)
+    polar_counts = np.zeros(len(uniques), dtype=np.int64)
+    np.add.at(polar_counts, codes[polar], signed[polar])
+    ratios = polar_counts[polar_codes] / all_counts[polar_codes]
+
+    report_object['All Sentiments'] = top_n_items(uniques, all_counts, top_n)
+    report_object['Positive_Negative'] = top_n_items(uniques[polar_codes], ratios, top_n)
+    if feature not in LOCATION_FEATURES:
+        report_object['Negative_Positive'] = top_n_items(uniques[polar_codes], ratios, top_n, reverse=False, mutliply_by=-1)
+        if 'Negative' in report_object:
+            negative_counts = first_counts(report_object['Negative'])
+            for item in report_object['Negative_Positive']:
+                if item['val'] in negative_counts:
+                    item['count'] = negative_counts[item['val']]
+
+    if feature in ['processedTokens'] and 'Positive' in report_object:
+        positive_counts = first_counts(report_object['Positive'])
+        for item in report_object['Positive_Negative']:
+            if item['val'] in positive_counts:
+                item['count'] = positive_counts[item['val']]
+
+
+def get_all_languages(report_object, top_n):
+    """ Columnar version of SolrClass.get_all_languages: computes the counts of a feature for all languages.
+
+    Args:
+        :report_object: (dict[dict]) Part of the report that holds the languages for each sentiment.
+        :top_n: (int) Length of the returned list of each sorted items.
+    """
+    languages = [s for s in report_object if len(s) > 0 and s != 'All Languages']
+    _, codes, counts, uniques = buckets_to_columns(report_object, languages)
+    all_counts = np.zeros(len(uniques), dtype=np.int64)
+    np.add.at(all_counts, codes, counts)
+    report_object['All Languages'] = top_n_items(uniques, all_counts, top_n)
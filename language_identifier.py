@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+from configs import ApplicationConfig
+import re
+import time
+import threading
+from collections import OrderedDict
+
+"""This file contains the language identification shared by the data extraction, the sentiment updater and the
+location API. The fastText model of ftlangdetect is loaded once per process, the texts are cleaned by a single
+precompiled regular expression, and they are identified in batches (one call to the model per batch instead of one
+per text). The identified language of the most recent cleaned texts is kept in an LRU cache, as retweets and copies
+of the same text are frequent.
+"""
+
+# One pass equivalent to the original cleaning: the https urls, then the mentions, then the numbers are replaced by
+# spaces, and the spaces, tabs and new lines are collapsed. A mention directly followed by an url keeps its "@", as
+# the url was removed first.
+CLEANER = re.compile('(?:[\n\t ]|http[s]:[^\b \n\t]+|@(?!http[s]:[^\b \n\t])[^\b \n\t]+|[0-9]+)+')
+LABEL_PREFIX = '__label__'
+NON_TEXT = 'NonText'
+ERROR = 'lang'
+
+
+def clean_text(text):
+    """ Cleans a text before its language is identified: removes the urls, mentions and numbers.
+
+    Args:
+        :text: (str) The text.
+
+    Returns:
+        :str: The cleaned text.
+    """
+    return CLEANER.sub(' ', text).strip()
+
+
+class LanguageIdentifier:
+    """ Identifies the language of lists of texts with the fastText model of ftlangdetect.
+    """
+
+    def __init__(self, low_memory=False, batch_size=1024, cache_size=0):
+        """ Initialises the identifier. The model is loaded on first use.
+
+        Args:
+            :low_memory: (bool, optional) Whether to use the compressed model. Defaults to False (as get_language did).
+            :batch_size: (int, optional) Maximum number of texts per call to the model. Defaults to 1024.
+            :cache_size: (int, optional) Number of cleaned texts whose language is cached (0 disables the cache). \
+                Defaults to 0.
+        """
+        self.low_memory = low_memory
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.model = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_model(self):
+        """ Returns the fastText model, loading (and downloading) it on first use. """
+        if self.model is None:
+            with self._lock:
+                if self.model is None:
+                    from ftlangdetect.detect import get_or_load_model
+                    self.model = get_or_load_model(low_memory=self.low_memory)
+        return self.model
+
+    def _predict(self, texts):
+        """ Identifies the languages of texts without new lines, with one call to the model per batch. Falls back to \
+        one call per text if a batch fails, so that only the faulty texts get no language.
+
+        Returns:
+            :list: The (language code, score) of each text, or None if it could not be identified.
+        """
+        try:
+            model = self.get_model()
+        except Exception as exp:
+            print(f'The language identification model could not be loaded: {exp}')
+            time.sleep(1)
+            return [None] * len(texts)
+        results = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            try:
+                labels, scores = model.predict(batch)
+                results += [(label[0].replace(LABEL_PREFIX, ''), min(float(score[0]), 1.0)) for label, score in zip(labels, scores)]
+            except Exception as exp:
+                print(f'Language identification of a batch failed, identifying its texts one by one: {exp}')
+                time.sleep(1)
+                for text in batch:
+                    try:
+                        labels, scores = model.predict(text)
+                        results.append((labels[0].replace(LABEL_PREFIX, ''), min(float(scores[0]), 1.0)))
+                    except Exception as exp:
+                        print(exp)
+                        results.append(None)
+        return results
+
+    def detect_many(self, texts, clean=True):
+        """ Identifies the languages of a list of texts, like ftlangdetect.detect.
+
+        Args:
+            :texts: (list[str]) The texts.
+            :clean: (bool, optional) Whether to clean the texts first (see clean_text). Texts with less than two \
+                characters once cleaned are not identified. Defaults to True.
+
+        Returns:
+            :list: The {'lang': code, 'score': score} of each text, or None if it is not a text, is too short or \
+                could not be identified.
+        """
+        keys = [None] * len(texts)
+        for i, text in enumerate(texts):
+            if not isinstance(text, str):
+                continue
+            if clean:
+                text = clean_text(text)
+                if len(text) <= 1:
+                    continue
+            if '\n' not in text:
+                keys[i] = text
+
+        found = dict()
+        if self.cache_size > 0:
+            with self._lock:
+                for key in keys:
+                    if key is not None and key in self._cache:
+                        self._cache.move_to_end(key)
+                        found[key] = self._cache[key]
+        # Each distinct text is identified once.
+        missing = list(dict.fromkeys(key for key in keys if key is not None and key not in found))
+        if len(missing) > 0:
+            predicted = dict(zip(missing, self._predict(missing)))
+            found.update(predicted)
+            if self.cache_size > 0:
+                with self._lock:
+                    for key, result in predicted.items():
+                        if result is not None:
+                            self._cache[key] = result
+                            self._cache.move_to_end(key)
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+        return [None if key is None or found[key] is None else {'lang': found[key][0], 'score': found[key][1]} for key in keys]
+
+    def get_languages(self, texts):
+        """ Identifies the languages of a list of texts, as named in the platform (ApplicationConfig.LANGUAGE_DICT).
+
+        Args:
+            :texts: (list[str]) The texts, e.g. the fullText of tweets.
+
+        Returns:
+            :list[str]: The language of each text (e.g. 'english' or 'spanish'), 'NonText' for the texts with less \
+                than two characters once cleaned, or 'lang' if the language could not be identified.
+        """
+        languages = []
+        for text, result in zip(texts, self.detect_many(texts)):
+            if result is not None:
+                languages.append(ApplicationConfig.LANGUAGE_DICT.get(result['lang'], result['lang']))
+            elif isinstance(text, str) and len(clean_text(text)) <= 1:
+                languages.append(NON_TEXT)
+            else:
+                languages.append(ERROR)
+        return languages
+
+    def get_language(self, text):
+        """ Identifies the language of a single text (see get_languages). """
+        return self.get_languages([text])[0]
+
+
+_identifier = None
+_identifier_lock = threading.Lock()
+
+
+def get_language_identifier():
+    """ Returns the language identifier of the process, created on first use from the configuration.
+
+    Returns:
+        :LanguageIdentifier: The identifier.
+    """
+    global _identifier
+    if _identifier is None:
+        with _identifier_lock:
+            if _identifier is None:
+                _identifier = LanguageIdentifier(low_memory=ApplicationConfig.LANGUAGE_LOW_MEMORY,
+                                                 batch_size=ApplicationConfig.LANGUAGE_BATCH_SIZE,
+                                                 cache_size=ApplicationConfig.LANGUAGE_CACHE_SIZE)
+    return _identifier
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+from configs import ApplicationConfig
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from os.path import join, exists, dirname
+
+"""This file contains the persistent dictionary of resolved locations, shared by the location API and the location
+updater (3_update_locations.py). The free-text locations of users repeat heavily, so each distinct string is only
+resolved once by the location mapper: the API stores the country of every string it resolves in a SQLite database, and
+both the API and the updater look strings up there before resolving them. The database records the fingerprint of the
+resources (and matcher) its countries come from; the API clears it when it starts with different resources.
+
+It also contains the rules that turn the user and place strings of a tweet into its user and tweet locations, so that
+the API and the updater derive them in the same way.
+"""
+
+NOT_AVAILABLE = 'not_available'
+LOOKUP_CHUNK = 500
+
+
+def resources_fingerprint(resources_dir, matcher):
+    """ Computes the fingerprint of the location resources.
+
+    Args:
+        :resources_dir: (str) Folder of the JSON resources of the location mapper.
+        :matcher: (str) Name and version of the matching, as the same resources give different countries with \
+            different matchers.
+
+    Returns:
+        :str: The hexadecimal digest of the names and contents of the resources, and of the matcher.
+    """
+    digest = hashlib.sha256(matcher.encode('utf-8'))
+    for file_name in sorted(os.listdir(resources_dir)):
+        if file_name.endswith('.json'):
+            digest.update(file_name.encode('utf-8'))
+            with open(join(resources_dir, file_name), 'rb') as fin:
+                digest.update(fin.read())
+    return digest.hexdigest()
+
+
+def user_level_location(given, resolve):
+    """ Returns the location of the user of a tweet, from the location field of the user object.
+
+    Args:
+        :given: (str) The location field of the user.
+        :resolve: (callable) Maps a location string to a country.
+
+    Returns:
+        :str: The country, or 'not_available'.
+    """
+    if given is None or str(given) == 'nan' or len(given) < 2:
+        return NOT_AVAILABLE
+    return resolve(given)
+
+
+def tweet_level_location(tweet, resolve):
+    """ Returns the location of a tweet, from the country (or else the full name) of its place.
+
+    Args:
+        :tweet: (dict) The tweet, with its place object.
+        :resolve: (callable) Maps a location string to a country.
+
+    Returns:
+        :str: The country, or 'not_available'.
+    """
+    location = NOT_AVAILABLE
+    if tweet == None or 'place' not in tweet.keys():
+        return location
+    for field in ['country', 'placeFullName']:
+        if field in tweet['place'].keys():
+            gps_loc = str(tweet['place'][field]).strip()
+            if gps_loc == NOT_AVAILABLE:
+                return location
+            location = resolve(gps_loc)
+            if location != NOT_AVAILABLE:
+                return location
+    return location
+
+
+def location_strings(tweets):
+    """ Returns the location strings that the locations of the given tweets can depend on.
+
+    Args:
+        :tweets: (iterable[dict]) The tweets, with their user and place objects.
+
+    Returns:
+        :set: The location strings, as passed to the resolver by user_level_location and tweet_level_location.
+    """
+    strings = set()
+    for tweet in tweets:
+        try:
+            given = tweet['user']['location']
+            if not (given is None or str(given) == 'nan' or len(given) < 2):
+                strings.add(given)
+        except Exception:
+            pass
+        try:
+            for field in ['country', 'placeFullName']:
+                if field in tweet['place'].keys():
+                    gps_loc = str(tweet['place'][field]).strip()
+                    if gps_loc == NOT_AVAILABLE:
+                        break
+                    strings.add(gps_loc)
+        except Exception:
+            pass
+    return strings
+
+
+class LocationStore:
+    """ A persistent dictionary from location strings to countries.
+    """
+
+    def __init__(self, path):
+        """ Opens (or creates) the store.
+
+        Args:
+            :path: (str) Path of the SQLite database.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        if dirname(path) and not exists(dirname(path)):
+            os.makedirs(dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS locations (location TEXT PRIMARY KEY, country TEXT NOT NULL) WITHOUT ROWID')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)')
+
+    def validate(self, fingerprint):
+        """ Clears the store if its countries were resolved from other resources. Called by the location API, which \
+        owns the resources.
+
+        Args:
+            :fingerprint: (str) Fingerprint of the current resources, as returned by resources_fingerprint.
+
+        Returns:
+            :bool: Whether the store was cleared.
+        """
+        with self._lock:
+            # The check and the reset are done in one write transaction, as the workers of the API start together.
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._connection.execute("SELECT value FROM meta WHERE name = 'fingerprint'").fetchone()
+                if row is not None and row[0] == fingerprint:
+                    self._connection.execute('COMMIT')
+                    return False
+                self._connection.execute('DELETE FROM locations')
+                self._connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('fingerprint', ?), ('created', ?)", (fingerprint, str(time.time())))
+                self._connection.execute('COMMIT')
+            except Exception:
+                self._connection.execute('ROLLBACK')
+                raise
+        print(f'Location store {self.path} (re)initialised for the current resources.')
+        return True
+
+    def get_many(self, locations):
+        """ Looks up location strings in bulk.
+
+        Args:
+            :locations: (iterable[str]) The location strings.
+
+        Returns:
+            :dict: The country of each string found in the store.
+        """
+        locations = list(locations)
+        found = dict()
+        with self._lock:
+            for start in range(0, len(locations), LOOKUP_CHUNK):
+                chunk = locations[start:start + LOOKUP_CHUNK]
+                rows = self._connection.execute(f"SELECT location, country FROM locations WHERE location IN ({','.join('?' * len(chunk))})", chunk)
+                found.update(rows.fetchall())
+        return found
+
+    def put_many(self, countries):
+        """ Stores the countries of location strings. A failed write is rolled back.
+
+        Args:
+            :countries: (dict) The country of each location string.
+        """
+        if len(countries) == 0:
+            return
+        with self._lock:
+            self._connection.execute('BEGIN')
+            try:
+                self._connection.executemany('INSERT OR REPLACE INTO locations (location, country) VALUES (?, ?)', list(countries.items()))
+                self._connection.execute('COMMIT')
+            except Exception:
+                self._connection.execute('ROLLBACK')
+                raise
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM locations').fetchone()[0]
+
+
+def get_location_store(create=False):
+    """ Opens the location store, if enabled.
+
+    Args:
+        :create: (bool, optional) Whether to create the store if it does not exist (only the location API creates it).
+
+    Returns:
+        :LocationStore: The store, or None if the store is disabled, does not exist or cannot be opened.
+    """
+    if not ApplicationConfig.LOCATION_STORE_ENABLED:
+        return None
+    path = ApplicationConfig.LOCATION_STORE_PATH
+    if not create and not exists(path):
+        return None
+    try:
+        return LocationStore(path)
+    except Exception as exp:
+        print(f'Location store {path} could not be opened: {exp}')
+        return None
@@ -6,18 +6,31 @@ Python script for extract the information from raw tweets stored in files within
 This script reads tweets from a file and imports them into combined dict.
 It assumes that the tweets are stored in a JSON format in which each tweet is in a separate line.
 
+With more than one worker (-w), the files are extracted by a pool of processes, and the files larger than the chunk size
+(-cs) are split into chunks; the output is the same as with one worker.
+
+By default, the tweets are joined with their replies, retweets and quotes across all the files of the run, in a
+disk-backed store (see join_store.py) removed at the end of the run: each tweet is written once, with all its links.
+The raw files are then only compressed once all the tweets are written, so that an interrupted run extracts them again.
+With -kj, the store of the output folder is kept across runs (or with -js, a store at another path), and the tweets that
+an earlier run wrote are written again when they get new links or copies. With -nj, each file is joined on its own.
+
+With a Solr core (-c), the tweets are added to the core in batches as they are extracted (see solr_ingest.py), instead
+of being written for 2_import_data_to_solr.py to read back; they are still written to the output folder as an archive
+unless -na is given.
+
 Usage:
-    python 1_extract_data.py -s source_folder_path -o output_folder_path
+    python 1_extract_data.py -s source_folder_path -o output_folder_path [-w workers] [-cs chunk_size_mb] [-kj | -js join_store_path | -nj] [-c core_name [-na]]
 
 Requirements:
 """
-import json
-import ijson
 from os import makedirs
 import datetime
 from os.path import isfile, join, exists
 import argparse
 from utils import *
+from extraction import ParallelExtraction, OutputFolder, compress_files, extract_file, extract_file_dicts, extracted_records, output_file_name
+from join_store import JoinStore
 import sys
 logger = create_logger(f"1_extract_data", file=f"extract_data")
 
@@ -25,6 +38,13 @@ if __name__== "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('-s', '--data_path', help="The path to the folder that the raw tweets files located in, in the files, each tweet in expected to be in a separate line.", default=None)
     parser.add_argument('-o', '--output_path', help="The path to the processed tweets to write the data to.", default=None)
+    parser.add_argument('-w', '--workers', help="Number of worker processes extracting the files (1 extracts them in this process).", type=int, default=ApplicationConfig.EXTRACTION_WORKERS)
+    parser.add_argument('-cs', '--chunk_size', help="Size in MB above which a file is split into chunks extracted by different workers (0 to not split files).", type=int, default=ApplicationConfig.EXTRACTION_CHUNK_SIZE_MB)
+    parser.add_argument('-kj', '--keep_join_store', help="Keep the store that joins the tweets with their replies, retweets and quotes in the output folder across runs, to join them with the tweets of the earlier runs of the same dataset.", action='store_true', default=ApplicationConfig.EXTRACTION_JOIN_KEEP_STORE)
+    parser.add_argument('-js', '--join_store', help="The path of a store kept across runs (instead of the one of the output folder). It should not be shared by different datasets.", default=ApplicationConfig.EXTRACTION_JOIN_STORE_PATH)
+    parser.add_argument('-nj', '--no_join', help="Join the tweets of each file on their own, without the join store.", action='store_true', default=not ApplicationConfig.EXTRACTION_JOIN_ENABLED)
+    parser.add_argument('-c', '--core', help="The Solr core to add the tweets to as they are extracted, instead of only writing them to the output folder.", default=None)
+    parser.add_argument('-na', '--no_archive', help="With a Solr core, do not write the tweets to the output folder.", action='store_true', default=not ApplicationConfig.EXTRACTION_SOLR_ARCHIVE)
 
     args = parser.parse_args()
     data_path = args.data_path
@@ -53,120 +73,58 @@ if __name__== "__main__":
     logger.info(f'[{__name__}]: work_files: {workfiles}')
     
         
-    for workFile in sorted(workfiles):
-        logger.info(f"[{__name__}]: {workFile}")
-        retweets_dict = dict()
-        replies_dict = dict()
-        quotes_dict = dict()
-        tweets_dict = dict()
-        users_dict = dict()
-        media_dict = dict()
-        places_dict = dict()
-        tweets = []
-        if exists(workFile):
-            with open(workFile, 'r' , encoding='utf-8') as fin:
-                try:
-                    parser = ijson.items(fin, '', multiple_values=True)
-                
-                    for objects in parser:
-                        if objects != None:
-                            tweets, users, includes, places, media, poll = extract_raw_responses(objects)
-                            places_dict = extractResponseContentsFromDict(places, places_dict)
-                            media_dict = extractMediaContentsFromDict(media, media_dict)
-                            users_dict = extractResponseContentsFromDict(users, users_dict)
-                            if type(includes) == list:
-                                for obj_ in includes:
-                                    tweets_dict, retweets_dict, replies_dict, quotes_dict = extractTweetsFromDict(obj_, tweets_dict, False, users_dict, places_dict, retweets_dict, replies_dict, quotes_dict, media_dict)
-                            else:
-                                tweets_dict, retweets_dict, replies_dict, quotes_dict = extractTweetsFromDict(includes, tweets_dict, False, users_dict, places_dict, retweets_dict, replies_dict, quotes_dict, media_dict)
-                            if type(tweets) == list:
-                                for obj_ in tweets:
-                                    tweets_dict, retweets_dict, replies_dict, quotes_dict = extractTweetsFromDict(obj_, tweets_dict, True, users_dict, places_dict, retweets_dict, replies_dict, quotes_dict, media_dict)
-                            else:
-                                tweets_dict, retweets_dict, replies_dict, quotes_dict = extractTweetsFromDict(tweets, tweets_dict, True, users_dict, places_dict, retweets_dict, replies_dict, quotes_dict, media_dict)
-                except Exception as exp:
-                    print(f"[{__name__}]: Error while reading the file {workFile}: {exp}")
-                    continue
-
-            combined_dict = tweets_dict.copy()
-
-            for k in replies_dict.keys():
-                for j in replies_dict[k].keys():
-                    if j not in combined_dict.keys():
-                        combined_dict[j] = replies_dict[k][j]
-            for k in quotes_dict.keys():
-                for j in quotes_dict[k].keys():
-                    if j not in combined_dict.keys():
-                        combined_dict[j] = quotes_dict[k][j]
-
-            for k in replies_dict.keys():
-                for j in replies_dict[k].keys():
-                    if k in combined_dict.keys():
-                        if 'repliesTweets' not in combined_dict[k].keys():
-                            combined_dict[k]['repliesTweets'] = [j]
-                        else:
-                            if j not in combined_dict[k]['repliesTweets']:
-                                combined_dict[k]['repliesTweets'].append(j)
-
-                        repliesTimes = f"{replies_dict[k][j]['userScreenName']} {replies_dict[k][j]['createdAt']}"
-                        if 'repliesTimes' not in combined_dict[k].keys():
-                            combined_dict[k]['repliesTimes'] = [repliesTimes]
-                        if repliesTimes not in combined_dict[k]['repliesTimes']:
-                            combined_dict[k]['repliesTimes'].append(repliesTimes)
-
-            for k in retweets_dict.keys():
-                for j in retweets_dict[k].keys():
-                    if k in combined_dict.keys():
-                        if 'retweeters' not in combined_dict[k].keys():
-                            combined_dict[k]['retweeters'] = [retweets_dict[k][j]['userScreenName']]
-                        else:
-                            if retweets_dict[k][j]['userScreenName'] not in combined_dict[k]['retweeters']:
-                                combined_dict[k]['retweeters'].append(retweets_dict[k][j]['userScreenName'])
-                        if 'createdAtDays' in retweets_dict[k][j].keys():
-                            retweetTimes = f"{retweets_dict[k][j]['userScreenName']} {retweets_dict[k][j]['createdAtDays']}"
-                        elif 'createdAt' in retweets_dict[k][j].keys():
-                            retweetTimes = f"{retweets_dict[k][j]['userScreenName']} {retweets_dict[k][j]['createdAt'][0:10]}"
-                        else:
-                            retweetTimes = f"{retweets_dict[k][j]['userId']}"
-
-                        if 'retweetTimes' not in combined_dict[k].keys():
-                            combined_dict[k]['retweetTimes'] = [retweetTimes]
-                        if retweetTimes not in combined_dict[k]['retweetTimes']:
-                            combined_dict[k]['retweetTimes'].append(retweetTimes)
-
-            for k in quotes_dict.keys():
-                for j in quotes_dict[k].keys():
-                    if k in combined_dict.keys():
-                        if 'quoteTweets' not in combined_dict[k].keys():
-                            combined_dict[k]['quoteTweets'] = [j]
-                        else:
-                            if j not in combined_dict[k]['quoteTweets']:
-                                combined_dict[k]['quoteTweets'].append(j)
-
-                        if 'quoters' not in combined_dict[k].keys():
-                            combined_dict[k]['quoters'] = [quotes_dict[k][j]['userScreenName']]
-                        else:
-                            if quotes_dict[k][j]['userScreenName'] not in combined_dict[k]['quoters']:
-                                combined_dict[k]['quoters'].append(quotes_dict[k][j]['userScreenName'])
-                        if 'createdAtDays' in quotes_dict[k][j].keys():
-                            quoteTimes = f"{quotes_dict[k][j]['userScreenName']} {quotes_dict[k][j]['createdAtDays']}"
-                        elif 'createdAt' in quotes_dict[k][j].keys():
-                            quoteTimes = f"{quotes_dict[k][j]['userScreenName']} {quotes_dict[k][j]['createdAt'][0:10]}"
-                        else:
-                            quoteTimes = f"{quotes_dict[k][j]['userId']}"
-
-                        if 'quoteTimes' not in combined_dict[k].keys():
-                            combined_dict[k]['quoteTimes'] = [quoteTimes]
-
-                        if quoteTimes not in combined_dict[k]['quoteTimes']:
-                            combined_dict[k]['quoteTimes'].append(quoteTimes)
-
-
-
-            outputFile = workFile.split("/")[-1] if len(workFile.split("/")) > 1 else "outputFile"
-
-            with open(join(OUTPUT_FOLDER, outputFile), 'a+', encoding='utf-8') as fout:
-                for k in combined_dict.keys():
-                    fout.write(f"{json.dumps(combined_dict[k], ensure_ascii=False)}\n")
-                    
-            compress_file(workFile, f"{workFile}.tar.gz")
+    if args.core is not None:
+        from solr_ingest import SolrIngestion
+        logger.info(f"[{__name__}]: The tweets will be added to the Solr core {args.core}{'' if args.no_archive else ' and archived'}")
+        sink = SolrIngestion(args.core, ApplicationConfig.EXTRACTION_SOLR_BATCH_SIZE, None if args.no_archive else OUTPUT_FOLDER, ApplicationConfig.EXTRACTION_SOLR_QUEUE_SIZE, logger,
+                             ApplicationConfig.EXTRACTION_SOLR_MAX_FAILED, join(OUTPUT_FOLDER, '.solr_failed.json'))
+    else:
+        sink = OutputFolder(OUTPUT_FOLDER)
+
+    keep_join_store = args.keep_join_store or args.join_store is not None
+    join_store_path = args.join_store if args.join_store is not None else join(OUTPUT_FOLDER, '.joinStore', 'interactions.db' if keep_join_store else 'run.db')
+    join_store = None
+    if not args.no_join:
+        if not keep_join_store and exists(join_store_path):
+            # The store of an interrupted run.
+            JoinStore(join_store_path).remove()
+        join_store = JoinStore(join_store_path)
+        logger.info(f"[{__name__}]: Joining the tweets of all the files in the store {join_store_path}{' (kept across runs)' if keep_join_store else ''}")
+
+    # The raw files added to the join store, compressed once the store is emitted.
+    joined_files = []
+    if args.workers > 1:
+        logger.info(f"[{__name__}]: Extracting with {args.workers} worker processes.")
+        joined_files = ParallelExtraction(workfiles, OUTPUT_FOLDER, args.workers, args.chunk_size * 1024 * 1024, ApplicationConfig.EXTRACTION_MAX_TASKS_PER_WORKER, logger, join_store, sink).run()
+    else:
+        for workFile in sorted(workfiles):
+            logger.info(f"[{__name__}]: {workFile}")
+            if exists(workFile):
+                if join_store is not None:
+                    extracted = extract_file_dicts(workFile)
+                    if extracted is None:
+                        continue
+                    join_store.add_records(output_file_name(workFile), extracted_records(*extracted))
+                    joined_files.append(workFile)
+                else:
+                    combined_dict = extract_file(workFile)
+                    if combined_dict is None:
+                        continue
+                    sink.write(output_file_name(workFile), combined_dict.values())
+                    compress_file(workFile, f"{workFile}.tar.gz")
+
+    if join_store is not None:
+        emitted = join_store.emit(sink)
+        logger.info(f"[{__name__}]: {emitted} new or updated tweets written to {OUTPUT_FOLDER if args.core is None else args.core}")
+        if sink.flush() == 0:
+            compress_files(joined_files, args.workers)
+        else:
+            logger.warning(f"[{__name__}]: Not all the tweets were written, the raw files are kept to be extracted again.")
+        if keep_join_store:
+            pruned = join_store.prune(ApplicationConfig.EXTRACTION_JOIN_LINK_MAX_RUNS)
+            logger.info(f"[{__name__}]: {pruned} links to tweets missing for {ApplicationConfig.EXTRACTION_JOIN_LINK_MAX_RUNS} runs removed from the store")
+            join_store.close()
+        else:
+            join_store.remove()
+    if sink.close() > 0:
+        logger.warning(f"[{__name__}]: Some tweets could not be added to the Solr core {args.core}; they are kept in {OUTPUT_FOLDER}, to import with 2_import_data_to_solr.py.")
@@ -28,6 +28,7 @@ except Exception as exp:
     logger.warning("exiting...")
     sys.exit(-1)
 from solr_class import *
+from solr_ingest import rename_solr_fields, is_solr_document
 
 dataSource = SolrClass(filters={})
 
@@ -54,23 +55,8 @@ if __name__== "__main__":
                 with open(workfile, "r", encoding="utf-8") as fin:
                     for t in fin:
                         t = json.loads(t)
-                        if 'defaultLanguage' in t.keys():
-                            t['languagePlatform'] = t.pop('defaultLanguage')
-                        if 'textOriginal' in t.keys():
-                            t['originalText'] = t.pop('textOriginal')
-                        if 'authorDisplayName' in t.keys():
-                            t['userScreenName'] = t.pop('authorDisplayName')
-                        if 'authorProfileImageUrl' in t.keys():
-                            t['authorImageUrl'] = t.pop('authorProfileImageUrl')
-                        if 'textDisplayCleared' in t.keys():
-                            t['fullText'] = t.pop('textDisplayCleared')
-                        if 'likeCount' in t.keys():
-                            t['favoriteCount'] = t.pop('likeCount')
-                        if 'publishedAt' in t.keys():
-                            t['createdAt'] = t.pop('publishedAt')
-                        if 'parentId' in t.keys():
-                            t['inReplyToId'] = t.pop('parentId')
-                        if ('userScreenName' in t.keys() and t['userScreenName'] != "" and 'id' in t.keys()):
+                        t = rename_solr_fields(t)
+                        if is_solr_document(t):
                             comments[t['id']] = t
                         elif 'videoCreatedAt' in t.keys():
                             videos[t['videoId']] = t
@@ -28,6 +28,7 @@ except Exception as exp:
     logger.warning("exiting...")
     sys.exit(-1)
 from solr_class import *
+from solr_ingest import rename_solr_fields, is_solr_document
 
 dataSource = SolrClass(filters={})
 
@@ -53,25 +54,9 @@ if __name__== "__main__":
                 with open(source, "r", encoding="utf-8") as fin:
                     for t in fin:
                         t = json.loads(t)
-                        if 'defaultLanguage' in t.keys():
-                            t['languagePlatform'] = t.pop('defaultLanguage')
-                        if 'textOriginal' in t.keys():
-                            t['originalText'] = t.pop('textOriginal')
-                        if 'authorDisplayName' in t.keys():
-                            t['userScreenName'] = t.pop('authorDisplayName')
-                        if 'authorProfileImageUrl' in t.keys():
-                            t['authorImageUrl'] = t.pop('authorProfileImageUrl')
-                        
-                        if 'textDisplayCleared' in t.keys():
-                            t['fullText'] = t.pop('textDisplayCleared')
-                        if 'likeCount' in t.keys():
-                            t['favoriteCount'] = t.pop('likeCount')
-                        if 'publishedAt' in t.keys():
-                            t['createdAt'] = t.pop('publishedAt')
-                        if 'parentId' in t.keys():
-                            t['inReplyToId'] = t.pop('parentId')
+                        t = rename_solr_fields(t)
                         #just consider tweets with id and author screen name.
-                        if 'userScreenName' in t.keys() and t['userScreenName'] != "" and 'id' in t.keys():
+                        if is_solr_document(t):
                             tweets[t['id']] = t
                         
                         if len(tweets) >= 100000:
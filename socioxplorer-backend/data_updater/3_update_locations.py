@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 
 import datetime as dt
-import time
 import sys
 from os.path import abspath, join
 try:
@@ -13,15 +12,72 @@ except Exception as exp:
     sys.exit(-1)
 from solr_class import *
 from utils import get_location, create_logger
+from location_store import get_location_store, location_strings, user_level_location, tweet_level_location
 logger = create_logger(f"3_update_locations", file=f"data_updater")
 
-    
+
+def locate_from_store(loc_dict, store):
+    """ Derives the locations of the tweets whose location strings were all resolved before by the location API.
+
+    Args:
+        :loc_dict: (dict) The tweets to locate (as sent to the location API), by id.
+        :store: (LocationStore) The location store, or None.
+
+    Returns:
+        :dict: The locations (as returned by the location API) of the tweets located from the store, by id.
+    """
+    locations = dict()
+    if store is None or len(loc_dict) == 0:
+        return locations
+    try:
+        known = store.get_many(location_strings(loc_dict.values()))
+    except Exception as exp:
+        logger.warning(f"[update_locations]: location store lookup failed: {exp}")
+        return locations
+    for t_id, tweet in loc_dict.items():
+        try:
+            # A string missing from the store raises a KeyError: the tweet is then sent to the location API.
+            locations[t_id] = {'user': user_level_location(tweet['user']['location'], known.__getitem__),
+                               'tweet': tweet_level_location(tweet, known.__getitem__)}
+        except KeyError:
+            pass
+    return locations
+
+
+def locate_unique(loc_dict):
+    """ Sends one tweet per distinct set of location strings to the location API, and gives its locations to all the tweets with the same strings.
+
+    Args:
+        :loc_dict: (dict) The tweets to locate (as sent to the location API), by id.
+
+    Returns:
+        :dict: The locations of the tweets by id, or None if the location API is not accessible.
+    """
+    if len(loc_dict) == 0:
+        return dict()
+    groups = dict()
+    for t_id, tweet in loc_dict.items():
+        key = (tweet['user']['location'], tweet['place']['country'], tweet['place']['placeFullName'])
+        groups.setdefault(key, []).append(t_id)
+    unique = {ids[0]: loc_dict[ids[0]] for ids in groups.values()}
+    locations = get_location(unique)
+    if locations == None:
+        return None
+    result = dict()
+    for ids in groups.values():
+        if ids[0] in locations.keys():
+            for t_id in ids:
+                result[t_id] = locations[ids[0]]
+    return result
+
+
 if __name__== "__main__":
     run = True
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument('-c', '--core', help="please specify core", default=None)
     parser.add_argument('-qs', '--queryString', help="The query string that the system uses to identify updating limit (update all records or new records only).", default=None)
+    parser.add_argument('-cm', '--cursor_mark', help="The Solr cursor mark to resume from, as logged by a previous run.", default="*")
  
     args = parser.parse_args()
     core = args.core
@@ -30,35 +86,34 @@ if __name__== "__main__":
     print_this(f"queryString for location : {queryString}")
     solr = SolrClass({})
     if core != None:
-    
-        tweets_all, max_row = solr.get_no_location_items(solr_core=core, queryString=queryString)
+        # Opened read-only: the location API saves the strings it resolves, and clears the store when its resources change.
+        store = get_location_store()
 
         tweets_list = []
-        while len(tweets_all) > 0:
-            tweets = tweets_all[0:10000]
-            tweets_all = tweets_all[10000:]
+        # The cursor pass never re-reads the updated items, so there is no need to wait for Solr's soft commit.
+        for tweets_all, max_row, cursor_mark in solr.iter_no_location_items(solr_core=core, queryString=queryString, rows=10000, cursor_mark=args.cursor_mark):
             loc_dict = dict()
-            for tweet in tweets:
+            for tweet in tweets_all:
                 loc_dict[tweet['id']] = {'id': tweet['id'],
                 'user': {'location': tweet['userLocationOriginal'] if 'userLocationOriginal' in tweet.keys() else 'not_available'},
                 'place': {'country': tweet['placeCountry'] if 'placeCountry' in tweet.keys() else 'not_available',
                 'placeFullName': tweet['placeFullName'] if 'placeFullName' in tweet.keys() else 'not_available'}}
-            locations = get_location(loc_dict)
+            locations = locate_from_store(loc_dict, store)
+            remote = locate_unique({k: v for k, v in loc_dict.items() if k not in locations})
+            logger.info(f"[update_locations]: {len(locations)} tweets located from the store, {len(loc_dict) - len(locations)} sent to the location API")
 
-            # only update if the location api running and accessible.
-            if locations != None:
-                for k in locations.keys():
-                    tweets_list.append({'id': k, 'userLocation': locations[k]['user'], 'locationGps': locations[k]['tweet']})
+            # only update the tweets of the location API if it is running and accessible.
+            if remote != None:
+                locations.update(remote)
+            for k in locations.keys():
+                tweets_list.append({'id': k, 'userLocation': locations[k]['user'], 'locationGps': locations[k]['tweet']})
 
-            if len(tweets_all) == 0:
-                tweets_list = solr.add_items_to_solr(core, tweets_list)
-                logger.info(f"[update_locations]: adding items call done ... currently {len(tweets_all)} to be processed")
-                time.sleep(5) # wait Solr's soft commit
-                tweets_all, max_row = solr.get_no_location_items(solr_core=core, queryString=queryString)
-        if max_row == 0:
-            logger.info(f"[update_locations]: Updating locations finished.")
-        if len(tweets_list) >= 0:
             tweets_list = solr.add_items_to_solr(core, tweets_list)
-            logger.info(f"[update_locations]: adding items call done ... currently {len(tweets_all)} to be processed")
+            logger.info(f"[update_locations]: adding items call done ... {len(tweets_all)} processed out of {max_row}")
+            logger.info(f'[update_locations]: Batch done, resume with --cursor_mark "{cursor_mark}"')
+        if len(tweets_list) > 0:
+            tweets_list = solr.add_items_to_solr(core, tweets_list)
+            logger.info(f"[update_locations]: adding items call done ... currently {len(tweets_list)} to be processed")
+        logger.info(f"[update_locations]: Updating locations finished.")
     else:
         logger.info('[update_locations]: Please make sure that command contains the core instance name.')
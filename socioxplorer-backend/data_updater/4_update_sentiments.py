@@ -11,104 +11,187 @@ except Exception as exp:
     sys.exit(-1)
 from solr_class import *
 
-from utils import get_sentiments, get_language, create_logger
+from utils import get_sentiments, get_languages, create_logger
+from pipeline import Pipeline, Checkpoint
 logger = create_logger(f"4_update_sentiments", file=f"data_updater")
 
 SLEEP_TIME = 3
+REQUEST_SIZE = 4000
+WRITE_SIZE = 8000
+MAX_ATTEMPTS = 3
 SUPPORTED_LANGUAGES = {'arabic': 'ar', 'english': 'en', 'french': 'fr', 'german':'de', 'hindi':'hi', 'italian': 'it', 'spanish': 'sp', 'portuguese': 'pt'}
 SUPPORTED_LANGUAGES_REVERSE = {v: k for k, v in SUPPORTED_LANGUAGES.items()}
 
-        
+
+def get_tweet_languages(tweets):
+    """ Returns the languages of tweets, detecting them from their text unless the platform language can be trusted. \
+    The texts are identified in batches.
+
+    Args:
+        :tweets: (list[dict]) The tweets, with their fullText, language and languagePlatform fields (when available).
+
+    Returns:
+        :list[str]: The language of each tweet, e.g. "english", or "NonText" if the tweet has no text.
+    """
+    languages = ["NonText"] * len(tweets)
+    to_detect = []
+    for i, tweet in enumerate(tweets):
+        if 'fullText' in tweet.keys():
+            if 'languagePlatform' in tweet.keys() and 'language' in tweet.keys() and tweet['language'] == tweet['languagePlatform']:
+                languages[i] = tweet['language']
+            else:
+                to_detect.append(i)
+    for i, language in zip(to_detect, get_languages([tweets[i]['fullText'] for i in to_detect])):
+        languages[i] = language
+    return languages
+
+
+def split_by_language(batch):
+    """ Pipeline stage: detects the language of the tweets of a batch, and splits them into the requests to send to \
+    the sentiment API (tweets in supported languages) and the items that can be written directly (other languages).
+
+    Args:
+        :batch: (tuple) The batch number and the tweets.
+
+    Returns:
+        :list[tuple]: The parts of the batch, as (batch number, number of parts, kind, payload), where kind is "predict" \
+            (payload: the tweets to send to the sentiment API) or "write" (payload: the items to write to Solr).
+    """
+    batch_number, tweets = batch
+    sentiments_list = dict()
+    tweets_list = []
+    for tweet, language_ in zip(tweets, get_tweet_languages(tweets)):
+        try:
+            if language_ in SUPPORTED_LANGUAGES.keys():
+                sentiments_list[tweet["id"]] = {'id': tweet['id'], "fullText": tweet['fullText'], "language":SUPPORTED_LANGUAGES[language_]}
+            elif language_ in SUPPORTED_LANGUAGES_REVERSE.keys():
+                sentiments_list[tweet["id"]] = {'id': tweet['id'], "fullText": tweet['fullText'], "language":language_}
+            else:
+                tweets_list.append({'id': tweet['id'], 'sentiment': 'NonText' if language_ == 'NonText' else 'OtherLanguages', 'language':language_, 'sentiment_s':'Done'})
+        except Exception as exp:
+            logger.info(f'[update_sentiments]: [Exception] at Loading data! {exp}')
+    ids = list(sentiments_list.keys())
+    requests = [{k: sentiments_list[k] for k in ids[i:i + REQUEST_SIZE]} for i in range(0, len(ids), REQUEST_SIZE)]
+    nb_parts = len(requests) + 1
+    return [(batch_number, nb_parts, 'predict', request) for request in requests] + [(batch_number, nb_parts, 'write', tweets_list)]
+
+
+def extract_sentiments(part):
+    """ Pipeline stage: gets the sentiments of a request from the sentiment API, retrying MAX_ATTEMPTS times. If the API \
+    stays unavailable, the tweets of the request are left without sentiment (and will be processed by the next run).
+
+    Args:
+        :part: (tuple) A part of a batch, as returned by split_by_language.
+
+    Returns:
+        :list[tuple]: The part, as (batch number, number of parts, items to write to Solr).
+    """
+    batch_number, nb_parts, kind, payload = part
+    if kind == 'write':
+        return [(batch_number, nb_parts, payload)]
+    tweets_list = []
+    for attempt in range(MAX_ATTEMPTS):
+        extracted_sentiments = None
+        try:
+            logger.info(f"[update_sentiments]: Getting sentiments of {len(payload)} tweets started")
+            extracted_sentiments = get_sentiments(payload)
+            logger.info("[update_sentiments]: Getting sentiments done!")
+        except Exception as exp:
+            logger.warning(f'[update_sentiments]: [Exception] at calling getting_sentiments. {exp}')
+            time.sleep(SLEEP_TIME * (attempt + 1))
+        if extracted_sentiments != None:
+            for k in extracted_sentiments.keys():
+                tweets_list.append({'id': k, 'sentiment': extracted_sentiments[k], 'language':SUPPORTED_LANGUAGES_REVERSE[payload[k]['language']], 'sentiment_s':'Done'})
+            break
+    else:
+        logger.warning(f'[update_sentiments]: Sentiment API unavailable, {len(payload)} tweets skipped.')
+    return [(batch_number, nb_parts, tweets_list)]
+
+
+class SolrWriter:
+    """ Pipeline stage: buffers the items to write, writes them to Solr WRITE_SIZE at a time, and advances the \
+    checkpoint over the batches that are completely written.
+    """
+
+    def __init__(self, solr, core, checkpoint):
+        self.solr = solr
+        self.core = core
+        self.checkpoint = checkpoint
+        self.items = []
+        self.parts = dict()
+        self.complete_batches = []
+
+    def __call__(self, part):
+        batch_number, nb_parts, items = part
+        self.items += items
+        self.parts[batch_number] = self.parts.get(batch_number, 0) + 1
+        if self.parts[batch_number] == nb_parts:
+            self.parts.pop(batch_number)
+            self.complete_batches.append(batch_number)
+        if len(self.items) >= WRITE_SIZE:
+            self.flush()
+
+    def flush(self):
+        """ Writes the buffered items to Solr, then marks the complete batches as done in the checkpoint.
+
+        Raises:
+            :Exception: If Solr does not accept the items after MAX_ATTEMPTS attempts.
+        """
+        written = len(self.items)
+        for attempt in range(MAX_ATTEMPTS):
+            if len(self.items) == 0:
+                break
+            if attempt > 0:
+                time.sleep(SLEEP_TIME * attempt)
+            logger.info(f"[update_sentiments]: sample tweets: {[s['id'] for s in self.items[-3:]]}")
+            self.items = self.solr.add_items_to_solr(self.core, self.items)
+        if len(self.items) > 0:
+            raise Exception(f'{len(self.items)} items could not be written to Solr.')
+        self.checkpoint.complete(self.complete_batches, written)
+        logger.info(f'[update_sentiments]: {written} tweets written to solr ({self.checkpoint.written} in total)')
+        self.complete_batches = []
+
+
 if __name__== "__main__":
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument('-c', '--core', help="please specify core", default=None)
     parser.add_argument('-qs', '--queryString', help="The query string that the system uses to identify updating limit (update all records or new records only).", default=None)
-    
+    parser.add_argument('-cm', '--cursor_mark', help="The Solr cursor mark to start from. Defaults to the checkpoint of the previous (interrupted) run, if any.", default=None)
+    parser.add_argument('-nr', '--no_resume', help="Ignore the checkpoint of the previous run and scan the core from the start.", action='store_true')
+    parser.add_argument('-w', '--workers', help="Number of concurrent requests to the sentiment API.", type=int, default=ApplicationConfig.SENTIMENT_UPDATER_WORKERS)
+
     args = parser.parse_args()
     core = args.core
     queryString = args.queryString
-    
+
     print_this(f"queryString for sentiment: {queryString}")
-    
+
     solr = SolrClass({})
 
     if core != None:
+        checkpoint = Checkpoint(ApplicationConfig.UPDATER_CHECKPOINT_DIR, f'sentiments_{core}', {'core': core, 'queryString': queryString})
+        cursor_mark = args.cursor_mark or (None if args.no_resume else checkpoint.load()) or "*"
+        if cursor_mark != "*":
+            logger.info(f'[update_sentiments]: Resuming from cursor mark "{cursor_mark}"')
+
+        def fetch_batches():
+            """ Pipeline source: the batches of tweets without sentiment, numbered in the order of the cursor. """
+            # The cursor pass never re-reads the updated items, so there is no need to wait for Solr's soft commit.
+            for batch_number, (tweets_all, max_row, next_cursor_mark) in enumerate(solr.iter_no_sentiment_items(solr_core=core, queryString=queryString, cursor_mark=cursor_mark)):
+                logger.info(f'[update_sentiments]: Solr query results gotten ... {max_row}')
+                checkpoint.register(batch_number, next_cursor_mark)
+                yield batch_number, tweets_all
 
-        tweets_all, max_row = solr.get_no_sentiment_items(solr_core=core, queryString=queryString)
-
-        tweets_list = []
-        sentiments_list = dict()
-
-        while len(tweets_all)> 0:
-            logger.info(f'[update_sentiments]: Solr query results gotten ... {max_row}')
-            logger.info(f'[update_sentiments]: Total tweets to analyze: {len(sentiments_list)}')
-            logger.info(f'[update_sentiments]: Total tweets ready to send back to Solr: {len(tweets_list)}')
-
-            for tweet in tweets_all:
-                try:
-                    if 'fullText' in tweet.keys():
-                        if 'languagePlatform' not in tweet.keys():
-                            language_ = get_language(tweet['fullText'])
-                        else:
-                            if 'language' in tweet.keys():
-                                language_ = get_language(tweet['fullText']) if tweet['language'] != tweet['languagePlatform'] else tweet['language']
-                            else:
-                                language_ = get_language(tweet['fullText'])
-                    else:
-                        language_ = "NonText"
-
-                    if language_ in SUPPORTED_LANGUAGES.keys():
-                        sentiments_list[tweet["id"]] = {'id': tweet['id'], "fullText": tweet['fullText'], "language":SUPPORTED_LANGUAGES[language_]}
-                    elif language_ in SUPPORTED_LANGUAGES_REVERSE.keys():
-                        sentiments_list[tweet["id"]] = {'id': tweet['id'], "fullText": tweet['fullText'], "language":language_}
-                    else:
-                        tweets_list.append({'id': tweet['id'], 'sentiment': 'NonText' if language_ == 'NonText' else 'OtherLanguages', 'language':language_, 'sentiment_s':'Done'})
-                except Exception as exp:
-                    logger.info(f'[update_sentiments]: [Exception] at Loading data! {exp}')
-                threshold = min(4000, max_row)
-                if len(sentiments_list) >= threshold:
-                    logger.info(f'[update_sentiments]: Sentiment loaded with {threshold} tweets')
-                    extracted_sentiments = None
-                    try:
-                        logger.info("[update_sentiments]: Getting sentiments started")
-                        extracted_sentiments = get_sentiments(sentiments_list)
-                        logger.info("[update_sentiments]: Getting sentiments done!")
-                    except Exception as exp:
-                        logger.warning(f'[update_sentiments]: [Exception] at calling getting_sentiments. {exp}')
-                        time.sleep(1)
-                        pass
-                    if extracted_sentiments != None:
-                        for k in extracted_sentiments.keys():
-                            tweets_list.append({'id': k, 'sentiment': extracted_sentiments[k], 'language':SUPPORTED_LANGUAGES_REVERSE[sentiments_list[k]['language']], 'sentiment_s':'Done'})
-                        sentiments_list = dict()
-                threshold = min(8000, max_row)
-
-                if len(tweets_list) >= threshold:
-                    logger.info(f"[update_sentiments]: sample tweets: {[s['id'] for s in tweets_list[-3:]]}")
-                    tweets_list =  solr.add_items_to_solr(core, tweets_list)
-                    logger.info(f'[update_sentiments]: {threshold} tweets written to solr')
-                    time.sleep(2) #Wait for the Solr's soft commit.
-
-            tweets_all, max_row = solr.get_no_sentiment_items(solr_core=core, queryString=queryString)
-
-        if len(sentiments_list) > 0:
-            extracted_sentiments = None
-            try:
-                extracted_sentiments = get_sentiments(sentiments_list)
-                if extracted_sentiments != None:
-                    for k in extracted_sentiments.keys():
-                        tweets_list.append({'id': k, 'sentiment': extracted_sentiments[k], 'language':SUPPORTED_LANGUAGES_REVERSE[sentiments_list[k]['language']], 'sentiment_s':'Done'})
-            except Exception as exp:
-                logger.warning(f'[update_sentiments]: [Exception] at calling getting_sentiments 2. {exp}')
-                pass
-            finally:
-                sentiments_list = dict()
-
-        if len(tweets_list) > 0:
-            logger.info(f"[update_sentiments]: sample tweets: {tweets_list[0:3]}")
-            tweets_list =  solr.add_items_to_solr(core, tweets_list)
-            logger.info('[update_sentiments]: written to solr')
+        writer = SolrWriter(solr, core, checkpoint)
+        pipeline = Pipeline('update_sentiments', ApplicationConfig.UPDATER_QUEUE_SIZE, logger)
+        pipeline.set_source('fetch', fetch_batches)
+        pipeline.add_stage('language', split_by_language)
+        pipeline.add_stage('sentiment', extract_sentiments, workers=args.workers)
+        pipeline.add_stage('write', writer)
+        pipeline.run()
+        writer.flush()
+        checkpoint.clear()
         logger.info('[update_sentiments]: Done!')
     else:
-        logger.warning('[update_sentiments]: Please enter core name. You can use the flag (c) to pass its name as following: \n\tpython update_sentiments.py\n')
\ No newline at end of file
+        logger.warning('[update_sentiments]: Please enter core name. You can use the flag (c) to pass its name as following: \n\tpython update_sentiments.py\n')
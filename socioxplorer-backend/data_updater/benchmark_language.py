@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import re
+import sys
+import glob
+import time
+import random
+import argparse
+import ijson
+from ftlangdetect import detect
+from utils import LANGUAGE_DICT
+from language_identifier import LanguageIdentifier
+
+"""This script benchmarks the language identification of the data updater on the sample data scaled up: the original
+get_language (four regular expressions and one call to the model per text) against the LanguageIdentifier (a single
+precompiled cleaning pass and one call to the model per batch), without and with its cache. It reports the throughput
+of each and checks that they identify the same languages.
+
+The texts of the sample tweets are repeated --scale times. Each copy gets a random mention and number, which are removed
+by the cleaning, as retweets and copies of the same text are frequent in the collected data.
+
+Run it from the socioxplorer-backend/data_updater folder, e.g.: python benchmark_language.py --scale 500
+"""
+
+
+def legacy_get_language(tweet_text):
+    """ The original get_language of utils.py, one text at a time. """
+    try:
+        tweet_text = re.sub('http[s]:[^\b \n\t]+',' ',tweet_text)
+        tweet_text = re.sub('@[^\b \n\t]+',' ',tweet_text)
+        tweet_text = re.sub('[0-9]+',' ',tweet_text)
+        tweet_text = re.sub('[\n\t ]+',' ',tweet_text).strip()
+        if len(tweet_text.split(' ')) >= 1 and len(tweet_text) > 1:
+            lang = detect(text=tweet_text, low_memory=False)
+            language = str(lang['lang'])
+            return LANGUAGE_DICT[language] if language in LANGUAGE_DICT.keys() else language
+        return 'NonText'
+    except Exception as exp:
+        print(exp)
+        return 'lang'
+
+
+def load_texts(sample_folder):
+    """ Returns the texts of the tweets (and included tweets) of the sample files. """
+    texts = []
+    for sample_file in sorted(glob.glob(f'{sample_folder}/*.json')):
+        with open(sample_file, 'r', encoding='utf-8') as fin:
+            for response in ijson.items(fin, '', multiple_values=True):
+                tweets = response.get('data', [])
+                tweets = tweets if type(tweets) == list else [tweets]
+                tweets += response.get('includes', {}).get('tweets', [])
+                texts += [tweet['text'] for tweet in tweets if 'text' in tweet]
+    return texts
+
+
+def scale_texts(texts, scale, seed):
+    """ Repeats the texts, with a random mention and number in each copy. """
+    rng = random.Random(seed)
+    scaled = [f'@user{rng.randint(0, 10**6)} {text} {rng.randint(0, 10**4)}' for _ in range(scale) for text in texts]
+    rng.shuffle(scaled)
+    return scaled
+
+
+def timed(func, texts):
+    start = time.perf_counter()
+    languages = func(texts)
+    return time.perf_counter() - start, languages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the language identification on the sample data scaled up.')
+    parser.add_argument('--sample_folder', type=str, default='../../sample_data', help='Folder of the sample tweets files.')
+    parser.add_argument('--scale', type=int, default=500, help='Number of copies of the sample texts.')
+    parser.add_argument('--batch_size', type=int, default=1024, help='Maximum number of texts per call to the model.')
+    parser.add_argument('--cache_size', type=int, default=200000, help='Size of the cache of the identifier.')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed of the copies.')
+    args = parser.parse_args()
+
+    texts = load_texts(args.sample_folder)
+    if len(texts) == 0:
+        print(f'No sample texts found in {args.sample_folder}.')
+        sys.exit(-1)
+    scaled = scale_texts(texts, args.scale, args.seed)
+    print(f'{len(texts)} sample texts, {len(scaled)} texts after scaling')
+
+    # Loads the model before timing.
+    legacy_get_language(texts[0])
+    legacy_time, legacy = timed(lambda items: [legacy_get_language(text) for text in items], scaled)
+    print(f'Original get_language: {legacy_time:.2f}s ({len(scaled) / legacy_time:.0f} texts/s)')
+    for name, cache_size in [('batched', 0), ('batched with cache', args.cache_size)]:
+        identifier = LanguageIdentifier(low_memory=False, batch_size=args.batch_size, cache_size=cache_size)
+        identifier.get_model()
+        elapsed, languages = timed(identifier.get_languages, scaled)
+        agreement = sum(a == b for a, b in zip(legacy, languages)) / len(scaled)
+        print(f'LanguageIdentifier {name}: {elapsed:.2f}s ({len(scaled) / elapsed:.0f} texts/s, {legacy_time / elapsed:.1f}x), same language: {100 * agreement:.2f}%')
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import sys
+import glob
+import time
+import random
+import argparse
+import ijson
+from utils import TextFeatureExtractor, tweet_tokenizer, getEmojis, getCleanedText, getCleanedTextList
+
+"""This script benchmarks the extraction of the text features of the tweets (hashtags, mentions, emojis, cleaned text,
+processed tokens of the text and of the user's description) on the sample data scaled up: the original calls of
+getTweetContent (five tokenisations per tweet) against the TextFeatureExtractor (one tokenisation per tweet, and the
+descriptions memoised). It reports the throughput of both and checks that their features are identical.
+
+Run it from the socioxplorer-backend/data_updater folder, e.g.: python benchmark_text_features.py --scale 200
+"""
+
+
+def load_sample(sample_folder):
+    """ Returns the (text, author description) of the tweets (and included tweets) of the sample files. """
+    items = []
+    for sample_file in sorted(glob.glob(f'{sample_folder}/*.json')):
+        with open(sample_file, 'r', encoding='utf-8') as fin:
+            for response in ijson.items(fin, '', multiple_values=True):
+                tweets = response.get('data', [])
+                tweets = tweets if type(tweets) == list else [tweets]
+                tweets += response.get('includes', {}).get('tweets', [])
+                users = {user['id']: user.get('description', '') for user in response.get('includes', {}).get('users', [])}
+                items += [(tweet['text'], users.get(tweet.get('author_id'), '')) for tweet in tweets if 'text' in tweet]
+    return items
+
+
+def original_features(text, description):
+    """ The text features as computed by the original getTweetContent. """
+    return {'hashtags': [x.replace('#','') for x in tweet_tokenizer.tokenize(text) if x.startswith('#')],
+            'mentions': [x.replace('@','') for x in tweet_tokenizer.tokenize(text) if x.startswith('@')],
+            'emojis': getEmojis(text),
+            'text': getCleanedText(text),
+            'processedTokens': getCleanedTextList(text, alpha_numeric_only=True, lower=False),
+            'processedDescTokens': getCleanedTextList(description, alpha_numeric_only=True, lower=False)}
+
+
+def extractor_features(extractor, text, description):
+    """ The text features as computed by getTweetContent with the TextFeatureExtractor. """
+    features = extractor.text_features(text)
+    features['processedDescTokens'] = extractor.description_tokens(description)
+    return features
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the extraction of the text features on the sample data scaled up.')
+    parser.add_argument('--sample_folder', type=str, default='../../sample_data', help='Folder of the sample tweets files.')
+    parser.add_argument('--scale', type=int, default=200, help='Number of copies of the sample tweets.')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed of the order of the copies.')
+    args = parser.parse_args()
+
+    items = load_sample(args.sample_folder)
+    if len(items) == 0:
+        print(f'No sample tweets found in {args.sample_folder}.')
+        sys.exit(-1)
+    scaled = items * args.scale
+    random.Random(args.seed).shuffle(scaled)
+    print(f'{len(items)} sample tweets, {len(scaled)} tweets after scaling')
+
+    start = time.perf_counter()
+    original = [original_features(text, description) for text, description in scaled]
+    original_time = time.perf_counter() - start
+    extractor = TextFeatureExtractor()
+    start = time.perf_counter()
+    extracted = [extractor_features(extractor, text, description) for text, description in scaled]
+    extractor_time = time.perf_counter() - start
+
+    print(f'Original features: {original_time:.2f}s ({len(scaled) / original_time:.0f} tweets/s)')
+    print(f'TextFeatureExtractor: {extractor_time:.2f}s ({len(scaled) / extractor_time:.0f} tweets/s, {original_time / extractor_time:.1f}x)')
+    print(f'Identical features: {sum(a == b for a, b in zip(original, extracted))} of {len(scaled)}')
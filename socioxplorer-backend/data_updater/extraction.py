@@ -0,0 +1,659 @@
+#!/usr/bin/env python3
+
+"""
+Extraction of the tweets of raw files, shared by the serial and the parallel runs of 1_extract_data.py.
+
+A file is extracted into four dictionaries (the tweets, and the retweets, replies and quotes of each referenced tweet),
+which are combined into one record per tweet. In the parallel run, the files are extracted by a pool of processes, and
+the files larger than the chunk size are split into byte ranges at the start of a line holding a whole JSON response,
+so that no worker holds more than a chunk of data. The chunks of a file are merged in their order, with the same
+first-seen-wins rules as the serial run, so that the output is identical:
+    - before extracting, the users, places and media of the file are scanned, and each chunk gets the ones that earlier
+      chunks define and it references, as if it were read after them;
+    - a tweet (or a retweet, reply or quote) seen in several chunks keeps the content of its first chunk, and the counts
+      of its later copies are applied to it in order;
+    - the first retweet of a tweet in a chunk by an unknown user gets its date if earlier chunks retweeted the tweet (the
+      serial run only dates the later retweets of a tweet by unknown users).
+Each file is written to the output folder, and compressed, in the sorted order of the files. With a join store (see
+join_store.py), the records of each file are added to the store instead, and the store writes the output at the end.
+The output goes to a sink: the output folder (OutputFolder), or a Solr core (see solr_ingest.SolrIngestion).
+"""
+import json
+import shutil
+import ijson
+from os import remove
+from os.path import getsize, join, exists
+from collections import deque
+from multiprocessing import Pool
+from utils import *
+
+
+def output_file_name(workFile):
+    """A function to get the name of the output file of a raw file (files with the same name are appended to the same output file).
+
+    Args:
+        workFile (str): The path of the raw file.
+
+    Returns:
+        str: The name of the output file.
+    """
+    return workFile.split("/")[-1] if len(workFile.split("/")) > 1 else "outputFile"
+
+
+class RangeReader:
+    """A binary file-like object that reads a byte range of a file, for ijson."""
+
+    def __init__(self, fin, start, end):
+        self.fin = fin
+        self.position = start
+        self.end = end
+        fin.seek(start)
+
+    def read(self, size=-1):
+        remaining = self.end - self.position
+        if remaining <= 0:
+            return b''
+        data = self.fin.read(remaining if size is None or size < 0 or size > remaining else size)
+        self.position += len(data)
+        return data
+
+
+def read_responses(workFile, start=None, end=None):
+    """A function to parse the JSON responses of a raw file, or of a byte range of it.
+
+    Args:
+        workFile (str): The path of the raw file.
+        start (int): The first byte of the range, or None for the whole file.
+        end (int): The byte after the range.
+
+    Returns:
+        generator: The parsed responses.
+    """
+    if start is None:
+        with open(workFile, 'r', encoding='utf-8') as fin:
+            yield from ijson.items(fin, '', multiple_values=True)
+    else:
+        with open(workFile, 'rb') as fin:
+            yield from ijson.items(RangeReader(fin, start, end), '', multiple_values=True)
+
+
+def is_response_line(line):
+    """A function to check whether a line holds a whole JSON object, i.e. whether a file can be split before it."""
+    if not line.startswith(b'{'):
+        return False
+    try:
+        return type(json.loads(line)) == dict
+    except Exception:
+        return False
+
+
+def find_chunks(workFile, chunk_size):
+    """A function to split a file into byte ranges of about chunk_size bytes, at the start of lines that hold a whole JSON
+    response. Files that are not written one response per line (e.g. indented JSON) are not split.
+
+    Args:
+        workFile (str): The path of the raw file.
+        chunk_size (int): The size of the ranges in bytes (0 to not split the files).
+
+    Returns:
+        list: The (start, end) byte ranges.
+    """
+    size = getsize(workFile)
+    boundaries = [0]
+    if chunk_size > 0:
+        with open(workFile, 'rb') as fin:
+            target = chunk_size
+            while target < size:
+                fin.seek(target - 1)
+                fin.readline()
+                boundary = None
+                while True:
+                    position = fin.tell()
+                    line = fin.readline()
+                    if not line:
+                        break
+                    if is_response_line(line):
+                        boundary = position
+                        break
+                if boundary is None:
+                    break
+                boundaries.append(boundary)
+                target = boundary + chunk_size
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries[:-1], boundaries[1:]) if end > start] or [(0, size)]
+
+
+def record_retweet_dates(object_, retweets_dict, retweet_dates):
+    """A function to record the dates of the raw retweets that are the first retweets of a tweet so far (see merge_retweets)."""
+    for item in (object_ if type(object_) == list else [object_]):
+        try:
+            for referenced_tweet in item.get('referenced_tweets', []):
+                if referenced_tweet['type'] == 'retweeted' and referenced_tweet['id'] not in retweets_dict.keys():
+                    date_str = item.get("createdAt") or item.get("created_at")
+                    retweet_dates[(referenced_tweet['id'], item['id'])] = format_date(parse_date(date_str), "%Y-%m-%d")
+        except Exception:
+            pass
+
+
+def extract_responses(responses, seeds=None, occurrences=None, retweet_dates=None):
+    """A function to extract the tweets of parsed responses, in the order of the responses.
+
+    Args:
+        responses (iterable): The parsed responses (see read_responses).
+        seeds (tuple): The (users, places, media) dictionaries defined before the responses, or None.
+        occurrences (list): If given, the (tweet id, counts) of the copies of the tweets are appended to it (see
+            extractTweetsFromDict), to merge the chunks of a file.
+        retweet_dates (dict): If given, the dates of the first retweets of the tweets are added to it (see
+            record_retweet_dates), to merge the chunks of a file.
+
+    Returns:
+        tuple: The tweets_dict, retweets_dict, replies_dict and quotes_dict.
+    """
+    retweets_dict = dict()
+    replies_dict = dict()
+    quotes_dict = dict()
+    tweets_dict = dict()
+    users_dict = dict(seeds[0]) if seeds else dict()
+    places_dict = dict(seeds[1]) if seeds else dict()
+    media_dict = dict(seeds[2]) if seeds else dict()
+    for objects in responses:
+        if objects != None:
+            tweets, users, includes, places, media, poll = extract_raw_responses(objects)
+            places_dict = extractResponseContentsFromDict(places, places_dict)
+            media_dict = extractMediaContentsFromDict(media, media_dict)
+            users_dict = extractResponseContentsFromDict(users, users_dict)
+            if type(includes) == list:
+                for obj_ in includes:
+                    if retweet_dates is not None:
+                        record_retweet_dates(obj_, retweets_dict, retweet_dates)
+                    tweets_dict, retweets_dict, replies_dict, quotes_dict = extractTweetsFromDict(obj_, tweets_dict, False, users_dict, places_dict, retweets_dict, replies_dict, quotes_dict, media_dict, detect_language=False, occurrences=occurrences)
+            else:
+                if retweet_dates is not None and includes:
+                    record_retweet_dates(includes, retweets_dict, retweet_dates)
+                tweets_dict, retweets_dict, replies_dict, quotes_dict = extractTweetsFromDict(includes, tweets_dict, False, users_dict, places_dict, retweets_dict, replies_dict, quotes_dict, media_dict, detect_language=False, occurrences=occurrences)
+            if type(tweets) == list:
+                for obj_ in tweets:
+                    if retweet_dates is not None:
+                        record_retweet_dates(obj_, retweets_dict, retweet_dates)
+                    tweets_dict, retweets_dict, replies_dict, quotes_dict = extractTweetsFromDict(obj_, tweets_dict, True, users_dict, places_dict, retweets_dict, replies_dict, quotes_dict, media_dict, detect_language=False, occurrences=occurrences)
+            else:
+                if retweet_dates is not None and tweets:
+                    record_retweet_dates(tweets, retweets_dict, retweet_dates)
+                tweets_dict, retweets_dict, replies_dict, quotes_dict = extractTweetsFromDict(tweets, tweets_dict, True, users_dict, places_dict, retweets_dict, replies_dict, quotes_dict, media_dict, detect_language=False, occurrences=occurrences)
+    return tweets_dict, retweets_dict, replies_dict, quotes_dict
+
+
+LINK_FIELDS = ['repliesTweets', 'repliesTimes', 'retweeters', 'retweetTimes', 'quoteTweets', 'quoters', 'quoteTimes']
+
+
+def reply_links(k, j, reply):
+    """A function to get the (field, value) links that a reply j adds to the tweet k it replies to."""
+    return [('repliesTweets', j), ('repliesTimes', f"{reply['userScreenName']} {reply['createdAt']}")]
+
+
+def interaction_time(item):
+    """A function to get the "screen name day" (or the user id) of a retweet or quote, as listed in the retweetTimes and quoteTimes."""
+    if 'createdAtDays' in item.keys():
+        return f"{item['userScreenName']} {item['createdAtDays']}"
+    elif 'createdAt' in item.keys():
+        return f"{item['userScreenName']} {item['createdAt'][0:10]}"
+    return f"{item['userId']}"
+
+
+def retweet_links(k, j, retweet):
+    """A function to get the (field, value) links that a retweet j adds to the tweet k it retweets."""
+    return [('retweeters', retweet['userScreenName']), ('retweetTimes', interaction_time(retweet))]
+
+
+def quote_links(k, j, quote):
+    """A function to get the (field, value) links that a quote j adds to the tweet k it quotes."""
+    return [('quoteTweets', j), ('quoters', quote['userScreenName']), ('quoteTimes', interaction_time(quote))]
+
+
+def combined_documents(tweets_dict, replies_dict, quotes_dict):
+    """A function to get the records of the extracted tweets, then of the replies and quotes that are not among them.
+
+    Returns:
+        dict: The records by tweet id.
+    """
+    combined_dict = tweets_dict.copy()
+    for nested in (replies_dict, quotes_dict):
+        for k in nested.keys():
+            for j in nested[k].keys():
+                if j not in combined_dict.keys():
+                    combined_dict[j] = nested[k][j]
+    return combined_dict
+
+
+def interaction_links(retweets_dict, replies_dict, quotes_dict):
+    """A function to get the links between the tweets and their replies, retweets and quotes, in the order they were seen.
+
+    Returns:
+        generator: The (tweet id, field, value) links, e.g. ('123', 'retweeters', 'screen_name').
+    """
+    for nested, links in ((replies_dict, reply_links), (retweets_dict, retweet_links), (quotes_dict, quote_links)):
+        for k in nested.keys():
+            for j in nested[k].keys():
+                for field, value in links(k, j, nested[k][j]):
+                    yield k, field, value
+
+
+def combine_extracted(tweets_dict, retweets_dict, replies_dict, quotes_dict):
+    """A function to combine the extracted tweets, replies and quotes into one record per tweet, with the replies,
+    retweets and quotes of each tweet. Each linked value is listed once, in the order it was seen.
+
+    Returns:
+        dict: The combined records by tweet id.
+    """
+    combined_dict = combined_documents(tweets_dict, replies_dict, quotes_dict)
+    seen = dict()
+    for k, field, value in interaction_links(retweets_dict, replies_dict, quotes_dict):
+        if k in combined_dict.keys():
+            if (k, field) not in seen:
+                seen[(k, field)] = set()
+                combined_dict[k][field] = []
+            if value not in seen[(k, field)]:
+                seen[(k, field)].add(value)
+                combined_dict[k][field].append(value)
+    return combined_dict
+
+
+def extracted_records(tweets_dict, retweets_dict, replies_dict, quotes_dict):
+    """A function to get the extracted tweets of a file as records for the join store (see join_store.py).
+
+    Returns:
+        generator: The ('document', tweet id, record) and ('link', tweet id, field, value) records.
+    """
+    for k, document in combined_documents(tweets_dict, replies_dict, quotes_dict).items():
+        yield 'document', k, document
+    for k, field, value in interaction_links(retweets_dict, replies_dict, quotes_dict):
+        yield 'link', k, field, value
+
+
+def write_combined(combined_dict, output_path):
+    """A function to append the combined records to an output file, one JSON record per line.
+
+    Args:
+        combined_dict (dict): The combined records (see combine_extracted).
+        output_path (str): The path of the output file.
+    """
+    with open(output_path, 'a+', encoding='utf-8') as fout:
+        for k in combined_dict.keys():
+            fout.write(f"{json.dumps(combined_dict[k], ensure_ascii=False)}\n")
+
+
+def add_extracted_languages(tweets_dict, replies_dict, quotes_dict):
+    """A function to identify the languages of the extracted tweets, replies and quotes at once, in batches."""
+    add_languages(list(tweets_dict.values()) + [tweet for nested in (replies_dict, quotes_dict) for tweets in nested.values() for tweet in tweets.values()])
+
+
+def extract_file_dicts(workFile):
+    """A function to extract the tweets of a raw file, with their languages.
+
+    Args:
+        workFile (str): The path of the raw file.
+
+    Returns:
+        tuple: The tweets_dict, retweets_dict, replies_dict and quotes_dict, or None if the file could not be read.
+    """
+    try:
+        tweets_dict, retweets_dict, replies_dict, quotes_dict = extract_responses(read_responses(workFile))
+    except Exception as exp:
+        print(f"[{__name__}]: Error while reading the file {workFile}: {exp}")
+        return None
+    add_extracted_languages(tweets_dict, replies_dict, quotes_dict)
+    return tweets_dict, retweets_dict, replies_dict, quotes_dict
+
+
+def extract_file(workFile):
+    """A function to extract and combine the tweets of a raw file, as the serial run does.
+
+    Args:
+        workFile (str): The path of the raw file.
+
+    Returns:
+        dict: The combined records by tweet id, or None if the file could not be read.
+    """
+    extracted = extract_file_dicts(workFile)
+    return None if extracted is None else combine_extracted(*extracted)
+
+
+def extract_file_to(workFile, part_path, records=False):
+    """A function (run by the workers) to extract a raw file into a temporary file.
+
+    Args:
+        records (bool): Whether to write the records for the join store (see extracted_records), one JSON list per
+            line, instead of the combined records.
+
+    Returns:
+        bool: Whether the file could be read.
+    """
+    extracted = extract_file_dicts(workFile)
+    if extracted is None:
+        return False
+    if exists(part_path):
+        remove(part_path)
+    if records:
+        with open(part_path, 'w', encoding='utf-8') as fout:
+            for record in extracted_records(*extracted):
+                fout.write(f"{json.dumps(record, ensure_ascii=False)}\n")
+    else:
+        write_combined(combine_extracted(*extracted), part_path)
+    return True
+
+
+def read_records(part_path):
+    """A function to read the records (or the combined records) written by extract_file_to."""
+    with open(part_path, 'r', encoding='utf-8') as fin:
+        for line in fin:
+            yield json.loads(line)
+
+
+class OutputFolder:
+    """Appends the combined records to the output files of the raw files, one JSON record per line."""
+
+    def __init__(self, folder):
+        """Initialises the output folder.
+
+        Args:
+            folder (str): The folder of the output files.
+        """
+        self.folder = folder
+        self.outputs = []
+
+    def tee(self, output, documents):
+        """A generator that appends the records to an output file as they go through it.
+
+        Args:
+            output (str): The name of the output file.
+            documents (iterable): The combined records.
+        """
+        if output not in self.outputs:
+            self.outputs.append(output)
+        with open(join(self.folder, output), 'a+', encoding='utf-8') as fout:
+            for document in documents:
+                fout.write(f"{json.dumps(document, ensure_ascii=False)}\n")
+                yield document
+
+    def write(self, output, documents):
+        """Appends the records to an output file.
+
+        Returns:
+            int: The number of written records.
+        """
+        return sum(1 for _ in self.tee(output, documents))
+
+    def write_file(self, output, path):
+        """Appends a file of records written by extract_file_to to an output file."""
+        if output not in self.outputs:
+            self.outputs.append(output)
+        with open(path, 'rb') as fin, open(join(self.folder, output), 'ab') as fout:
+            shutil.copyfileobj(fin, fout)
+
+    def flush(self):
+        """Returns the number of records that could not be written (always 0, the records are written at once)."""
+        return 0
+
+    def close(self):
+        return 0
+
+
+def referenced_ids(object_, users, places, media):
+    """A function to add the ids of the user, place and media that a raw tweet object references to the given sets."""
+    for item in (object_ if type(object_) == list else [object_]):
+        try:
+            if 'author_id' in item.keys():
+                users.add(item['author_id'])
+            if 'geo' in item.keys() and 'place_id' in item['geo'].keys():
+                places.add(item['geo']['place_id'])
+            if 'attachments' in item.keys() and 'media_keys' in item['attachments'].keys():
+                media.update(item['attachments']['media_keys'])
+        except Exception:
+            pass
+
+
+def scan_chunk(workFile, start, end):
+    """A function (run by the workers) to scan the users, places and media that a chunk of a file defines and references.
+
+    Returns:
+        tuple: The (users, places, media) defined by the chunk (first seen wins), and the (users, places, media) ids
+            referenced by its tweets, or None if the chunk could not be read.
+    """
+    users_dict, places_dict, media_dict = dict(), dict(), dict()
+    users_ids, places_ids, media_ids = set(), set(), set()
+    try:
+        for objects in read_responses(workFile, start, end):
+            if objects != None:
+                tweets, users, includes, places, media, poll = extract_raw_responses(objects)
+                places_dict = extractResponseContentsFromDict(places, places_dict)
+                media_dict = extractMediaContentsFromDict(media, media_dict)
+                users_dict = extractResponseContentsFromDict(users, users_dict)
+                for object_ in [includes, tweets]:
+                    if object_:
+                        referenced_ids(object_, users_ids, places_ids, media_ids)
+    except Exception as exp:
+        print(f"[{__name__}]: Error while reading the file {workFile}: {exp}")
+        return None
+    return (users_dict, places_dict, media_dict), (users_ids, places_ids, media_ids)
+
+
+def extract_chunk(workFile, start, end, seeds):
+    """A function (run by the workers) to extract the tweets of a chunk of a file, with their languages.
+
+    Args:
+        seeds (tuple): The (users, places, media) that earlier chunks define and the chunk references.
+
+    Returns:
+        tuple: The tweets_dict, retweets_dict, replies_dict, quotes_dict, occurrences and retweet dates of the chunk, or
+            None if the chunk could not be read.
+    """
+    occurrences = []
+    retweet_dates = dict()
+    try:
+        extracted = extract_responses(read_responses(workFile, start, end), seeds, occurrences, retweet_dates)
+    except Exception as exp:
+        print(f"[{__name__}]: Error while reading the file {workFile}: {exp}")
+        return None
+    tweets_dict, retweets_dict, replies_dict, quotes_dict = extracted
+    add_extracted_languages(tweets_dict, replies_dict, quotes_dict)
+    # Only the dates of the first retweets recorded without their date are needed.
+    retweet_dates = {(k, j): date for (k, j), date in retweet_dates.items() if k in retweets_dict and j in retweets_dict[k] and 'createdAt' not in retweets_dict[k][j]}
+    return tweets_dict, retweets_dict, replies_dict, quotes_dict, occurrences, retweet_dates
+
+
+def chunk_seeds(scans):
+    """A function to compute the seeds of the chunks of a file from their scans (see scan_chunk).
+
+    Returns:
+        list: The (users, places, media) seeds of each chunk.
+    """
+    defined = (dict(), dict(), dict())
+    seeds = []
+    for chunk_defined, chunk_referenced in scans:
+        seeds.append(tuple({id_: known[id_] for id_ in ids if id_ in known} for known, ids in zip(defined, chunk_referenced)))
+        for known, items in zip(defined, chunk_defined):
+            for id_, item in items.items():
+                if id_ not in known:
+                    known[id_] = item
+    return seeds
+
+
+def merge_nested(merged, chunk):
+    """A function to merge the retweets, replies or quotes of a chunk into those of the earlier chunks (first seen wins)."""
+    for k, items in chunk.items():
+        if k not in merged:
+            merged[k] = items
+        else:
+            for j, item in items.items():
+                if j not in merged[k]:
+                    merged[k][j] = item
+
+
+def merge_retweets(merged, chunk, retweet_dates):
+    """A function to merge the retweets of a chunk into those of the earlier chunks (first seen wins). The first retweet
+    of a tweet in the chunk by an unknown user was recorded without its date; it gets it if earlier chunks retweeted the
+    tweet, as it would have in the serial run."""
+    for k, items in chunk.items():
+        if k in merged:
+            for j, item in items.items():
+                if item['userScreenName'] is None and 'createdAt' not in item and (k, j) in retweet_dates:
+                    item['createdAt'] = retweet_dates[(k, j)]
+                break
+    merge_nested(merged, chunk)
+
+
+def merge_chunks(chunks):
+    """A function to merge the extracted chunks of a file, in their order, as if the file were extracted at once.
+
+    Args:
+        chunks (list): The results of extract_chunk for each chunk of the file.
+
+    Returns:
+        tuple: The tweets_dict, retweets_dict, replies_dict and quotes_dict of the file.
+    """
+    tweets_dict, retweets_dict, replies_dict, quotes_dict = dict(), dict(), dict(), dict()
+    for chunk_tweets, chunk_retweets, chunk_replies, chunk_quotes, occurrences, retweet_dates in chunks:
+        # The copies of tweets seen in earlier chunks update their counts, in order.
+        for id_, counts in occurrences:
+            if id_ in tweets_dict:
+                updateTweetCounts(tweets_dict[id_], counts)
+        for id_, tweet in chunk_tweets.items():
+            if id_ not in tweets_dict:
+                tweets_dict[id_] = tweet
+        merge_retweets(retweets_dict, chunk_retweets, retweet_dates)
+        merge_nested(replies_dict, chunk_replies)
+        merge_nested(quotes_dict, chunk_quotes)
+    return tweets_dict, retweets_dict, replies_dict, quotes_dict
+
+
+class ParallelExtraction:
+    """Extracts raw files with a pool of processes, writing their output (or adding them to the join store) in the sorted
+    order of the files."""
+
+    def __init__(self, workfiles, output_folder, workers, chunk_size, max_tasks_per_worker=None, logger=None, join_store=None, sink=None):
+        """Initialises the extraction.
+
+        Args:
+            workfiles (list): The paths of the raw files.
+            output_folder (str): The folder to write the processed tweets to.
+            workers (int): The number of worker processes.
+            chunk_size (int): The size in bytes above which files are split into chunks (0 to not split them).
+            max_tasks_per_worker (int): The number of tasks after which a worker process is replaced, to release its
+                memory (None to keep the workers).
+            logger (Logger): The logger of the run.
+            join_store (JoinStore): The store to add the records of the files to, or None to write them to the sink.
+            sink (OutputFolder|SolrIngestion): Where to write the records of the files without a join store (the
+                output folder by default).
+        """
+        self.workfiles = sorted(workfiles)
+        self.output_folder = output_folder
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.logger = logger
+        self.join_store = join_store
+        self.sink = sink if sink is not None else OutputFolder(output_folder)
+
+    def log(self, message):
+        if self.logger:
+            self.logger.info(message)
+        else:
+            print(message)
+
+    def submit(self, pool, index, workFile):
+        """Starts the extraction of a file: the whole file, or the scan of its chunks."""
+        job = {'index': index, 'workFile': workFile, 'chunks': find_chunks(workFile, self.chunk_size) if exists(workFile) else []}
+        if len(job['chunks']) == 1:
+            job['part'] = join(self.output_folder, f".{output_file_name(workFile)}.{index}.part")
+            job['result'] = pool.apply_async(extract_file_to, (workFile, job['part'], self.join_store is not None))
+        elif len(job['chunks']) > 1:
+            job['scans'] = [pool.apply_async(scan_chunk, (workFile, start, end)) for start, end in job['chunks']]
+        return job
+
+    def finish(self, pool, job):
+        """Waits for the extraction of a file and writes it to the sink (or adds it to the join store).
+
+        Returns:
+            bool: Whether the file was extracted.
+        """
+        workFile = job['workFile']
+        if len(job['chunks']) == 0:
+            return False
+        if len(job['chunks']) == 1:
+            if not job['result'].get():
+                return False
+            if self.join_store is not None:
+                self.join_store.add_records(output_file_name(workFile), read_records(job['part']))
+            else:
+                self.sink.write_file(output_file_name(workFile), job['part'])
+            remove(job['part'])
+            return True
+
+        self.log(f"[{__name__}]: {workFile} split into {len(job['chunks'])} chunks")
+        scans = [scan.get() for scan in job['scans']]
+        if None in scans:
+            return False
+        results = [pool.apply_async(extract_chunk, (workFile, start, end, seeds)) for (start, end), seeds in zip(job['chunks'], chunk_seeds(scans))]
+        del scans
+        chunks = [result.get() for result in results]
+        if None in chunks:
+            return False
+        if self.join_store is not None:
+            self.join_store.add_records(output_file_name(workFile), extracted_records(*merge_chunks(chunks)))
+        else:
+            self.sink.write(output_file_name(workFile), combine_extracted(*merge_chunks(chunks)).values())
+        return True
+
+    def run(self):
+        """Extracts the files, and compresses each raw file once its output is written. With a join store, the output
+        is only written when the store is emitted, so the raw files are left for the caller to compress after that
+        (see compress_files): a run interrupted before then extracts them again.
+
+        Returns:
+            list: The extracted raw files that were not compressed.
+        """
+        try:
+            # The language model is loaded before the workers are forked, so that they share it.
+            get_language_identifier().get_model()
+        except Exception as exp:
+            self.log(f"[{__name__}]: The language identification model could not be preloaded: {exp}")
+        pending = deque()
+        compressions = []
+        extracted = []
+        files = iter(enumerate(self.workfiles))
+        with Pool(self.workers, maxtasksperchild=self.max_tasks_per_worker) as pool:
+            while True:
+                # A few files ahead are started, so that the workers are busy while the outputs are written in order.
+                while len(pending) < 2 * self.workers:
+                    item = next(files, None)
+                    if item is None:
+                        break
+                    pending.append(self.submit(pool, *item))
+                if len(pending) == 0:
+                    break
+                job = pending.popleft()
+                self.log(f"[{__name__}]: {job['workFile']}")
+                if self.finish(pool, job):
+                    if self.join_store is not None:
+                        extracted.append(job['workFile'])
+                    else:
+                        compressions.append(pool.apply_async(compress_file, (job['workFile'], f"{job['workFile']}.tar.gz")))
+            for compression in compressions:
+                compression.get()
+        return extracted
+
+
+def compress_files(workfiles, workers=1):
+    """A function to compress raw files once their output is written, with a pool of processes if there is more than one
+    worker.
+
+    Args:
+        workfiles (list): The paths of the raw files.
+        workers (int): The number of worker processes.
+    """
+    if workers > 1 and len(workfiles) > 1:
+        with Pool(min(workers, len(workfiles))) as pool:
+            pool.starmap(compress_file, [(workFile, f"{workFile}.tar.gz") for workFile in workfiles])
+    else:
+        for workFile in workfiles:
+            compress_file(workFile, f"{workFile}.tar.gz")
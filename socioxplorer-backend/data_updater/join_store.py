@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+"""
+A disk-backed store that joins the extracted tweets with their replies, retweets and quotes across all the raw files of
+1_extract_data.py, instead of within each file.
+
+By default, the store belongs to the run: it is created in the output folder and removed at the end of the run. It can
+be kept across the runs of the same dataset (1_extract_data.py -kj, or -js for another path), so that the tweets of a
+run are joined with the ones of the earlier runs. A kept store should not be shared by different datasets: a link from
+a dataset to a tweet of another one would write that tweet to the output of the first one.
+
+The records of the tweets are kept in a SQLite database, the first copy seen wins and the counts are the maximum of all
+the copies. The links of the tweets (repliesTweets, retweeters, quoteTimes...) are kept as sets per tweet and field,
+listed in the order they were first seen. Once the files of a run are added, the records that are new or got new links
+or copies are emitted in one streaming pass, with all their links whatever file or run they came from, to the output
+file of the raw file they were first seen in. Links to tweets that are not in the store yet are kept until the tweets
+arrive, for a number of runs after they were last seen (see prune). Only a batch of records is held in memory at a time.
+The emitted records can also be sent straight to a Solr core (see solr_ingest.py) instead of the output files.
+"""
+import os
+import json
+import sqlite3
+from itertools import groupby
+from operator import itemgetter
+from os.path import exists, dirname
+from extraction import LINK_FIELDS
+
+COUNT_FIELDS = ['retweetCount', 'replyCount', 'favoriteCount', 'quoteCount']
+BATCH_SIZE = 10000
+CACHE_SIZE_KIB = 65536
+
+
+def count_value(value):
+    """A function to get a count of a record as stored (None if it is not a number)."""
+    return value if type(value) in (int, float) else None
+
+
+class JoinStore:
+    """Joins the extracted tweets of many raw files in a SQLite database."""
+
+    def __init__(self, path):
+        """Opens (or creates) the store.
+
+        Args:
+            path (str): The path of the SQLite database.
+        """
+        self.path = path
+        if dirname(path) and not exists(dirname(path)):
+            os.makedirs(dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KIB}')
+        self._connection.execute(f'CREATE TABLE IF NOT EXISTS documents (seq INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, output TEXT NOT NULL, document TEXT NOT NULL, {", ".join(COUNT_FIELDS)}, dirty INTEGER NOT NULL)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS documents_dirty ON documents (output, seq) WHERE dirty = 1')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS links (seq INTEGER PRIMARY KEY, target TEXT NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL, run INTEGER NOT NULL DEFAULT 0, UNIQUE (target, field, value))')
+        if 'run' not in [column[1] for column in self._connection.execute('PRAGMA table_info(links)')]:
+            # Stores created before the links were numbered by run.
+            self._connection.execute('ALTER TABLE links ADD COLUMN run INTEGER NOT NULL DEFAULT 0')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        # The number of the run, which the links added or seen again by the run are stamped with.
+        self._connection.execute("INSERT INTO meta (name, value) VALUES ('runs', 1) ON CONFLICT (name) DO UPDATE SET value = value + 1")
+        self.run = self._connection.execute("SELECT value FROM meta WHERE name = 'runs'").fetchone()[0]
+
+    def _flush(self, output, documents, links):
+        """Writes a batch of records."""
+        if len(documents) > 0:
+            self._connection.executemany(f'INSERT OR IGNORE INTO documents (id, output, document, {", ".join(COUNT_FIELDS)}, dirty) VALUES (?, ?, ?, ?, ?, ?, ?, 1)',
+                                         [(k, output, json.dumps(document, ensure_ascii=False), *[count_value(document.get(field)) for field in COUNT_FIELDS]) for k, document in documents])
+            # The copies of the records already stored update their counts.
+            self._connection.executemany(f'UPDATE documents SET {", ".join(f"{field} = max(coalesce({field}, ?{i}), coalesce(?{i}, {field}))" for i, field in enumerate(COUNT_FIELDS, 1))}, dirty = 1 WHERE id = ?{len(COUNT_FIELDS) + 1}',
+                                         [(*[count_value(document.get(field)) for field in COUNT_FIELDS], k) for k, document in documents])
+        if len(links) > 0:
+            self._connection.executemany('INSERT INTO links (target, field, value, run) VALUES (?, ?, ?, ?) ON CONFLICT (target, field, value) DO UPDATE SET run = excluded.run',
+                                         [(*link, self.run) for link in links])
+            self._connection.executemany('UPDATE documents SET dirty = 1 WHERE id = ? AND dirty = 0', [(k,) for k in set(k for k, _, _ in links)])
+
+    def add_records(self, output, records):
+        """Adds the records of a raw file, in one transaction.
+
+        Args:
+            output (str): The name of the output file of the raw file.
+            records (iterable): The ('document', tweet id, record) and ('link', tweet id, field, value) records (see
+                extraction.extracted_records).
+        """
+        documents, links = [], []
+        self._connection.execute('BEGIN')
+        try:
+            for record in records:
+                if record[0] == 'document':
+                    documents.append((record[1], record[2]))
+                else:
+                    links.append((record[1], record[2], json.dumps(record[3], ensure_ascii=False)))
+                if len(documents) + len(links) >= BATCH_SIZE:
+                    self._flush(output, documents, links)
+                    documents, links = [], []
+            self._flush(output, documents, links)
+            self._connection.execute('COMMIT')
+        except Exception:
+            self._connection.execute('ROLLBACK')
+            raise
+
+    def dirty_documents(self):
+        """Yields the new and updated records, with all their links, in the order of their output files.
+
+        Returns:
+            generator: The (output file name, record) of the records.
+        """
+        links = self._connection.cursor()
+        for k, output, document, *counts in self._connection.execute(f'SELECT id, output, document, {", ".join(COUNT_FIELDS)} FROM documents WHERE dirty = 1 ORDER BY output, seq'):
+            document = json.loads(document)
+            for field, count in zip(COUNT_FIELDS, counts):
+                if count is not None and field in document.keys():
+                    document[field] = count
+            values = dict()
+            for field, value in links.execute('SELECT field, value FROM links WHERE target = ? ORDER BY seq', (k,)):
+                values.setdefault(field, []).append(json.loads(value))
+            for field in LINK_FIELDS:
+                if field in values.keys():
+                    document[field] = values[field]
+            yield output, document
+
+    def emit(self, sink):
+        """Writes the new and updated records, with all their links, to a sink: appended to their output files, one JSON
+        record per line (extraction.OutputFolder), or sent to a Solr core (solr_ingest.SolrIngestion). The records stay
+        new if the sink could not write all of them, so that the next run emits them again.
+
+        Args:
+            sink (OutputFolder|SolrIngestion): Where to write the records.
+
+        Returns:
+            int: The number of emitted records.
+        """
+        emitted = 0
+        for output, documents in groupby(self.dirty_documents(), key=itemgetter(0)):
+            emitted += sink.write(output, (document for _, document in documents))
+        if sink.flush() == 0:
+            self._connection.execute('UPDATE documents SET dirty = 0 WHERE dirty = 1')
+        return emitted
+
+    def prune(self, max_runs):
+        """Removes the links to tweets that are still not in the store max_runs runs after they were last seen.
+
+        Args:
+            max_runs (int): The number of runs that the links to missing tweets are kept for.
+
+        Returns:
+            int: The number of removed links.
+        """
+        return self._connection.execute('DELETE FROM links WHERE run <= ? AND NOT EXISTS (SELECT 1 FROM documents WHERE documents.id = links.target)',
+                                        (self.run - max_runs,)).rowcount
+
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+
+    def close(self):
+        self._connection.close()
+
+    def remove(self):
+        """Closes the store and removes its database (and its folder if it is left empty), at the end of the run it belongs
+        to."""
+        self.close()
+        for path in [self.path, f'{self.path}-wal', f'{self.path}-shm']:
+            if exists(path):
+                os.remove(path)
+        if dirname(self.path):
+            try:
+                os.rmdir(dirname(self.path))
+            except OSError:
+                pass
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+from os.path import join, exists
+
+"""This file contains the building blocks of the pipelined updaters: a Pipeline of threaded stages joined by bounded
+queues (a full queue blocks the stage that feeds it, so a slow stage slows down the ones before it instead of letting
+the data pile up in memory), and a Checkpoint file that records how far an updater went so it can resume after a crash.
+"""
+
+_END = object()
+POLL_INTERVAL = 0.5
+
+
+class PipelineError(Exception):
+    """ Raised by Pipeline.run when a stage failed. """
+    pass
+
+
+class Pipeline:
+    """ A source and a chain of stages, each run by its own thread(s) and joined by bounded queues.
+    """
+
+    def __init__(self, name, queue_size, logger):
+        """ Initialises an empty pipeline.
+
+        Args:
+            :name: (str) Name of the pipeline, used in the logs.
+            :queue_size: (int) Maximum number of items waiting between two stages.
+            :logger: (logging.Logger) The logger of the updater.
+        """
+        self.name = name
+        self.queue_size = queue_size
+        self.logger = logger
+        self.source = None
+        self.stages = []
+        self.stop_event = threading.Event()
+        self.errors = []
+        self.stats = dict()
+
+    def set_source(self, name, generator):
+        """ Sets the first stage of the pipeline.
+
+        Args:
+            :name: (str) Name of the stage.
+            :generator: (callable) Called without arguments, returns an iterable over the items to process.
+        """
+        self.source = (name, generator)
+        self.stats[name] = {'items': 0, 'busy': 0.0}
+        return self
+
+    def add_stage(self, name, func, workers=1):
+        """ Appends a stage to the pipeline.
+
+        Args:
+            :name: (str) Name of the stage.
+            :func: (callable) Called with each item of the previous stage. Returns an iterable over the items to pass \
+                to the next stage (or None). The return value of the last stage is ignored.
+            :workers: (int, optional) Number of threads running the stage concurrently. Defaults to 1.
+        """
+        self.stages.append((name, func, workers))
+        self.stats[name] = {'items': 0, 'busy': 0.0}
+        return self
+
+    def _put(self, q, item):
+        while not self.stop_event.is_set():
+            try:
+                q.put(item, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self.stop_event.is_set():
+            try:
+                return q.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _fail(self, name, exp):
+        self.logger.warning(f'[{self.name}]: [Exception] in stage {name}: {exp}')
+        self.logger.warning(traceback.format_exc())
+        self.errors.append((name, exp))
+        self.stop_event.set()
+
+    def _run_source(self, name, generator, out_q):
+        try:
+            iterator = iter(generator())
+            while not self.stop_event.is_set():
+                start = time.time()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                self.stats[name]['busy'] += time.time() - start
+                self.stats[name]['items'] += 1
+                if not self._put(out_q, item):
+                    break
+        except BaseException as exp:
+            self._fail(name, exp)
+        finally:
+            self._put(out_q, _END)
+
+    def _run_stage(self, name, func, in_q, out_q, finished, lock):
+        try:
+            while True:
+                item = self._get(in_q)
+                if item is _END:
+                    # Lets the other threads of the stage see the end of the input too.
+                    self._put(in_q, _END)
+                    break
+                start = time.time()
+                outputs = func(item)
+                if outputs is not None and out_q is not None:
+                    for output in outputs:
+                        if not self._put(out_q, output):
+                            break
+                with lock:
+                    self.stats[name]['busy'] += time.time() - start
+                    self.stats[name]['items'] += 1
+        except BaseException as exp:
+            self._fail(name, exp)
+        finally:
+            with lock:
+                finished[0] += 1
+                last = finished[0] == finished[1]
+            if last and out_q is not None:
+                self._put(out_q, _END)
+
+    def run(self):
+        """ Runs the pipeline until the source is exhausted and all the items went through the stages, or a stage \
+        failed.
+
+        Returns:
+            :dict: The number of items processed and the busy time (in seconds) of each stage.
+
+        Raises:
+            :PipelineError: If a stage raised an exception (the other stages are stopped).
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        threads = [threading.Thread(target=self._run_source, args=(self.source[0], self.source[1], queues[0]), name=self.source[0], daemon=True)]
+        for i, (name, func, workers) in enumerate(self.stages):
+            out_q = queues[i + 1] if i + 1 < len(queues) else None
+            finished, lock = [0, workers], threading.Lock()
+            for w in range(workers):
+                threads.append(threading.Thread(target=self._run_stage, args=(name, func, queues[i], out_q, finished, lock), name=f'{name}-{w}', daemon=True))
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - start
+        for name, stats in self.stats.items():
+            self.logger.info(f"[{self.name}]: stage {name}: {stats['items']} items, busy {stats['busy']:.1f}s of {elapsed:.1f}s")
+        if len(self.errors) > 0:
+            raise PipelineError(f'Stage {self.errors[0][0]} failed: {self.errors[0][1]}')
+        return self.stats
+
+
+class Checkpoint:
+    """ The progress of an updater over a cursor-based scan of a core. Batches are numbered in the order they are \
+    fetched; the saved cursor mark is the one after the last batch such that it and all the batches before it are \
+    written to Solr, so batches that complete out of order are never skipped on resume.
+    """
+
+    def __init__(self, folder, name, params):
+        """ Initialises the checkpoint.
+
+        Args:
+            :folder: (str) Folder of the checkpoint files.
+            :name: (str) Name of the checkpoint (e.g. "sentiments_new_core").
+            :params: (dict) Parameters of the run (e.g. the query string). A saved checkpoint is only resumed by a run \
+                with the same parameters.
+        """
+        self.path = join(folder, f'{name}.json')
+        self.params = params
+        self.lock = threading.Lock()
+        self.cursors = dict()
+        self.done = set()
+        self.next_batch = 0
+        self.written = 0
+        if not exists(folder):
+            os.makedirs(folder)
+
+    def load(self):
+        """ Returns the cursor mark to resume from.
+
+        Returns:
+            :str: The saved cursor mark, or None if there is no checkpoint for these parameters.
+        """
+        try:
+            with open(self.path, 'r') as fin:
+                saved = json.load(fin)
+            if saved.get('params') == self.params:
+                self.written = saved.get('written', 0)
+                return saved['cursor_mark']
+        except Exception:
+            pass
+        return None
+
+    def register(self, batch, cursor_mark):
+        """ Records the cursor mark reached after fetching a batch.
+
+        Args:
+            :batch: (int) Number of the batch.
+            :cursor_mark: (str) The cursor mark after the batch.
+        """
+        with self.lock:
+            self.cursors[batch] = cursor_mark
+
+    def complete(self, batches, written=0):
+        """ Marks batches as written to Solr, and saves the checkpoint if the contiguous prefix of written batches grew.
+
+        Args:
+            :batches: (iterable[int]) The batches whose items are all written.
+            :written: (int, optional) The number of items written.
+        """
+        with self.lock:
+            self.done.update(batches)
+            self.written += written
+            cursor_mark = None
+            while self.next_batch in self.done:
+                cursor_mark = self.cursors.pop(self.next_batch)
+                self.done.discard(self.next_batch)
+                self.next_batch += 1
+            if cursor_mark is not None:
+                tmp_path = f'{self.path}.tmp'
+                with open(tmp_path, 'w') as fout:
+                    json.dump({'params': self.params, 'cursor_mark': cursor_mark, 'written': self.written, 'updated': time.time()}, fout)
+                os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """ Removes the checkpoint, once the scan is complete. """
+        if exists(self.path):
+            os.remove(self.path)
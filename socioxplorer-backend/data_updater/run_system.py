@@ -42,7 +42,8 @@ IMPORT_DATA_TO_SOLR_SERVICE_PATH = ApplicationPaths.IMPORT_DATA_TO_SOLR_SERVICE_
 IMPORT_YOUTUBE_DATA_TO_SOLR_SERVICE_PATH = ApplicationPaths.IMPORT_YOUTUBE_DATA_TO_SOLR_SERVICE_PATH
 LOCATION_CLIENT_PATH = ApplicationPaths.LOCATION_CLIENT_PATH
 SENTIMENT_CLIENT_PATH = ApplicationPaths.SENTIMENT_CLIENT_PATH
-LOCATION_GUNICORN_COMMAND = f"gunicorn -b 0.0.0.0:{LOCATION_API_PORT} -t 1000 {ApplicationPaths.LOCATION_API_CODE}:app --workers={workers} --threads={threads}"
+# The binary gazetteer is (re)built if needed before the location API starts, so that all its workers map the same file.
+LOCATION_GUNICORN_COMMAND = f"python build_gazetteer.py; gunicorn -b 0.0.0.0:{LOCATION_API_PORT} -t 1000 {ApplicationPaths.LOCATION_API_CODE}:app --workers={workers} --threads={threads}"
 SENTIMENT_GUNICORN_COMMAND = f"gunicorn -b 0.0.0.0:{SENTIMENT_API_PORT} -t 1000 {ApplicationPaths.SENTIMENT_API_CODE}:app --workers={workers} --threads={threads}"
 TOPICS_EXTRACTION_PATH = ApplicationPaths.TOPICS_EXTRACTION_PATH
 NETWORK_INTERACTION_PATH = ApplicationPaths.NETWORK_INTERACTION_PATH
@@ -186,12 +187,13 @@ def handleProcessing(service=None, core = None, queryString = {}):
     else:
         logger.warning(f"[{handleProcessing.__name__}]: {service.capitalize()} API is not running. The client service will not be started.")
 
-def handleDataExtraction(dataSource, youTube=False):
+def handleDataExtraction(dataSource, youTube=False, core=None):
     """Run the data extraction script on the specified data source.
 
     Args:
         dataSource (str): Path of the data source directory containing files to process.
         youTube (bool, optional): If True, uses the YouTube data extraction script. Defaults to False.
+        core (str, optional): The Solr core that the extraction script adds the tweets to as they are extracted (Twitter only), instead of writing them for the import script. Defaults to None.
     """
     # Ensure the dataSource is a valid directory
     if not os.path.isdir(dataSource):
@@ -205,7 +207,8 @@ def handleDataExtraction(dataSource, youTube=False):
     script_path = YOUTUBE_DATA_EXTRACTION_SERVICE_PATH if youTube else DATA_EXTRACTION_SERVICE_PATH
     
     try:
-        result = subprocess.run([f"python3 {script_path} -s {dataSource}  -o {output_dir}"], 
+        core_option = f" -c {core}" if core and not youTube else ""
+        result = subprocess.run([f"python3 {script_path} -s {dataSource}  -o {output_dir}{core_option}"], 
                                 check=True, text=True, shell=True, executable='/bin/bash')
         logger.info(f"[{handleDataExtraction.__name__}]: Data extraction completed successfully.")
 
@@ -366,8 +369,11 @@ def main():
         
         
         if coreTwitter and twitterDataSource:
-            handleDataExtraction(twitterDataSource, youTube=False)
-            handleDataImportToSolr(coreTwitter, f"{twitterDataSource}_processed", youTube=False)
+            if ApplicationConfig.EXTRACTION_STREAM_TO_SOLR:
+                handleDataExtraction(twitterDataSource, youTube=False, core=coreTwitter)
+            else:
+                handleDataExtraction(twitterDataSource, youTube=False)
+                handleDataImportToSolr(coreTwitter, f"{twitterDataSource}_processed", youTube=False)
         
         
         if coreYouTube and youtubeDataSource:
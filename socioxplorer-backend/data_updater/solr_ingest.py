@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+"""
+Streaming ingestion of the extracted tweets into a Solr core, for 1_extract_data.py.
+
+Without it, 1_extract_data.py writes the combined records to the processed files, and 2_import_data_to_solr.py reads
+them back, parses every line and buffers them before adding them to Solr. With a SolrIngestion as the sink of the
+extraction (or of the join store), the records go from the extraction straight to the core through a chain of
+generators: the archive tee (optional, which still writes the processed files), the renames of the fields that the
+import scripts apply, and the batches of records, which a writer thread adds to Solr while the extraction goes on.
+
+The records that Solr could not add are retried with the next batch, and once more when the ingestion is flushed. At
+most max_failed of them are kept in memory for that, the others are appended to a replay file (one JSON record per
+line) that 2_import_data_to_solr.py can import later, so that a long outage of Solr does not exhaust the memory. The
+archive files are compressed once all their records are added, as 2_import_data_to_solr.py does with the processed
+files, and are kept otherwise so that they can be imported again.
+"""
+import json
+import queue
+import threading
+from os.path import join
+from utils import compress_file
+from extraction import OutputFolder, read_records
+from solr_class import SolrClass
+
+# The fields of the YouTube records, renamed to the fields of the cores by the import scripts.
+SOLR_FIELD_RENAMES = [('defaultLanguage', 'languagePlatform'),
+                      ('textOriginal', 'originalText'),
+                      ('authorDisplayName', 'userScreenName'),
+                      ('authorProfileImageUrl', 'authorImageUrl'),
+                      ('textDisplayCleared', 'fullText'),
+                      ('likeCount', 'favoriteCount'),
+                      ('publishedAt', 'createdAt'),
+                      ('parentId', 'inReplyToId')]
+
+
+def rename_solr_fields(t):
+    """A function to rename the fields of a record to the fields of the Solr cores (in place).
+
+    Args:
+        t (dict): The record.
+
+    Returns:
+        dict: The record.
+    """
+    for field, solr_field in SOLR_FIELD_RENAMES:
+        if field in t.keys():
+            t[solr_field] = t.pop(field)
+    return t
+
+
+def is_solr_document(t):
+    """A function to check whether a renamed record can be added to Solr: only the records with an id and an author
+    screen name are considered."""
+    return 'userScreenName' in t.keys() and t['userScreenName'] != "" and 'id' in t.keys()
+
+
+def solr_documents(documents):
+    """A generator of the records that can be added to Solr, with their fields renamed."""
+    for t in documents:
+        t = rename_solr_fields(t)
+        if is_solr_document(t):
+            yield t
+
+
+class SolrIngestion:
+    """Adds the extracted records to a Solr core in batches, as they are extracted."""
+
+    def __init__(self, core, batch_size, archive_folder=None, queue_size=2, logger=None, max_failed=100000, failed_path=None):
+        """Initialises the ingestion and starts its writer thread.
+
+        Args:
+            core (str): The Solr core to add the records to.
+            batch_size (int): The number of records added to Solr at a time.
+            archive_folder (str): The folder to also write the records to, as 1_extract_data.py does without the
+                ingestion (None to not write them).
+            queue_size (int): The number of batches waiting for the writer thread, after which the extraction waits.
+            logger (Logger): The logger of the run.
+            max_failed (int): The number of records that could not be added kept in memory to be retried.
+            failed_path (str): The replay file of the other records that could not be added (None to drop them).
+        """
+        self.core = core
+        self.batch_size = batch_size
+        self.archive = OutputFolder(archive_folder) if archive_folder else None
+        self.logger = logger
+        self.dataSource = SolrClass(filters={})
+        self.batch = dict()
+        self.batches = queue.Queue(maxsize=queue_size)
+        self.failed = []
+        self.max_failed = max_failed
+        self.failed_path = failed_path
+        self.spilled = 0
+        self.added = 0
+        self.writer = threading.Thread(target=self._write_batches, name='solr_ingestion', daemon=True)
+        self.writer.start()
+
+    def log(self, message):
+        if self.logger:
+            self.logger.info(message)
+        else:
+            print(message)
+
+    def _add(self, items):
+        """Adds records to Solr, and keeps the ones it could not add to retry them."""
+        failed = self.dataSource.add_items_to_solr(self.core, items)
+        self.added += len(items) - len(failed)
+        self.failed = list(failed)
+        self._spill()
+
+    def _spill(self, max_failed=None):
+        """Appends the records that could not be added beyond max_failed to the replay file."""
+        max_failed = self.max_failed if max_failed is None else max_failed
+        if len(self.failed) <= max_failed:
+            return
+        spilled, self.failed = self.failed[max_failed:], self.failed[:max_failed]
+        if self.failed_path is not None:
+            with open(self.failed_path, 'a+', encoding='utf-8') as fout:
+                for t in spilled:
+                    fout.write(f"{json.dumps(t, ensure_ascii=False)}\n")
+        self.spilled += len(spilled)
+
+    def _write_batches(self):
+        while True:
+            batch = self.batches.get()
+            try:
+                if batch is None:
+                    break
+                self._add(self.failed + batch)
+            except Exception as exp:
+                self.log(f"[{__name__}]: Adding a batch to the core {self.core} failed: {exp}")
+                self.failed = self.failed + batch
+                self._spill()
+            finally:
+                self.batches.task_done()
+
+    def _submit(self):
+        if len(self.batch) > 0:
+            self.batches.put(list(self.batch.values()))
+            self.batch = dict()
+
+    def write(self, output, documents):
+        """Adds the records of an output file to the core (and appends them to the archive file).
+
+        Args:
+            output (str): The name of the output file of the records.
+            documents (iterable): The combined records.
+
+        Returns:
+            int: The number of records sent to the core.
+        """
+        count = 0
+        if self.archive is not None:
+            documents = self.archive.tee(output, documents)
+        for t in solr_documents(documents):
+            count += 1
+            self.batch[t['id']] = t
+            if len(self.batch) >= self.batch_size:
+                self._submit()
+        return count
+
+    def write_file(self, output, path):
+        """Adds the records of a file written by extraction.extract_file_to to the core."""
+        self.write(output, read_records(path))
+
+    def flush(self):
+        """Waits until the records written so far are added to the core, retrying the ones that failed once more.
+
+        Returns:
+            int: The number of records that could not be added (including the ones in the replay file).
+        """
+        self._submit()
+        self.batches.join()
+        if len(self.failed) > 0:
+            self._add(self.failed)
+        return len(self.failed) + self.spilled
+
+    def close(self):
+        """Flushes the ingestion, stops its writer thread, writes the records that still could not be added to the
+        replay file, and compresses the archive files if all the records were added.
+
+        Returns:
+            int: The number of records that could not be added.
+        """
+        failed = self.flush()
+        self.batches.put(None)
+        self.writer.join()
+        self._spill(max_failed=0)
+        self.log(f"[{__name__}]: {self.added} records added to the core {self.core}, {failed} could not be added.")
+        if self.spilled > 0:
+            self.log(f"[{__name__}]: {self.spilled} of them were {'dropped' if self.failed_path is None else f'written to {self.failed_path}, to import with 2_import_data_to_solr.py'}.")
+        if self.archive is not None and failed == 0:
+            for output in self.archive.outputs:
+                path = join(self.archive.folder, output)
+                compress_file(path, f"{path}.tar.gz")
+        return failed
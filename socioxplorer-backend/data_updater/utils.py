@@ -3,7 +3,6 @@
 import requests
 import time
 import json
-from ftlangdetect import detect
 import re
 import sys
 import nltk
@@ -35,6 +34,7 @@ except Exception as exp:
     print("exiting...")
     sys.exit(-1)
 from configs import ApplicationConfig
+from language_identifier import get_language_identifier
 from logging.handlers import TimedRotatingFileHandler as _TimedRotatingFileHandler
 import html2text
 import traceback
@@ -42,6 +42,7 @@ import glob
 import string
 from nltk.tokenize import TweetTokenizer
 import subprocess
+from collections import OrderedDict
 tweet_tokenizer = TweetTokenizer()
 
 LOG_FOLDER = ApplicationConfig.LOG_FOLDER
@@ -185,36 +186,41 @@ def get_sentiments(tweets):
     
 def get_language(tweet_text):
     """function to extract the language of the passed string.
-    It is based on fasttext language identification and uses the libraries (fasttext, re) in python.
+    It is based on fasttext language identification, see language_identifier.py in the root folder.
     Proceudre:
         1- remove urls and mentions
         2- remove the numbers
         3- predict the language
-        4- in case of errors, return english with 0 confidence.
+        4- in case of errors, return 'lang'.
+    To identify the languages of many strings, use get_languages, which calls the model once per batch.
     Args:
         tweet_text (str): The string that you need to find its language.
 
     Returns:
         language (str): The string that contains the identified language. examples: 'english' or 'spanish'
     """
-    try:
-        tweet_text = re.sub('http[s]:[^\b \n\t]+',' ',tweet_text)
-        tweet_text = re.sub('@[^\b \n\t]+',' ',tweet_text)
-        tweet_text = re.sub('[0-9]+',' ',tweet_text)
-        tweet_text = re.sub('[\n\t ]+',' ',tweet_text).strip()
-        if len(tweet_text.split(' ')) >= 1 and len(tweet_text) > 1:
-            lang = detect(text=tweet_text, low_memory=False)
-            if len(lang) >= 1:
-                language = str(lang['lang'])
-                return LANGUAGE_DICT[language] if language in LANGUAGE_DICT.keys() else language
-            else:
-                return 'NonText'
-        else:
-            return 'NonText'
-    except Exception as exp:
-        print(exp)
-        time.sleep(1)
-        return 'lang' #if exception occurred, set language to lang. (traceable for future works)
+    return get_language_identifier().get_language(tweet_text)
+
+def get_languages(texts):
+    """function to extract the languages of a list of strings, in batches (see get_language).
+
+    Args:
+        texts (list): The strings that you need to find their languages.
+
+    Returns:
+        list: The identified language of each string. examples: 'english' or 'spanish'
+    """
+    return get_language_identifier().get_languages(texts)
+
+def add_languages(tweets):
+    """function to set the language of the tweets extracted without it (getTweetContent with detect_language=False), in batches.
+
+    Args:
+        tweets (iterable): The extracted tweets (dicts with the fullText and language fields).
+    """
+    tweets = [tweet for tweet in tweets if 'fullText' in tweet.keys() and tweet.get('language') is None]
+    for tweet, language in zip(tweets, get_languages([tweet['fullText'] for tweet in tweets])):
+        tweet['language'] = language
 
 def get_urls_from_object(tweet_obj):
     """Extract urls from a tweet object
@@ -441,6 +447,76 @@ def getCleanedTextList(text, alpha_numeric_only = False, lower = False):
     except Exception as exp:
         return ""
 
+QUOTES_TABLE = str.maketrans({'’': "'", '‘': "'", '“': '"', '”': '"'})
+CLEANED_TEXT_RE = re.compile("[•!?;,/’‘&%\"\t\n.....； ]+")
+# The emojis are made of non-ASCII characters, except the keycaps (e.g. "1️⃣") which start with one ASCII character.
+EMOJI_CANDIDATES_RE = re.compile('[\x00-\x7f]?[^\x00-\x7f]+')
+
+class TextFeatureExtractor:
+    """ A class to extract the text features of the tweets (hashtags, mentions, cleaned text, processed tokens and emojis) from a single tokenisation of each text.
+    The features are the same as the ones of getCleanedText, getCleanedTextList and getEmojis. The processed tokens of the users' descriptions are memoised, as every tweet of a user carries the same description.
+    """
+
+    def __init__(self, description_cache_size=100000):
+        """
+        Args:
+            description_cache_size (int, optional): The number of descriptions whose processed tokens are kept (least recently used first out). Defaults to 100000.
+        """
+        self.description_cache_size = description_cache_size
+        self.descriptions = OrderedDict()
+
+    def text_features(self, text):
+        """ a function to extract the features of a text, with one tokenisation (two if the text contains curly quotes and hashtags or mentions, as getCleanedText replaces the quotes before tokenising while the hashtags and mentions are taken from the original text).
+
+        Args:
+            text (str): The text, e.g. the fullText of a tweet.
+
+        Returns:
+            dict: The hashtags, mentions, emojis, text (as getCleanedText) and processedTokens (as getCleanedTextList with alpha_numeric_only) of the text.
+        """
+        normalised = text.translate(QUOTES_TABLE)
+        tokens = tweet_tokenizer.tokenize(normalised)
+        original_tokens = tokens if normalised == text or ('#' not in text and '@' not in text) else tweet_tokenizer.tokenize(text)
+        cleaned = CLEANED_TEXT_RE.sub(" ", ' '.join([x for x in tokens if not x.startswith('@') and not x.startswith('#') and not x.startswith('http') and x not in string.punctuation]))
+        return {'hashtags': [x.replace('#','') for x in original_tokens if x.startswith('#')],
+                'mentions': [x.replace('@','') for x in original_tokens if x.startswith('@')],
+                'emojis': self.emojis(text),
+                'text': cleaned,
+                'processedTokens': [x for x in set(cleaned.split(' ')) if x.isalnum()]}
+
+    def emojis(self, text):
+        """ a function to extract the emojis of a text (as getEmojis), looking for them only in the non-ASCII parts of the text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            list: The distinct emojis of the text.
+        """
+        candidates = ' '.join(EMOJI_CANDIDATES_RE.findall(text))
+        return getEmojis(candidates) if len(candidates) > 0 else []
+
+    def description_tokens(self, description):
+        """ a function to return the processed tokens of a user's description (as getCleanedTextList with alpha_numeric_only), memoised.
+
+        Args:
+            description (str): The description of the user.
+
+        Returns:
+            list: The processed tokens of the description.
+        """
+        if not isinstance(description, str):
+            return getCleanedTextList(description, alpha_numeric_only=True, lower=False)
+        if description in self.descriptions:
+            self.descriptions.move_to_end(description)
+        else:
+            self.descriptions[description] = getCleanedTextList(description, alpha_numeric_only=True, lower=False)
+            if len(self.descriptions) > self.description_cache_size:
+                self.descriptions.popitem(last=False)
+        return list(self.descriptions[description])
+
+text_feature_extractor = TextFeatureExtractor(ApplicationConfig.DESCRIPTION_CACHE_SIZE)
+
 def handleException(exp, object_='Unknown', func_= 'Unknown'):
     print(f'Error {exp}\n')
     exception_type, exception_object, exception_traceback = sys.exc_info()
@@ -451,7 +527,7 @@ def handleException(exp, object_='Unknown', func_= 'Unknown'):
             Exception message : {exp}\nObject: {object_}\nFunction: {func_}.\
                 \n================================================")
                 
-def getTweetContent(object_, original, users_dict, places_dict, media_dict):
+def getTweetContent(object_, original, users_dict, places_dict, media_dict, detect_language=True):
     tweet_ = dict()
 
     author_id = object_['author_id']
@@ -512,6 +588,7 @@ def getTweetContent(object_, original, users_dict, places_dict, media_dict):
 
     date_str = object_.get("createdAt") or object_.get("created_at")
     parsed_date = parse_date(date_str)
+    features = text_feature_extractor.text_features(fullText)
 
     tweet_ = {'id':object_['id'],
               'createdAt':format_date(parsed_date, "%Y-%m-%dT%H:%M:%SZ"),
@@ -521,10 +598,10 @@ def getTweetContent(object_, original, users_dict, places_dict, media_dict):
               'emotion': getEmotion(fullText),
               'favoriteCount': public_metrics['like_count'] if 'like_count' in public_metrics.keys() else public_metrics['likeCount'] if 'likeCount' in public_metrics.keys() else None,
               'fullText': fullText,
-              'hashtags':[x.replace('#','') for x in tweet_tokenizer.tokenize(fullText) if x.startswith('#')],
-              'mentions':[x.replace('@','') for x in tweet_tokenizer.tokenize(fullText) if x.startswith('@')],
+              'hashtags': features['hashtags'],
+              'mentions': features['mentions'],
               'languagePlatform': LANGUAGE_DICT[object_['lang']] if object_['lang'] in LANGUAGE_DICT.keys() else object_['lang'],
-              'language': get_language(fullText),
+              'language': get_language(fullText) if detect_language else None,
               'possiblySensitive': object_['possiblySensitive'] if 'possiblySensitive' in object_.keys() else object_['possibly_sensitive'] if 'possibly_sensitive' in object_.keys() else None,
               'placeCountry': placeCountry,
               'placeFullName': placeFullName,
@@ -547,16 +624,48 @@ def getTweetContent(object_, original, users_dict, places_dict, media_dict):
               'usersFollowersCount': usersFollowersCount,
               'usersFriendsCount': usersFriendsCount,
               'matchingRule': object_['matching_rules'] if 'matching_rules' in object_.keys() else None,
-              'emojis': getEmojis(fullText),
-              'text' : getCleanedText(fullText),
-              'processedTokens':  getCleanedTextList(fullText, alpha_numeric_only=True, lower=False),
-              'processedDescTokens': getCleanedTextList(usersDescription, alpha_numeric_only=True, lower=False),
+              'emojis': features['emojis'],
+              'text' : features['text'],
+              'processedTokens': features['processedTokens'],
+              'processedDescTokens': text_feature_extractor.description_tokens(usersDescription),
              }
 
     return tweet_
 
 
-def extractTweetsFromDict(object_, tweets_dict = dict(), original = False, users_dict = dict(), places_dict = dict(), retweets_dict = dict(), replies_dict = dict(), quotes_dict = dict(), media_dict = dict()):
+COUNT_FIELDS = ['retweetCount', 'replyCount', 'like_count', 'quoteCount']
+
+def getTweetCounts(object_):
+    """A function to get the count fields of a raw tweet object that update an already extracted tweet (see updateTweetCounts).
+
+    Args:
+        object_ (dict): The raw tweet object.
+
+    Returns:
+        dict: The count fields found in the object.
+    """
+    return {field: object_[field] for field in COUNT_FIELDS if field in object_}
+
+def updateTweetCounts(tweet, object_):
+    """A function to update the counts of an extracted tweet from another copy of the raw tweet object.
+
+    Args:
+        tweet (dict): The extracted tweet (as returned by getTweetContent).
+        object_ (dict): The raw tweet object, or its count fields (as returned by getTweetCounts).
+    """
+    try:
+        if 'retweetCount' in tweet.keys() and 'retweetCount' in object_:
+            tweet['retweetCount']= max(tweet['retweetCount'], object_['retweetCount'])
+        if 'replyCount' in tweet.keys() and 'replyCount' in object_:
+            tweet['replyCount']= max(tweet['replyCount'], object_['replyCount'])
+        if 'favoriteCount' in tweet.keys() and 'like_count' in object_:
+            tweet['favoriteCount']= max(tweet['like_count'], object_['like_count'])
+        if 'quoteCount' in tweet.keys() and 'quoteCount' in object_:
+            tweet['quoteCount']= max(tweet['quoteCount'], object_['quoteCount'])
+    except Exception as exp:
+        handleException(exp,tweet,f'{__name__} 5')
+
+def extractTweetsFromDict(object_, tweets_dict = dict(), original = False, users_dict = dict(), places_dict = dict(), retweets_dict = dict(), replies_dict = dict(), quotes_dict = dict(), media_dict = dict(), detect_language = True, occurrences = None):
     if object_:
         if type(object_) == list:
             if len(object_) == 1:
@@ -602,33 +711,27 @@ def extractTweetsFromDict(object_, tweets_dict = dict(), original = False, users
                                 if referenced_tweet['type'] == 'replied_to':
                                     if referenced_tweet['id'] in replies_dict.keys():
                                         if object_['id'] not in replies_dict[referenced_tweet['id']].keys():
-                                            replies_dict[referenced_tweet['id']][object_['id']] = getTweetContent(object_, original, users_dict, places_dict, media_dict)
+                                            replies_dict[referenced_tweet['id']][object_['id']] = getTweetContent(object_, original, users_dict, places_dict, media_dict, detect_language)
                                     else:
-                                        replies_dict[referenced_tweet['id']] = {object_['id']: getTweetContent(object_, original, users_dict, places_dict, media_dict)}
+                                        replies_dict[referenced_tweet['id']] = {object_['id']: getTweetContent(object_, original, users_dict, places_dict, media_dict, detect_language)}
                                     replies_dict[referenced_tweet['id']][object_['id']]['inReplyToId'] = referenced_tweet['id']
 
                                 if referenced_tweet['type'] == 'quoted':
                                     if referenced_tweet['id'] in quotes_dict.keys():
                                         if object_['id'] not in quotes_dict[referenced_tweet['id']].keys():
-                                            quotes_dict[referenced_tweet['id']][object_['id']] = getTweetContent(object_, original, users_dict, places_dict, media_dict)
+                                            quotes_dict[referenced_tweet['id']][object_['id']] = getTweetContent(object_, original, users_dict, places_dict, media_dict, detect_language)
                                     else:
-                                        quotes_dict[referenced_tweet['id']] = {object_['id']: getTweetContent(object_, original, users_dict, places_dict, media_dict)}
+                                        quotes_dict[referenced_tweet['id']] = {object_['id']: getTweetContent(object_, original, users_dict, places_dict, media_dict, detect_language)}
                                     quotes_dict[referenced_tweet['id']][object_['id']]['quotationId'] = referenced_tweet['id']
                         else:
                             if object_['id'] not in tweets_dict.keys():
-                                tweets_dict[object_['id']] = getTweetContent(object_, original, users_dict, places_dict, media_dict)
+                                tweets_dict[object_['id']] = getTweetContent(object_, original, users_dict, places_dict, media_dict, detect_language)
                             else:
-                                try:
-                                    if 'retweetCount' in tweets_dict[object_['id']].keys() and 'retweetCount' in object_:
-                                        tweets_dict[object_['id']]['retweetCount']= max(tweets_dict[object_['id']]['retweetCount'], object_['retweetCount'])
-                                    if 'replyCount' in tweets_dict[object_['id']].keys() and 'replyCount' in object_:
-                                        tweets_dict[object_['id']]['replyCount']= max(tweets_dict[object_['id']]['replyCount'], object_['replyCount'])
-                                    if 'favoriteCount' in tweets_dict[object_['id']].keys() and 'like_count' in object_:
-                                        tweets_dict[object_['id']]['favoriteCount']= max(tweets_dict[object_['id']]['like_count'], object_['like_count'])
-                                    if 'quoteCount' in tweets_dict[object_['id']].keys() and 'quoteCount' in object_:
-                                        tweets_dict[object_['id']]['quoteCount']= max(tweets_dict[object_['id']]['quoteCount'], object_['quoteCount'])
-                                except Exception as exp:
-                                    handleException(exp,tweets_dict[object_['id']],f'{__name__} 5')
+                                updateTweetCounts(tweets_dict[object_['id']], object_)
+                            if occurrences is not None:
+                                counts = getTweetCounts(object_)
+                                if counts:
+                                    occurrences.append((object_['id'], counts))
                 except Exception as exp3:
                     handleException(exp3,object_,func_=f'{__name__}')
                 return tweets_dict, retweets_dict, replies_dict, quotes_dict
@@ -670,33 +773,27 @@ def extractTweetsFromDict(object_, tweets_dict = dict(), original = False, users
                     if referenced_tweet['type'] == 'replied_to':
                         if referenced_tweet['id'] in replies_dict.keys():
                             if object_['id'] not in replies_dict[referenced_tweet['id']].keys():
-                                replies_dict[referenced_tweet['id']][object_['id']] = getTweetContent(object_, original, users_dict, places_dict, media_dict)
+                                replies_dict[referenced_tweet['id']][object_['id']] = getTweetContent(object_, original, users_dict, places_dict, media_dict, detect_language)
                         else:
-                            replies_dict[referenced_tweet['id']] = {object_['id']: getTweetContent(object_, original, users_dict, places_dict, media_dict)}
+                            replies_dict[referenced_tweet['id']] = {object_['id']: getTweetContent(object_, original, users_dict, places_dict, media_dict, detect_language)}
                         replies_dict[referenced_tweet['id']][object_['id']]['inReplyToId'] = referenced_tweet['id']
 
                     if referenced_tweet['type'] == 'quoted':
                         if referenced_tweet['id'] in quotes_dict.keys():
                             if object_['id'] not in quotes_dict[referenced_tweet['id']].keys():
-                                quotes_dict[referenced_tweet['id']][object_['id']] = getTweetContent(object_, original, users_dict, places_dict, media_dict)
+                                quotes_dict[referenced_tweet['id']][object_['id']] = getTweetContent(object_, original, users_dict, places_dict, media_dict, detect_language)
                         else:
-                            quotes_dict[referenced_tweet['id']] = {object_['id']: getTweetContent(object_, original, users_dict, places_dict, media_dict)}
+                            quotes_dict[referenced_tweet['id']] = {object_['id']: getTweetContent(object_, original, users_dict, places_dict, media_dict, detect_language)}
                         quotes_dict[referenced_tweet['id']][object_['id']]['quotationId'] = referenced_tweet['id']
             else:
                 if object_['id'] not in tweets_dict.keys():
-                    tweets_dict[object_['id']] = getTweetContent(object_, original, users_dict, places_dict, media_dict)
+                    tweets_dict[object_['id']] = getTweetContent(object_, original, users_dict, places_dict, media_dict, detect_language)
                 else:
-                    try:
-                        if 'retweetCount' in tweets_dict[object_['id']].keys() and 'retweetCount' in object_:
-                            tweets_dict[object_['id']]['retweetCount']= max(tweets_dict[object_['id']]['retweetCount'], object_['retweetCount'])
-                        if 'replyCount' in tweets_dict[object_['id']].keys() and 'replyCount' in object_:
-                            tweets_dict[object_['id']]['replyCount']= max(tweets_dict[object_['id']]['replyCount'], object_['replyCount'])
-                        if 'favoriteCount' in tweets_dict[object_['id']].keys() and 'like_count' in object_:
-                            tweets_dict[object_['id']]['favoriteCount']= max(tweets_dict[object_['id']]['like_count'], object_['like_count'])
-                        if 'quoteCount' in tweets_dict[object_['id']].keys() and 'quoteCount' in object_:
-                            tweets_dict[object_['id']]['quoteCount']= max(tweets_dict[object_['id']]['quoteCount'], object_['quoteCount'])
-                    except Exception as exp:
-                        handleException(exp,tweets_dict[object_['id']],f'{__name__} 5')
+                    updateTweetCounts(tweets_dict[object_['id']], object_)
+                if occurrences is not None:
+                    counts = getTweetCounts(object_)
+                    if counts:
+                        occurrences.append((object_['id'], counts))
         except Exception as exp3:
             handleException(exp3,object_,func_=f'{__name__}')
     return tweets_dict, retweets_dict, replies_dict, quotes_dict
@@ -780,21 +877,17 @@ def process_youtube_objects(objects):
             
             if 'fullText' in objects_df.columns:
                 logger.info(f"Starting language identification...")
-                objects_df['language'] = objects_df['fullText'].apply(lambda val: get_language(val))
-                objects_df['hashtags'] = objects_df['fullText'].apply(lambda val: [x.replace('#','') for x in tweet_tokenizer.tokenize(val) if x.startswith('#')])
-                objects_df['mentions'] = objects_df['fullText'].apply(lambda val: [x.replace('@','') for x in tweet_tokenizer.tokenize(val) if x.startswith('@')])
-                objects_df['emojis'] = objects_df['fullText'].apply(lambda val: getEmojis(val))
-                objects_df['text'] = objects_df['fullText'].apply(lambda val: getCleanedText(val))
-                objects_df['processedTokens'] = objects_df['fullText'].apply(lambda val: getCleanedTextList(val, alpha_numeric_only=True, lower=False))
+                objects_df['language'] = get_languages(objects_df['fullText'].tolist())
+                features = [text_feature_extractor.text_features(val) for val in objects_df['fullText']]
+                for feature in ['hashtags', 'mentions', 'emojis', 'text', 'processedTokens']:
+                    objects_df[feature] = [f[feature] for f in features]
             
             if 'title' in objects_df.columns:
                 logger.info(f"Starting language identification...")
-                objects_df['videoLanguage'] = objects_df['title'].apply(lambda val: get_language(val))
-                objects_df['videoHashtags'] = objects_df['title'].apply(lambda val: [x.replace('#','') for x in tweet_tokenizer.tokenize(val) if x.startswith('#')])
-                objects_df['videoMentions'] = objects_df['title'].apply(lambda val: [x.replace('@','') for x in tweet_tokenizer.tokenize(val) if x.startswith('@')])
-                objects_df['videoEmojis'] = objects_df['title'].apply(lambda val: getEmojis(val))
-                objects_df['videoText'] = objects_df['title'].apply(lambda val: getCleanedText(val))
-                objects_df['videoProcessedTokens'] = objects_df['title'].apply(lambda val: getCleanedTextList(val, alpha_numeric_only=True, lower=False))
+                objects_df['videoLanguage'] = get_languages(objects_df['title'].tolist())
+                features = [text_feature_extractor.text_features(val) for val in objects_df['title']]
+                for feature, column in [('hashtags', 'videoHashtags'), ('mentions', 'videoMentions'), ('emojis', 'videoEmojis'), ('text', 'videoText'), ('processedTokens', 'videoProcessedTokens')]:
+                    objects_df[column] = [f[feature] for f in features]
                 
             if 'createdAt' in objects_df.columns:
                 objects_df['createdAtDays'] = objects_df['createdAt'].apply(lambda val: val[0:10])
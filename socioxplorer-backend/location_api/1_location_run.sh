@@ -1,2 +1,3 @@
 #!/bin/bash
+python build_gazetteer.py
 gunicorn -b 0.0.0.0:10066 -t 1000 location_api:app --workers=2 --thread 4
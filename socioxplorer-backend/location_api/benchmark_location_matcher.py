@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This script benchmarks the matching of location strings by the location mapper, with the original token by token
+matching (locator.legacy_match), with the compiled gazetteer (Gazetteer.match) and with the binary gazetteer mapped in
+memory (MappedGazetteer.match, see build_gazetteer.py), and reports how their results differ.
+The language fallback of the mapper is not included, as it is the same for all.
+
+With --startup, it also measures the start-up time and the memory of a locator (as in each worker of the API) in
+fresh processes, with the gazetteer compiled from the JSON resources and with the binary gazetteer. The private
+(anonymous) memory is duplicated in each worker, while the pages of the mapped file are shared.
+
+The location strings are read from a file (one per line, e.g. the distinct userLocationOriginal values of a core) or
+generated from the resources of the mapper.
+
+Run it from the socioxplorer-backend/location_api folder, e.g.: python benchmark_location_matcher.py --strings 100000
+"""
+
+import sys
+import time
+import json
+import random
+import argparse
+import subprocess
+from collections import Counter
+from location_mapper import locator, ApplicationConfig
+from gazetteer import Gazetteer, load_gazetteer
+
+NOISE = ['Earth', 'somewhere', 'he/him', 'she/her', 'living my best life', 'home', 'the internet', '🌍', '✨', 'worldwide',
+	'in your heart', 'NYC', 'Follow us', 'Global citizen', 'Planet B', '📍', 'between here and there']
+
+
+def make_strings(my_locator, seed, nb_strings):
+	"""
+	Generates location strings shaped like the free-text locations of users.
+
+	Args:
+		my_locator (locator): The mapper, whose resources provide the names.
+		seed (int): Random seed.
+		nb_strings (int): Number of strings.
+
+	Returns:
+		list: The location strings.
+	"""
+	rng = random.Random(seed)
+	cities = list(my_locator.cities.keys())
+	countries = list(my_locator.countries.keys())
+	templates = [lambda c, k: c.title(), lambda c, k: f'{c.title()}, {k.title()}', lambda c, k: f'{c.title()} - {k.upper()}',
+		lambda c, k: k.title(), lambda c, k: f'{rng.choice(NOISE)} {c}', lambda c, k: rng.choice(NOISE),
+		lambda c, k: f'{c.title()} / {rng.choice(cities).title()}', lambda c, k: f'{c} {rng.choice(NOISE)} ({k})']
+	return [rng.choice(templates)(rng.choice(cities), rng.choice(countries)) for _ in range(nb_strings)]
+
+
+def memory_usage():
+	"""
+	Returns the resident memory of the process, in MiB: total, private (anonymous) and file-backed (shared with the other processes mapping the files).
+	"""
+	usage = dict()
+	with open('/proc/self/status', 'r') as fin:
+		for line in fin:
+			name, _, value = line.partition(':')
+			if name in ['VmRSS', 'RssAnon', 'RssFile']:
+				usage[name] = int(value.split()[0]) / 1024
+	return usage
+
+
+def measure_startup(mapped):
+	"""
+	Creates a locator and prints its start-up time and the memory of the process (as JSON). Run in a fresh process.
+
+	Args:
+		mapped (bool): Whether to use the binary gazetteer, or to compile the gazetteer from the JSON resources.
+	"""
+	if not mapped:
+		ApplicationConfig.LOCATION_GAZETTEER_PATH = None
+	before = memory_usage()
+	start = time.perf_counter()
+	my_locator = locator(compiled=True, use_store=False)
+	my_locator.gazetteer.match('London, UK')
+	elapsed = time.perf_counter() - start
+	after = memory_usage()
+	print(json.dumps({'gazetteer': type(my_locator.gazetteer).__name__, 'startup': elapsed, **{f'{k}_delta': after[k] - before.get(k, 0) for k in after}}))
+
+
+def run(match, strings, repeats):
+	"""
+	Matches all the strings and returns the best time and the results.
+	"""
+	best, results = None, None
+	for _ in range(repeats):
+		start = time.perf_counter()
+		results = [match(given) for given in strings]
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+	return best, results
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description='Benchmarks the location matching and compares the compiled gazetteer with the original matching.')
+	parser.add_argument('--input', type=str, default=None, help='File with one location string per line. Synthetic strings are used if not given.')
+	parser.add_argument('--strings', type=int, default=100000, help='Number of synthetic strings.')
+	parser.add_argument('--repeats', type=int, default=3, help='Number of runs per implementation (the best is reported).')
+	parser.add_argument('--seed', type=int, default=42, help='Random seed of the synthetic strings.')
+	parser.add_argument('--examples', type=int, default=10, help='Number of examples printed per kind of difference.')
+	parser.add_argument('--report', type=str, default=None, help='Optional path of a JSON file to write the differences to.')
+	parser.add_argument('--startup', action='store_true', help='Also measure the start-up time and memory of a locator, with and without the binary gazetteer.')
+	parser.add_argument('--startup_child', type=str, default=None, choices=['json', 'mapped'], help=argparse.SUPPRESS)
+	args = parser.parse_args()
+
+	if args.startup_child:
+		measure_startup(args.startup_child == 'mapped')
+		sys.exit(0)
+	if args.startup:
+		for mode in ['json', 'mapped']:
+			runs = [json.loads(subprocess.run([sys.executable, sys.argv[0], '--startup_child', mode], capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1]) for _ in range(args.repeats)]
+			best = min(runs, key=lambda r: r['startup'])
+			print(f"Start-up with the {best['gazetteer']}: {best['startup']:.2f}s, resident memory +{best['VmRSS_delta']:.1f} MiB (private +{best['RssAnon_delta']:.1f} MiB, shared file pages +{best['RssFile_delta']:.1f} MiB)")
+
+	start = time.perf_counter()
+	my_locator = locator(compiled=False, use_store=False)
+	gazetteer = Gazetteer(my_locator.countries, my_locator.cities)
+	print(f'Resources loaded and gazetteer compiled in {time.perf_counter() - start:.2f}s ({gazetteer.size} names)')
+	mapped = load_gazetteer('./resources', ApplicationConfig.LOCATION_GAZETTEER_PATH) if ApplicationConfig.LOCATION_GAZETTEER_PATH else None
+	if mapped is None:
+		print('The binary gazetteer is not available (run build_gazetteer.py), it is not benchmarked.')
+	if args.input:
+		with open(args.input, 'r', encoding='utf-8') as fin:
+			strings = [line.rstrip('\n') for line in fin if len(line.strip()) > 0]
+	else:
+		strings = make_strings(my_locator, args.seed, args.strings)
+
+	legacy_time, legacy = run(my_locator.legacy_match, strings, args.repeats)
+	compiled_time, compiled = run(gazetteer.match, strings, args.repeats)
+	print(f'Strings: {len(strings)}')
+	print(f'Original matching: {legacy_time:.2f}s ({len(strings) / legacy_time:.0f} strings/s)')
+	print(f'Compiled gazetteer: {compiled_time:.2f}s ({len(strings) / compiled_time:.0f} strings/s, {legacy_time / compiled_time:.1f}x)')
+	if mapped is not None:
+		mapped_time, mapped_results = run(mapped.match, strings, args.repeats)
+		print(f'Binary gazetteer: {mapped_time:.2f}s ({len(strings) / mapped_time:.0f} strings/s, {legacy_time / mapped_time:.1f}x), identical to the compiled gazetteer: {mapped_results == compiled}')
+
+	differences = {'new_matches': [], 'lost_matches': [], 'different_countries': []}
+	for given, old, new in zip(strings, legacy, compiled):
+		if old == new:
+			continue
+		kind = 'new_matches' if old == 'not_available' else 'lost_matches' if new == 'not_available' else 'different_countries'
+		differences[kind].append({'location': given, 'original': old, 'compiled': new})
+	print(f"Identical results: {len(strings) - sum(len(d) for d in differences.values())} ({100 * (1 - sum(len(d) for d in differences.values()) / max(len(strings), 1)):.2f}%)")
+	for kind, items in differences.items():
+		print(f'{kind}: {len(items)}')
+		for item, count in Counter(json.dumps(item, ensure_ascii=False) for item in items).most_common(args.examples):
+			print(f'\t{count} x {item}')
+	if args.report:
+		with open(args.report, 'w', encoding='utf-8') as fout:
+			json.dump(differences, fout, ensure_ascii=False, indent=1)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This script compiles the gazetteer of the location mapper (see gazetteer.py) into the binary file mapped in memory by
+the workers of the location API (ApplicationConfig.LOCATION_GAZETTEER_PATH). It is run before the API starts, and only
+rebuilds the file if the resources (or the matching rules) changed since it was built. If the build fails, it only
+warns: the API then matches the locations in process, without the binary file.
+
+Run it from the socioxplorer-backend/location_api folder: python build_gazetteer.py
+"""
+
+import sys
+import time
+import argparse
+from os.path import abspath, join
+from gazetteer import build_gazetteer, load_gazetteer
+try:
+	source_dir = abspath(join('../../'))
+	sys.path.append(source_dir)
+except Exception as exp:
+	print("Configs Not Found, please make sure the configs.py file exists in the root folder!")
+	sys.exit(-1)
+from configs import ApplicationConfig
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description='Compiles the gazetteer of the location mapper into its binary file.')
+	parser.add_argument('--resources', type=str, default='./resources', help='Folder of the resources of the location mapper.')
+	parser.add_argument('--output', type=str, default=ApplicationConfig.LOCATION_GAZETTEER_PATH, help='Path of the binary file.')
+	parser.add_argument('--force', action='store_true', help='Rebuild the file even if it is up to date.')
+	args = parser.parse_args()
+
+	if not args.output:
+		print('The binary gazetteer is disabled (LOCATION_GAZETTEER_PATH), nothing to build.')
+		sys.exit(0)
+	start = time.perf_counter()
+	try:
+		if build_gazetteer(args.resources, args.output, force=args.force):
+			gazetteer = load_gazetteer(args.resources, args.output)
+			print(f'Gazetteer {args.output} built in {time.perf_counter() - start:.2f}s ({gazetteer.size} names, {len(gazetteer.buffer) / 2**20:.1f} MiB)')
+		else:
+			print(f'Gazetteer {args.output} is up to date.')
+	except Exception as exp:
+		print(f'Warning: the gazetteer {args.output} could not be built ({exp}), the location API will match the locations without it.')
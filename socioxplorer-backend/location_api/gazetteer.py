@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This file contains the compiled gazetteer matcher used by the location mapper.
+All the country and city names (and the special cases of the mapper) are normalised once and stored in a trie over
+their tokens, so multi-word names (e.g. "new york", "ras al-khaimah") can be matched. A location string is normalised
+and tokenised once, then matched in a single pass over its tokens, following the same priorities as the original
+matching of the mapper:
+	1. a whole part of the string (split by , - ( ) \\ / &) that is a special case, then a country, then a city;
+	2. any sequence of tokens that is a special case, then a country, then a city (leftmost first, longest first).
+
+The trie can be compiled once (see build_gazetteer.py) into a binary file that the workers of the API map in memory
+read-only (MappedGazetteer), instead of each worker parsing the JSON resources and holding its own copy of the trie:
+the pages of the file are shared by all the processes that map it.
+"""
+
+import os
+import re
+import sys
+import mmap
+import json
+import zlib
+import array
+import string
+import struct
+import hashlib
+
+SEPARATORS = ',-()\\/&'
+SEPARATORS_RE = re.compile(f'[{re.escape(SEPARATORS)}]')
+# The punctuation that does not separate parts, removed from the whole string at once.
+PUNCTUATION_RE = re.compile(f"[{re.escape(''.join(c for c in string.punctuation if c not in SEPARATORS))}]")
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+
+US = 'United States of America'
+UK = 'United Kingdom of Great Britain and Northern Ireland'
+# Names checked before any country or city name.
+SPECIAL_CASES = {'usa': US, 'us': US, 'united states': US, 'new england': US,
+	'united kingdom': UK, 'great britain': UK, 'british': UK, 'uk': UK, 'gb': UK}
+# Names of countries checked before the countries dictionary.
+COUNTRY_ALIASES = {'scotland': UK, 'england': UK, 'wales': UK, 'northern ireland': UK, 'uk': UK, 'united kingdom': UK,
+	'us': US, 'united states': US, 'usa': US, 'america': US}
+
+SPECIAL, COUNTRY, CITY = 0, 1, 2
+_VALUE = ''
+
+SOURCES = ['processed_all_lang_countries.json', 'new_109k_cities_wordwide.json']
+# Binary format: a header, a hash table of record offsets (open addressing, linear probing), the records of all the
+# token sequences that are a name or the prefix of a name, then the list of countries (JSON).
+MAGIC = b'SXGZ'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHIIII32s')  # magic, version, byte order, slots, records offset, countries offset, names, sources digest
+KEY_LENGTH = struct.Struct('<H')  # key length, followed by the key
+RECORD = struct.Struct('<BB')  # has children, number of values, after the key
+VALUES = [struct.Struct('<' + 'BH' * n) for n in range(4)]  # (kind, country id) per value
+EMPTY_SLOT = 0
+
+
+def normalise(text):
+	"""
+	Normalises a location string the way the mapper does: casefolded, without punctuation.
+
+	Args:
+		text (str): The string to normalise.
+
+	Returns:
+		str: The normalised string.
+	"""
+	return text.strip().casefold().translate(PUNCTUATION_TABLE)
+
+
+def tokenise(text):
+	"""
+	Splits a location string into its parts (by the separators of the mapper) and the parts into normalised tokens.
+
+	Args:
+		text (str): The location string.
+
+	Returns:
+		tuple: The tokens of the string, and the end token position of each non-empty part, by start position.
+	"""
+	tokens, parts = [], dict()
+	for part in SEPARATORS_RE.split(PUNCTUATION_RE.sub('', text.casefold())):
+		part_tokens = part.split()
+		if len(part_tokens) > 0:
+			parts[len(tokens)] = len(tokens) + len(part_tokens)
+			tokens += part_tokens
+	return tokens, parts
+
+
+class Gazetteer:
+	"""
+	A trie over the tokens of the country and city names, mapping each name to its country.
+	"""
+
+	def __init__(self, countries, cities):
+		"""
+		Compiles the gazetteer.
+
+		Args:
+			countries (dict): The country names (in many languages), mapped to the country.
+			cities (dict): The city names, mapped to their country.
+		"""
+		self.trie = dict()
+		self.size = 0
+		for kind, names in [(SPECIAL, SPECIAL_CASES), (COUNTRY, COUNTRY_ALIASES), (COUNTRY, countries), (CITY, cities)]:
+			# Names the original mapper could match exactly (no punctuation) take precedence over the names that
+			# collide with them once normalised.
+			for exact in [True, False]:
+				for name, country in names.items():
+					if (normalise(name) == name) == exact:
+						self.add(tokenise(name)[0], kind, country)
+
+	@classmethod
+	def from_resources(cls, resources_dir):
+		"""
+		Compiles the gazetteer from the JSON resources of the location mapper.
+
+		Args:
+			resources_dir (str): The folder of the resources.
+
+		Returns:
+			Gazetteer: The gazetteer.
+		"""
+		with open(os.path.join(resources_dir, SOURCES[0]), 'r', encoding='utf-8') as json_file:
+			countries = json.load(json_file)
+		with open(os.path.join(resources_dir, SOURCES[1]), 'r', encoding='utf-8') as json_file:
+			cities = json.load(json_file)
+		return cls(countries, cities)
+
+	def add(self, tokens, kind, country):
+		"""
+		Adds a name to the trie. A name keeps its first kind and country if it is added several times.
+
+		Args:
+			tokens (list): The normalised tokens of the name.
+			kind (int): SPECIAL, COUNTRY or CITY.
+			country (str): The country of the name.
+		"""
+		if len(tokens) == 0:
+			return
+		node = self.trie
+		for token in tokens:
+			node = node.setdefault(token, dict())
+		if kind not in node.setdefault(_VALUE, dict()):
+			node[_VALUE][kind] = country
+			self.size += 1
+
+	def match(self, given):
+		"""
+		Finds the country of a location string.
+
+		Args:
+			given (str): The location string.
+
+		Returns:
+			str: The country, or 'not_available' if no name of the gazetteer is found in the string.
+		"""
+		tokens, parts = tokenise(given)
+		trie = self.trie
+		best, best_rank = 'not_available', None
+		for start in range(len(tokens)):
+			node = trie.get(tokens[start])
+			end = start + 1
+			while node is not None:
+				if _VALUE in node:
+					whole_part = parts.get(start) == end
+					for kind, country in node[_VALUE].items():
+						rank = (0 if whole_part else 1, kind, start, -end)
+						if best_rank is None or rank < best_rank:
+							best, best_rank = country, rank
+				if end == len(tokens):
+					break
+				node = node.get(tokens[end])
+				end += 1
+		return best
+
+	def save(self, path, digest):
+		"""
+		Writes the gazetteer in the binary format read by MappedGazetteer. The file is written next to its final path,
+		then moved in place, so the running workers keep the file they mapped.
+
+		Args:
+			path (str): The path of the binary file.
+			digest (bytes): The digest of the resources the gazetteer was compiled from (see sources_digest).
+		"""
+		countries, country_ids = [], dict()
+		records = []
+		stack = [('', self.trie)]
+		while len(stack) > 0:
+			key, node = stack.pop()
+			children = [token for token in node.keys() if token != _VALUE]
+			if key != '':
+				values = []
+				for kind, country in sorted(node.get(_VALUE, dict()).items()):
+					if country not in country_ids:
+						country_ids[country] = len(countries)
+						countries.append(country)
+					values += [kind, country_ids[country]]
+				key_bytes = key.encode('utf-8')
+				records.append((key_bytes, KEY_LENGTH.pack(len(key_bytes)) + key_bytes + RECORD.pack(1 if len(children) > 0 else 0, len(values) // 2) + VALUES[len(values) // 2].pack(*values)))
+			for token in children:
+				stack.append((f'{key} {token}' if key != '' else token, node[token]))
+
+		nb_slots = 1
+		while nb_slots < 2 * len(records):
+			nb_slots *= 2
+		slots = array.array('I', [EMPTY_SLOT]) * nb_slots
+		records_offset = HEADER.size + slots.itemsize * nb_slots
+		data, offset = [], records_offset
+		for key_bytes, record in records:
+			slot = zlib.crc32(key_bytes) & (nb_slots - 1)
+			while slots[slot] != EMPTY_SLOT:
+				slot = (slot + 1) & (nb_slots - 1)
+			slots[slot] = offset
+			data.append(record)
+			offset += len(record)
+		header = HEADER.pack(MAGIC, FORMAT_VERSION, 0 if sys.byteorder == 'little' else 1, nb_slots, records_offset, offset, self.size, digest)
+
+		tmp_path = f'{path}.{os.getpid()}.tmp'
+		with open(tmp_path, 'wb') as fout:
+			fout.write(header)
+			fout.write(slots.tobytes())
+			fout.write(b''.join(data))
+			fout.write(json.dumps(countries, ensure_ascii=False).encode('utf-8'))
+		os.replace(tmp_path, path)
+
+
+class MappedGazetteer:
+	"""
+	The compiled gazetteer, read from a binary file mapped in memory. Matches location strings like Gazetteer.
+	"""
+
+	def __init__(self, path):
+		"""
+		Maps the binary file.
+
+		Args:
+			path (str): The path of the binary file, as written by Gazetteer.save.
+
+		Raises:
+			ValueError: If the file is not a gazetteer of the current format (and byte order).
+		"""
+		with open(path, 'rb') as fin:
+			self.buffer = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+		magic, version, byte_order, nb_slots, records_offset, countries_offset, self.size, self.digest = HEADER.unpack_from(self.buffer, 0)
+		if magic != MAGIC or version != FORMAT_VERSION or byte_order != (0 if sys.byteorder == 'little' else 1):
+			raise ValueError(f'{path} is not a gazetteer of version {FORMAT_VERSION}, please rebuild it with build_gazetteer.py')
+		self.mask = nb_slots - 1
+		self.slots = memoryview(self.buffer)[HEADER.size:records_offset].cast('I')
+		self.countries = json.loads(self.buffer[countries_offset:].decode('utf-8'))
+
+	def lookup(self, key):
+		"""
+		Looks up a sequence of tokens.
+
+		Args:
+			key (str): The tokens, joined by spaces.
+
+		Returns:
+			tuple: Whether longer names start with the tokens, and the (kind, country id) values of the tokens, or None if no name starts with them.
+		"""
+		key_bytes = key.encode('utf-8')
+		# The key length and the key, as stored at the start of the record.
+		stored_key = KEY_LENGTH.pack(len(key_bytes)) + key_bytes
+		buffer, slots, mask = self.buffer, self.slots, self.mask
+		slot = zlib.crc32(key_bytes) & mask
+		offset = slots[slot]
+		while offset != EMPTY_SLOT:
+			end = offset + len(stored_key)
+			if buffer[offset:end] == stored_key:
+				has_children, nb_values = RECORD.unpack_from(buffer, end)
+				return has_children, VALUES[nb_values].unpack_from(buffer, end + RECORD.size)
+			slot = (slot + 1) & mask
+			offset = slots[slot]
+		return None
+
+	def match(self, given):
+		"""
+		Finds the country of a location string.
+
+		Args:
+			given (str): The location string.
+
+		Returns:
+			str: The country, or 'not_available' if no name of the gazetteer is found in the string.
+		"""
+		tokens, parts = tokenise(given)
+		best, best_rank = None, None
+		for start in range(len(tokens)):
+			key, end = tokens[start], start + 1
+			while True:
+				found = self.lookup(key)
+				if found is None:
+					break
+				has_children, values = found
+				whole_part = parts.get(start) == end
+				for i in range(0, len(values), 2):
+					rank = (0 if whole_part else 1, values[i], start, -end)
+					if best_rank is None or rank < best_rank:
+						best, best_rank = values[i + 1], rank
+				if not has_children or end == len(tokens):
+					break
+				key = f'{key} {tokens[end]}'
+				end += 1
+		return 'not_available' if best is None else self.countries[best]
+
+
+def sources_digest(resources_dir):
+	"""
+	Computes the digest of the resources the gazetteer is compiled from, and of the matching rules (this file).
+
+	Args:
+		resources_dir (str): The folder of the resources.
+
+	Returns:
+		bytes: The SHA-256 digest.
+	"""
+	digest = hashlib.sha256(MAGIC + str(FORMAT_VERSION).encode('utf-8'))
+	for path in [os.path.join(resources_dir, file_name) for file_name in SOURCES] + [__file__]:
+		with open(path, 'rb') as fin:
+			digest.update(fin.read())
+	return digest.digest()
+
+
+def build_gazetteer(resources_dir, path, force=False):
+	"""
+	Compiles the gazetteer into its binary file, unless the file is up to date with the resources.
+
+	Args:
+		resources_dir (str): The folder of the resources.
+		path (str): The path of the binary file.
+		force (bool, optional): Whether to compile the gazetteer even if the file is up to date. Defaults to False.
+
+	Returns:
+		bool: Whether the file was (re)built.
+	"""
+	digest = sources_digest(resources_dir)
+	if not force and load_gazetteer(resources_dir, path, digest) is not None:
+		return False
+	Gazetteer.from_resources(resources_dir).save(path, digest)
+	return True
+
+
+def load_gazetteer(resources_dir, path, digest=None):
+	"""
+	Maps the binary file of the gazetteer, if it exists and is up to date with the resources.
+
+	Args:
+		resources_dir (str): The folder of the resources.
+		path (str): The path of the binary file.
+		digest (bytes, optional): The digest of the resources, computed if not given.
+
+	Returns:
+		MappedGazetteer: The gazetteer, or None if the file is missing, invalid or out of date.
+	"""
+	if not os.path.exists(path):
+		return None
+	try:
+		gazetteer = MappedGazetteer(path)
+	except Exception as exp:
+		print(f'The gazetteer {path} could not be read: {exp}')
+		return None
+	if gazetteer.digest != (digest if digest is not None else sources_digest(resources_dir)):
+		print(f'The gazetteer {path} is out of date, please rebuild it with build_gazetteer.py')
+		return None
+	return gazetteer
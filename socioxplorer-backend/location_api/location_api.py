@@ -29,9 +29,11 @@ def get_location():
     """
     try:
         tweet = request.get_json()
+        my_locator.preload([tweet])
         user_loc = my_locator.user_level_loc(tweet)
         tweet_loc = my_locator.tweet_level_loc(tweet)
         result = {'user': user_loc, 'tweet': tweet_loc}
+        my_locator.save()
         response = json.dumps(result, ensure_ascii=False)
 
 
@@ -52,6 +54,8 @@ def get_locations():
     tweets = request.get_json()
     print("New request received!")
     try:
+        # The location strings repeat heavily: the ones resolved before are loaded from the store at once.
+        my_locator.preload(tweets.values())
         for t_id in tweets.keys():
             user_loc = my_locator.user_level_loc(tweets[t_id])
             tweet_loc = my_locator.tweet_level_loc(tweets[t_id])
@@ -60,5 +64,6 @@ def get_locations():
         #print(f"Location api-get_locations: {result[t_id]}")
     except Exception as exp:
         pass
+    my_locator.save()
     response = json.dumps(result, ensure_ascii=False)
     return response
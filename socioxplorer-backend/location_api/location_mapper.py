@@ -16,7 +16,20 @@ import numpy as np
 import json
 import re
 import string
-from ftlangdetect import detect
+import sys
+import threading
+from os.path import abspath, join
+from collections import OrderedDict
+from gazetteer import Gazetteer, COUNTRY_ALIASES, PUNCTUATION_TABLE, load_gazetteer
+try:
+	source_dir = abspath(join('../../'))
+	sys.path.append(source_dir)
+except Exception as exp:
+	print("Configs Not Found, please make sure the configs.py and location_store.py files exist in the root folder!")
+	sys.exit(-1)
+from configs import ApplicationConfig
+from location_store import get_location_store, resources_fingerprint, location_strings, user_level_location, tweet_level_location
+from language_identifier import get_language_identifier
 
 map_lang_to_country = {
 	'zh-cn': 'China',
@@ -30,16 +43,59 @@ map_lang_to_country = {
 
 class locator:
 	# initializing all the required resources.
-	def __init__(self):
-		with open('./resources/processed_all_lang_countries.json', 'r',encoding='utf-8') as json_file:
-			self.countries = json.load(json_file)
+	def __init__(self, compiled=True, use_store=True):
+		"""
+		Loads the resources.
 
-		with open('./resources/new_109k_cities_wordwide.json', 'r',encoding='utf-8') as json_file:
-			self.cities = json.load(json_file)
+		Args:
+			compiled (bool, optional): Whether to match the location strings with the compiled gazetteer (see gazetteer.py) or with the original token by token matching. Defaults to True.
+			use_store (bool, optional): Whether to look up and save the resolved location strings in the persistent location store (see location_store.py). Defaults to True.
+		"""
+		# The countries and cities are only loaded if they are used (see the countries and cities properties).
+		self._countries = None
+		self._cities = None
 
 		with open('./resources/lang_to_country.json', 'r',encoding='utf-8') as json_file:
 			self.lang_to_country = json.load(json_file)
 
+		self.gazetteer = None
+		if compiled:
+			# The binary gazetteer (see build_gazetteer.py) is mapped in memory and shared by the workers of the API.
+			# Without it, each worker compiles its own gazetteer from the resources.
+			if ApplicationConfig.LOCATION_GAZETTEER_PATH:
+				self.gazetteer = load_gazetteer('./resources', ApplicationConfig.LOCATION_GAZETTEER_PATH)
+			if self.gazetteer is None:
+				self.gazetteer = Gazetteer(self.countries, self.cities)
+
+		# The countries of the location strings resolved recently (LRU), and of the ones not saved to the store yet.
+		self.cache_size = ApplicationConfig.LOCATION_CACHE_SIZE
+		self._cache = OrderedDict()
+		self._new_locations = dict()
+		self._cache_lock = threading.Lock()
+		self.store = get_location_store(create=True) if use_store else None
+		if self.store is not None:
+			self.store.validate(resources_fingerprint('./resources', 'gazetteer' if compiled else 'legacy'))
+
+	@property
+	def countries(self):
+		"""
+		The country names (in many languages), mapped to the country.
+		"""
+		if self._countries is None:
+			with open('./resources/processed_all_lang_countries.json', 'r',encoding='utf-8') as json_file:
+				self._countries = json.load(json_file)
+		return self._countries
+
+	@property
+	def cities(self):
+		"""
+		The city names, mapped to their country.
+		"""
+		if self._cities is None:
+			with open('./resources/new_109k_cities_wordwide.json', 'r',encoding='utf-8') as json_file:
+				self._cities = json.load(json_file)
+		return self._cities
+
 	def tweet_level_loc(self, tweet):
 		"""A function to get the location of the tweet based on the tweet's place attribute. If the place attribute is not available, the location is set to 'not_available'.
 		It detects the country using the geolocation information in the tweet.
@@ -50,26 +106,7 @@ class locator:
 		Returns:
 			str: The location of the tweet.
 		"""
-		location = 'not_available'
-		if tweet == None:
-			return location
-		else:
-			if 'place' in tweet.keys():
-				if 'country' in tweet['place'].keys():
-					gps_loc = str(tweet['place']['country']).strip()
-					if gps_loc == 'not_available':
-						return location
-					location = self.process_location(gps_loc)
-					if location != 'not_available':
-						return location
-				if 'placeFullName' in tweet['place'].keys():
-					gps_loc = str(tweet['place']['placeFullName']).strip()
-					if gps_loc == 'not_available':
-						return location
-					location = self.process_location(gps_loc)
-					if location != 'not_available':
-						return location
-		return location
+		return tweet_level_location(tweet, self.process_location)
 
 
 	def user_level_loc(self, tweet):
@@ -89,20 +126,114 @@ class locator:
 		Returns:
 			str: The extracted location if identifiable, 'not_available' otherwise.
 		"""
-		given = tweet['user']['location']
-		location = 'not_available'
+		return user_level_location(tweet['user']['location'], self.process_location)
 
-		if given is None or str(given) == 'nan' or len(given) < 2:
-			return 'not_available'
+	def preload(self, tweets):
+		"""
+		Resolves the location strings of the given tweets at once: the countries of the strings resolved before are loaded from the store, and the other strings are resolved together (see resolve_many).
 
-		return self.process_location(given)
+		Args:
+			tweets (iterable): The tweets (dicts with the user and place objects) about to be located.
+		"""
+		with self._cache_lock:
+			strings = [given for given in location_strings(tweets) if given not in self._cache]
+		found = dict()
+		if self.store is not None and len(strings) > 0:
+			try:
+				found = self.store.get_many(strings)
+			except Exception as exp:
+				print(f'Location store lookup failed: {exp}')
+		resolved = self.resolve_many([given for given in strings if given not in found])
+		with self._cache_lock:
+			for given, location in found.items():
+				self._remember(given, location)
+			for given, location in resolved.items():
+				self._remember(given, location)
+				if self.store is not None:
+					self._new_locations[given] = location
+
+	def save(self):
+		"""
+		Saves the countries of the location strings resolved since the last call to the store.
+		"""
+		with self._cache_lock:
+			new_locations, self._new_locations = self._new_locations, dict()
+		if self.store is not None:
+			try:
+				self.store.put_many(new_locations)
+			except Exception as exp:
+				print(f'Location store update failed: {exp}')
+
+	def _remember(self, given, location):
+		# Must be called with the cache lock held.
+		self._cache[given] = location
+		self._cache.move_to_end(given)
+		if len(self._cache) > self.cache_size:
+			self._cache.popitem(last=False)
 
 	def process_location(self, given):
+		"""
+		Maps a location string to a country, remembering the countries of the recently resolved strings.
+
+		Args:
+			given (str): The location string.
+
+		Returns:
+			str: The country if identifiable, 'not_available' otherwise.
+		"""
+		with self._cache_lock:
+			if given in self._cache:
+				self._cache.move_to_end(given)
+				return self._cache[given]
+		location = self.resolve_location(given)
+		with self._cache_lock:
+			self._remember(given, location)
+			if self.store is not None:
+				self._new_locations[given] = location
+		return location
+
+	def resolve_location(self, given):
+		"""
+		Maps a location string to a country, with the gazetteer (or the original matching), then with the language of the string.
+
+		Args:
+			given (str): The location string.
+
+		Returns:
+			str: The country if identifiable, 'not_available' otherwise.
+		"""
+		return self.resolve_many([given])[given]
+
+	def resolve_many(self, strings):
+		"""
+		Maps location strings to countries, with the gazetteer (or the original matching), then with the language of the strings not matched, identified in one batch.
+
+		Args:
+			strings (list): The location strings.
+
+		Returns:
+			dict: The country of each string if identifiable, 'not_available' otherwise.
+		"""
+		locations = {given: self.gazetteer.match(given) if self.gazetteer is not None else self.legacy_match(given) for given in strings}
+		unmatched = [given for given, location in locations.items() if location == 'not_available']
+		locations.update(zip(unmatched, self.language_locations(unmatched)))
+		return locations
+
+	def legacy_match(self, given):
+		"""
+		The original matching of a location string: the parts of the string, then its tokens, are looked up one by one in the special cases, the countries and the cities.
+
+		Args:
+			given (str): The location string.
+
+		Returns:
+			str: The country if identifiable, 'not_available' otherwise.
+		"""
 		# first try to split by punctuation
-		parts1 = [x.strip().casefold().translate(str.maketrans('', '', string.punctuation)) for x in re.split(r',|-|\(|\)|\\|/|&', given)]
+		parts1 = [x.strip().casefold().translate(PUNCTUATION_TABLE) for x in re.split(r',|-|\(|\)|\\|/|&', given)]
 
 		# then, split by spaces
-		parts2 = [x.strip().casefold().translate(str.maketrans('', '', string.punctuation)) for x in given.split()]
+		parts2 = [x.strip().casefold().translate(PUNCTUATION_TABLE) for x in given.split()]
 
 		parts_list =[parts1, parts2]
 		# treat special cases:
@@ -127,21 +258,41 @@ class locator:
 				location = self.get_location(p)
 				if(location != 'not_available'):
 					return location
+		return 'not_available'
+
+	def language_location(self, given):
+		"""
+		Maps a location string to a country through the language of the string.
+
+		Args:
+			given (str): The location string.
 
+		Returns:
+			str: The country if the language is one of the top languages of map_lang_to_country, 'not_available' otherwise.
+		"""
 		# if all dont work with try with detecting language
 		# identifying the language of the location field
 		# we detect only top word languages
 		# we dont consider other languages because they may render a lot of false positive locations such as suriname or andorra
-		if (location == 'not_available'):
-			try:
-				language = detect(given)
-				if 'lang' in language:
-					language = language['lang']
-				if language in map_lang_to_country.keys():
-					location = map_lang_to_country[language]
-			except:
-				pass
-		return location
+		return self.language_locations([given])[0]
+
+	def language_locations(self, strings):
+		"""
+		Maps location strings to countries through their languages, identified in batches (see language_location).
+
+		Args:
+			strings (list): The location strings.
+
+		Returns:
+			list: The country of each string if its language is one of the top languages of map_lang_to_country, 'not_available' otherwise.
+		"""
+		locations = []
+		for language in get_language_identifier().detect_many(strings, clean=False):
+			if language is not None and language['lang'] in map_lang_to_country.keys():
+				locations.append(map_lang_to_country[language['lang']])
+			else:
+				locations.append('not_available')
+		return locations
 
 	def get_location(self, location):
 		"""
@@ -168,19 +319,8 @@ class locator:
 		Returns:
 			str: The country name if the location string is a country name, 'not_available' otherwise.
 		"""
-		mapping_dict = {'scotland': 'United Kingdom of Great Britain and Northern Ireland',
-        'england': 'United Kingdom of Great Britain and Northern Ireland',
-        'wales': 'United Kingdom of Great Britain and Northern Ireland',
-        'northern ireland': 'United Kingdom of Great Britain and Northern Ireland',
-        'uk': 'United Kingdom of Great Britain and Northern Ireland',
-        'united kingdom': 'United Kingdom of Great Britain and Northern Ireland',
-        'us': 'United States of America',
-        'united states': 'United States of America',
-        'usa': 'United States of America',
-        'america': 'United States of America'}
-
-		if (location in mapping_dict.keys()):
-			return mapping_dict[location]
+		if (location in COUNTRY_ALIASES.keys()):
+			return COUNTRY_ALIASES[location]
 		elif (location in self.countries.keys()):
 			return self.countries[location]
 		return 'not_available'
@@ -7,8 +7,12 @@ to retrieve the network of users as a dict object that holds the target objects
 and the values are dicts of keys (sources) and values (weights)
 It writes the source, target, weight table into a csv file.
 
+With the flag --export, the interactions are streamed through Solr's /export handler into a compact on-disk
+edge list (see SolrClass.export_network_interaction), which requires docValues on the exported fields and keeps
+memory bounded on large cores.
+
 Usage:
-    python 1_extract_network_from_solr.py -c core_name
+    python 1_extract_network_from_solr.py -c core_name [--export]
 
 Requirements:
     - Apache Solr instance running and accessible.
@@ -18,6 +22,7 @@ Requirements:
     - Python library 'pandas' installed (install via 'pip install pandas')
 """
 import pandas as pd
+import numpy as np
 import subprocess
 import sys
 from os.path import abspath, join, exists
@@ -43,7 +48,35 @@ MAX_SNA_TIMER = ApplicationConfig.SNA_TIMER
 
 if not exists(DATA_DIR):
     makedirs(DATA_DIR)
-        
+
+def load_exported_network(nodes_file, edge_files):
+    """ Aggregates the edge list written by SolrClass.export_network_interaction into a source, target, weight table. \
+    The edge files are aggregated one at a time, so that only a single partition of the raw edges is held in memory.
+
+    Args:
+        :nodes_file: (str) the path of the nodes file.
+        :edge_files: (list(str)) the paths of the edge files.
+
+    Returns:
+        :pd.DataFrame: The source, target, weight table.
+    """
+    with open(nodes_file, 'r', encoding='utf-8') as fin:
+        names = np.array(fin.read().splitlines(), dtype=object)
+    tables = []
+    for edge_file in edge_files:
+        pairs = np.fromfile(edge_file, dtype=np.uint32).reshape(-1, 2)
+        if len(pairs) == 0:
+            continue
+        keys = (pairs[:, 0].astype(np.uint64) << np.uint64(32)) | pairs[:, 1].astype(np.uint64)
+        del pairs
+        keys, weights = np.unique(keys, return_counts=True)
+        tables.append(pd.DataFrame({'source': names[(keys & np.uint64(0xFFFFFFFF)).astype(np.int64)],
+                                    'target': names[(keys >> np.uint64(32)).astype(np.int64)],
+                                    'weight': weights}))
+    if len(tables) == 0:
+        return pd.DataFrame(columns=['source','target','weight'])
+    return pd.concat(tables, ignore_index=True)
+
 
 if __name__== "__main__":
     import argparse
@@ -51,6 +84,7 @@ if __name__== "__main__":
     parser.add_argument('-c', '--core', help="please specify core", default=None)
     parser.add_argument('-s', '--source', help="please specify source file name", default=None)
     parser.add_argument('-a', '--consider_all', default=False, help='Consider reprocessing all data.')
+    parser.add_argument('-e', '--export', action='store_true', help="Stream the interactions through Solr's /export handler (requires docValues).")
     
     args = parser.parse_args()
     core = args.core
@@ -64,7 +98,15 @@ if __name__== "__main__":
     solr = SolrClass({})
     if core != None or source != None:
         for interaction in ['reply', 'retweet']:
-            if core != None:
+            if core != None and args.export:
+                exported = solr.export_network_interaction(core, f'{DATA_FILE}_{core}_{interaction}_export', interaction)
+                if exported is None:
+                    print_this("The network could not be exported. Please make sure the core is reachable and that the interaction fields have docValues, or run without --export.")
+                    sys.exit(-1)
+                data_df = load_exported_network(exported['nodes_file'], exported['edge_files'])
+                print_this(f"Number of records: {len(data_df)}")
+                output_file = f'{DATA_FILE}_{core}_{threshold}_{interaction}.csv'
+            elif core != None:
                 users_edges, hits = solr.get_network_interaction(core, interaction)
                 # convert the dict to records.
                 if len(users_edges) > 0:
@@ -59,15 +59,10 @@ if __name__== "__main__":
 
         if core in ApplicationConfig.SOLR_CORES and nodes_networks!= None:
             print(f"{interaction}NetworkNodes")
-            response = dataSource.get_network_interactions(solr_core=core, interaction=interaction, interaction_options=interaction_options)
-            print(f"{interaction}NetworkNodes")
-            if response is not None:
-                if "msg" in response.keys():
-                    print(response['msg'])
-                elif response['response']['numFound'] > 0:
+            try:
+                for docs, hits, _ in dataSource.iter_network_interactions(solr_core=core, interaction=interaction, interaction_options=interaction_options):
                     tweets_packet = dict()
-                    docs = response['response']['docs']
-                    print(f"length of data: {len(docs)}")
+                    print(f"length of data: {len(docs)} out of {hits}")
                     for doc in docs:
                         if interaction_options[interaction] in doc.keys():
                             new_list_of_network = list(set([doc['userScreenName']] + [x.split(" ")[0] for x in doc[interaction_options[interaction]]]))
@@ -86,4 +81,6 @@ if __name__== "__main__":
                             trials = 1
                         else:
                             trials += 1
+            except Exception as exp:
+                print(f"Error: {exp}")
             print("Extracting Networks Done")
\ No newline at end of file
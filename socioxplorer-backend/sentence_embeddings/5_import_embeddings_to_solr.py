@@ -16,6 +16,7 @@ except Exception as exp:
     sys.exit(-1)
 from solr_class import *
 from configs import ApplicationConfig
+from embedding_store import EmbeddingStore, EMBEDDING_FIELDS
 
 limit = 100000
 
@@ -89,12 +90,27 @@ if __name__== "__main__":
                 )
             
             embeddings_dict = embeddings_df[['id','embedding_5d','embedding_2d']].to_dict(orient="index")
+            items = list(embeddings_dict.values())
 
             print(f"Saving embeddings to Solr")
+            added = []
             try:
-                dataSource.add_items_to_solr(core, list(embeddings_dict.values()))
+                # add_items_to_solr returns the items it could not add, which must not reach the embedding store.
+                failed = {item['id'] for item in dataSource.add_items_to_solr(core, items)}
+                added = [item for item in items if item['id'] not in failed]
+                if len(failed) > 0:
+                    print_this(f"{len(failed)} embeddings could not be saved to Solr")
             except Exception as exp:
                 print_this("Error at saving embeddings to Solr")
+
+            if len(added) > 0:
+                # The embedding store mirrors the embeddings of Solr, for the topic modelling to read them from disk.
+                print(f"Saving embeddings to the embedding store")
+                try:
+                    stored = EmbeddingStore(core).update([item['id'] for item in added], {field: [item[field] for item in added] for field in EMBEDDING_FIELDS})
+                    print(f"The embedding store of {core} holds {stored} documents.")
+                except Exception as exp:
+                    print_this(f"Error at saving embeddings to the embedding store: {exp}")
                 
             try:
                 copy_embeddings(core)
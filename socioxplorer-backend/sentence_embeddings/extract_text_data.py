@@ -2,7 +2,7 @@
 """
 Python script for extracting the text data of tweets from Apache Solr.
 
-This script interacts with solr_class with the function get_text_data
+This script interacts with solr_class with the function iter_text_data
 to retrieve the network of users as a dict object that holds the target objects as keys,
 and the values are dicts of keys (sources) and values (weights)
 It writes the source, target, weight table into a csv file.
@@ -68,20 +68,23 @@ if __name__== "__main__":
     
     solr = SolrClass({})
     if core != None:
-        records, hits = solr.get_text_data(core, consider_all)
-        
-        if hits == 0 or len(records) == 0:
-            print_this("No records found in the core.")
-            sys.exit(0)
-            
-        data_df = pd.DataFrame.from_records(records)
-        data_df['text'] = data_df.fullText.apply(lambda x: preprocess_text(x))
-
-        # Write out the dataframe to csv file.
+        # Write out the data to the csv file one batch at a time.
         if not exists(DATA_DIR):
             makedirs(DATA_DIR)
         output_file = f'{DATA_FILE}_{core}.csv'
-        data_df[['id','fullText','text']].to_csv(output_file, index=False)
+        written = 0
+        for records, hits, _ in solr.iter_text_data(core, consider_all):
+            data_df = pd.DataFrame.from_records(records)
+            if 'fullText' not in data_df.columns:
+                data_df['fullText'] = None
+            data_df['text'] = data_df.fullText.apply(lambda x: preprocess_text(x))
+            data_df[['id','fullText','text']].to_csv(output_file, index=False, mode='w' if written == 0 else 'a', header=written == 0)
+            written += len(data_df)
+            print_this(f"{written} records out of {hits} written to file {output_file}")
+
+        if written == 0:
+            print_this("No records found in the core.")
+            sys.exit(0)
         print_this(f"Data written to file {output_file}")
 
     else:
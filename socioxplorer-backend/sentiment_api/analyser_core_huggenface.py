@@ -17,15 +17,19 @@ try:
 except Exception as exp:
     print("Solr Class Not Found, please make sure the solr_class.py file exists in the root folder!")
     sys.exit(-1)
-from configs import ApplicationPaths
+from configs import ApplicationPaths, ApplicationConfig
+from sentiment_backends import load_sentiment_model
+from sentiment_cache import load_prediction_cache
 #The currently supported languages by the used sentiment analysis model (cardiffnlp/twitter-xlm-roberta-base-sentiment)
 SUPPORTED_LANGUAGES = ['ar', 'en', 'fr', 'de', 'hi', 'it', 'sp', 'pt']
 
 MODEL = ApplicationPaths.SENTIMENT_ANALYSIS_MODEL_PATH
 tokenizer = AutoTokenizer.from_pretrained(MODEL)
 config = AutoConfig.from_pretrained(MODEL)
-model = AutoModelForSequenceClassification.from_pretrained(MODEL)
-model.save_pretrained(MODEL)
+model = load_sentiment_model(MODEL)
+MAX_LENGTH = 512
+prediction_cache = load_prediction_cache(ApplicationConfig.SENTIMENT_CACHE_PATH, f'{MODEL}:{ApplicationConfig.SENTIMENT_BACKEND}',
+                                         ApplicationConfig.SENTIMENT_CACHE_MAX_ENTRIES) if ApplicationConfig.SENTIMENT_CACHE_ENABLED else None
 
 
 def strip_links(text, keep_flag=False):
@@ -88,12 +92,12 @@ def preprocess(text, remove_http_mentions=False, keep_flag = True):
 			
 
 
-def huggingface_sent(sentence, return_tensors='pt'):
+def huggingface_sent(sentence, sentiment_model=None):
     """A function to classify the sentiment of a sentence using a pre-trained Huggingface model. The function preprocesses the input sentence, encodes it using the tokenizer, and passes it to the model to get the output. The output is then converted to probabilities using the softmax function and the label with the highest probability is returned.
 
     Args:
         sentence (str): the input sentence to classify.
-        return_tensors (str, optional): the type of tensors to return. Can be 'pt' for PyTorch tensors or 'tf' for TensorFlow tensors. Defaults to 'pt'.
+        sentiment_model (TorchSentimentModel or OnnxSentimentModel, optional): the model to use. Defaults to the model of the configured SENTIMENT_BACKEND.
 
     Returns:
         str: the predicted sentiment label.
@@ -102,12 +106,9 @@ def huggingface_sent(sentence, return_tensors='pt'):
     if (len(text)>0):
         try:
             text = preprocess(text, remove_http_mentions=True, keep_flag = False)
-            encoded_input = tokenizer(text, truncation=True, max_length=512, return_tensors=return_tensors)
-            output = model(**encoded_input)
-            if return_tensors=='tf':
-                scores = output[0][0].numpy()
-            else:
-                scores = output[0][0].detach().numpy()
+            sentiment_model = sentiment_model or model
+            encoded_input = tokenizer(text, truncation=True, max_length=MAX_LENGTH, return_tensors=sentiment_model.return_tensors)
+            scores = sentiment_model.logits(encoded_input)[0]
             scores = softmax(scores)
             ranking = np.argsort(scores)
             ranking = ranking[::-1]
@@ -117,12 +118,104 @@ def huggingface_sent(sentence, return_tensors='pt'):
             return 'Invalid'
     else:
         return 'Neutral'
-    
-def predict_list(tweets):
+
+
+def make_length_buckets(lengths, batch_size, max_batch_tokens):
+    """A function to group sequences of similar token lengths into batches, so that each batch is padded to the length of its longest sequence only. The sequences are sorted by length, then cut into batches of at most batch_size sequences and at most max_batch_tokens tokens once padded.
+
+    Args:
+        lengths (List[int]): the token length of each sequence.
+        batch_size (int): the maximum number of sequences per batch.
+        max_batch_tokens (int): the maximum number of (padded) tokens per batch. A sequence longer than this is put in a batch of its own.
+
+    Returns:
+        List[List[int]]: the indices of the sequences of each batch.
+    """
+    batches, batch = [], []
+    for i in np.argsort(lengths, kind='stable'):
+        # The sequences are sorted by length, so the current one sets the padded length of the batch.
+        if batch and (len(batch) >= batch_size or (len(batch) + 1) * lengths[i] > max_batch_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(int(i))
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def huggingface_sent_batch(sentences, batch_size=None, max_batch_tokens=None, sentiment_model=None, use_cache=True):
+    """A function to classify the sentiment of a list of sentences using the pre-trained Huggingface model, in batches. The sentences are preprocessed, and each distinct preprocessed text is classified once: its label is taken from the prediction cache when possible, otherwise the texts are tokenised once, grouped by token length (see make_length_buckets), padded per batch and passed to the model. The labels are the same as the ones returned by huggingface_sent for each sentence.
+
+    Args:
+        sentences (List[str]): the input sentences to classify.
+        batch_size (int, optional): the maximum number of sentences per batch. Defaults to SENTIMENT_BATCH_SIZE.
+        max_batch_tokens (int, optional): the maximum number of (padded) tokens per batch. Defaults to SENTIMENT_MAX_BATCH_TOKENS.
+        sentiment_model (TorchSentimentModel or OnnxSentimentModel, optional): the model to use. Defaults to the model of the configured SENTIMENT_BACKEND. The prediction cache is only used with the default model.
+        use_cache (bool, optional): whether to use the prediction cache (if enabled). Defaults to True.
+
+    Returns:
+        List[str]: the predicted sentiment label of each sentence.
+    """
+    use_cache = use_cache and prediction_cache is not None and sentiment_model in [None, model]
+    sentiment_model = sentiment_model or model
+    batch_size = batch_size or ApplicationConfig.SENTIMENT_BATCH_SIZE
+    max_batch_tokens = max_batch_tokens or ApplicationConfig.SENTIMENT_MAX_BATCH_TOKENS
+    labels = ['Neutral'] * len(sentences)
+    positions = dict()
+    try:
+        for i, sentence in enumerate(sentences):
+            if len(sentence) > 0:
+                positions.setdefault(preprocess(sentence, remove_http_mentions=True, keep_flag = False), []).append(i)
+    except Exception as e:
+        print(e)
+        return [huggingface_sent(text, sentiment_model) for text in sentences]
+    if len(positions) == 0:
+        return labels
+
+    text_labels = dict()
+    if use_cache:
+        try:
+            text_labels = prediction_cache.get_many(list(positions.keys()))
+        except Exception as e:
+            print(f'Prediction cache lookup failed: {e}')
+    texts = [text for text in positions if text not in text_labels]
+    predicted = dict()
+    if len(texts) > 0:
+        try:
+            encoded = tokenizer(texts, truncation=True, max_length=MAX_LENGTH)['input_ids']
+            batches = make_length_buckets([len(ids) for ids in encoded], batch_size, max_batch_tokens)
+        except Exception as e:
+            print(e)
+            batches = []
+            predicted = {text: huggingface_sent(sentences[positions[text][0]], sentiment_model) for text in texts}
+        for batch in batches:
+            try:
+                encoded_input = tokenizer.pad({'input_ids': [encoded[i] for i in batch]}, return_tensors=sentiment_model.return_tensors)
+                for i, label_id in zip(batch, sentiment_model.logits(encoded_input).argmax(axis=-1).tolist()):
+                    predicted[texts[i]] = config.id2label[label_id]
+            except Exception as e:
+                # Falls back to one sentence at a time, so that only the failing sentences are marked as invalid.
+                print(e)
+                for i in batch:
+                    predicted[texts[i]] = huggingface_sent(sentences[positions[texts[i]][0]], sentiment_model)
+        if use_cache:
+            try:
+                prediction_cache.put_many({text: label for text, label in predicted.items() if label != 'Invalid'})
+            except Exception as e:
+                print(f'Prediction cache update failed: {e}')
+    text_labels.update(predicted)
+
+    for text, indices in positions.items():
+        for i in indices:
+            labels[i] = text_labels[text]
+    return labels
+
+def predict_list(tweets, use_cache=True):
     """A function to predict the sentiment of a list of sentences (tweets) using the Hugging Face model. The function processes the input tweets and predicts the sentiment of each tweet using the Hugging Face model. The predictions are stored in a dictionary with the tweet IDs as keys and the predicted sentiment labels as values. The function prints the statistics of the number of processed tweets and their predictions.
 
     Args:
         tweets (List): a list of sentinces to predict the sentiment of.
+        use_cache (bool, optional): whether to use the prediction cache (if enabled). Defaults to True.
 
     Returns:
         dict: a dictionary containing the tweet IDs as keys and the predicted sentiment labels as values.
@@ -131,9 +224,11 @@ def predict_list(tweets):
     predictions={}
     predictions_stats ={'Positive':0,'Negative':0,'Neutral':0,'OtherLanguages':0, 'Invalid':0}
 
+    supported_ids = [t_id for t_id in tweets.keys() if tweets[t_id]['language'] in SUPPORTED_LANGUAGES]
+    supported_predictions = dict(zip(supported_ids, huggingface_sent_batch([str(tweets[t_id]['fullText']) for t_id in supported_ids], use_cache=use_cache)))
     for t_id in tweets.keys():
-        if(tweets[t_id]['language'] in SUPPORTED_LANGUAGES):
-            prediction_output = huggingface_sent(str(tweets[t_id]['fullText']))
+        if t_id in supported_predictions:
+            prediction_output = supported_predictions[t_id]
             prediction_output = prediction_output.replace(prediction_output[0], prediction_output[0].upper())
         else :
             prediction_output='OtherLanguages'
@@ -143,6 +238,8 @@ def predict_list(tweets):
 
     print(f'Processed {len(tweets.keys())}, Hugging Face')
     print(f'Prediction stats : {predictions_stats}.')
+    if use_cache and prediction_cache is not None:
+        print(f'Prediction cache stats : {prediction_cache.get_stats()}.')
     return predictions
 
 print('Running analyser ....\n')
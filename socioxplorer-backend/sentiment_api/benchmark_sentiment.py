@@ -0,0 +1,89 @@
+import sys
+import time
+import random
+import argparse
+import tempfile
+from os.path import join
+from analyser_core_huggenface import huggingface_sent, huggingface_sent_batch, predict_list, preprocess, SUPPORTED_LANGUAGES
+from sentiment_cache import PredictionCache
+
+"""This script benchmarks the sentiment inference of the sentiment API on synthetic tweets, one tweet at a time (as
+huggingface_sent is called) and in length-bucketed batches (as predict_list now runs). It reports the throughput of both
+and the agreement of their labels, which can only differ by floating point noise on near-ties. The inference is timed
+without the prediction cache; with --cache, the throughput of a temporary prediction cache (filled with the labels of
+the batched pass) is reported separately, so the production cache is left untouched.
+
+Run it from the socioxplorer-backend/sentiment_api folder, e.g.: python benchmark_sentiment.py --tweets 2000 --batch_size 32
+"""
+
+WORDS = {'en': ['love', 'hate', 'great', 'awful', 'today', 'people', 'election', 'vote', 'never', 'again', 'thanks', 'so', 'much', 'what', 'a', 'day'],
+         'fr': ['merci', 'beaucoup', 'jamais', 'encore', 'super', 'nul', 'les', 'gens', 'aujourd\'hui', 'vraiment', 'triste', 'heureux'],
+         'ar': ['شكرا', 'جميل', 'سيء', 'اليوم', 'الناس', 'حب', 'كره', 'ابدا', 'مرة', 'اخرى'],
+         'es': ['gracias', 'nunca', 'hoy', 'gente', 'feliz', 'triste', 'muy', 'bueno', 'malo']}
+EXTRAS = ['@someone', '#hashtag', 'https://t.co/abcdef', '😀', '!!', '...']
+
+
+def make_tweets(seed, nb_tweets):
+    """ Builds synthetic tweets in the format received by /api/predict, with lengths spread like real tweets (mostly \
+    short, with a tail of long ones).
+
+    Args:
+        :seed: (int) Random seed.
+        :nb_tweets: (int) Number of tweets.
+
+    Returns:
+        :dict: The tweets, as {id: {'language', 'fullText'}}.
+    """
+    rng = random.Random(seed)
+    tweets = dict()
+    for i in range(nb_tweets):
+        language = rng.choice(list(WORDS.keys()))
+        length = min(int(rng.expovariate(1 / 15)) + 1, 80)
+        words = [rng.choice(WORDS[language]) if rng.random() > 0.1 else rng.choice(EXTRAS) for _ in range(length)]
+        tweets[str(i)] = {'language': language if language != 'es' else 'sp', 'fullText': ' '.join(words)}
+    return tweets
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the sentiment inference on synthetic tweets.')
+    parser.add_argument('--tweets', type=int, default=2000, help='Number of synthetic tweets.')
+    parser.add_argument('--batch_size', type=int, default=None, help='Maximum number of tweets per batch (default: SENTIMENT_BATCH_SIZE).')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed of the synthetic tweets.')
+    parser.add_argument('--cache', action='store_true', help='Also measure the throughput of a temporary prediction cache.')
+    args = parser.parse_args()
+
+    tweets = make_tweets(args.seed, args.tweets)
+    texts = [t['fullText'] for t in tweets.values() if t['language'] in SUPPORTED_LANGUAGES]
+
+    huggingface_sent_batch(texts[:args.batch_size or 32], batch_size=args.batch_size, use_cache=False)
+    start = time.perf_counter()
+    single_labels = [huggingface_sent(text) for text in texts]
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_labels = huggingface_sent_batch(texts, batch_size=args.batch_size, use_cache=False)
+    batch_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predict_list(tweets, use_cache=False)
+    predict_time = time.perf_counter() - start
+
+    agreement = sum(1 for a, b in zip(single_labels, batch_labels) if a == b) / max(len(texts), 1)
+    print(f"Tweets: {len(texts)}")
+    print(f"One tweet at a time: {single_time:.2f}s ({len(texts) / single_time:.1f} tweets/s)")
+    print(f"Batched: {batch_time:.2f}s ({len(texts) / batch_time:.1f} tweets/s, {single_time / batch_time:.1f}x)")
+    print(f"predict_list: {predict_time:.2f}s ({len(tweets) / predict_time:.1f} tweets/s)")
+    print(f"Label agreement: {agreement:.4f}")
+    if args.cache:
+        labels = {preprocess(text, remove_http_mentions=True, keep_flag=False): label for text, label in zip(texts, batch_labels)}
+        with tempfile.TemporaryDirectory() as folder:
+            cache = PredictionCache(join(folder, 'benchmark.db'), 'benchmark', max(len(labels), 1))
+            start = time.perf_counter()
+            cache.put_many(labels)
+            put_time = time.perf_counter() - start
+            start = time.perf_counter()
+            cache.get_many(list(labels.keys()))
+            get_time = time.perf_counter() - start
+        print(f"Prediction cache: {len(labels)} texts, put {len(labels) / put_time:.1f} texts/s, get {len(labels) / get_time:.1f} texts/s")
+    if agreement < 0.99:
+        sys.exit(1)
@@ -0,0 +1,107 @@
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from os.path import abspath, join
+from scipy.special import softmax
+try:
+    source_dir = abspath(join('../../'))
+    sys.path.append(source_dir)
+except Exception as exp:
+    print("Solr Class Not Found, please make sure the solr_class.py file exists in the root folder!")
+    sys.exit(-1)
+from configs import ApplicationConfig
+# The analyser loads the PyTorch model, the ONNX one is loaded below.
+ApplicationConfig.SENTIMENT_BACKEND = 'torch'
+from analyser_core_huggenface import MODEL, MAX_LENGTH, SUPPORTED_LANGUAGES, tokenizer, config, preprocess, huggingface_sent_batch, model as torch_model
+from sentiment_backends import load_sentiment_model
+from benchmark_sentiment import make_tweets
+
+"""This script compares the ONNX Runtime (int8) backend of the sentiment analyser with the PyTorch backend:
+ - accuracy parity: the labels and probabilities of both backends on the fixture set (sentiment_fixtures.json);
+ - latency: the time to classify one tweet (batch of 1) over the fixture set;
+ - throughput: the number of synthetic tweets classified per second with the batched inference.
+The ONNX model is exported (and cached) first if needed. The script exits with an error if the label agreement on the
+fixture set is below --min_agreement.
+
+Run it from the socioxplorer-backend/sentiment_api folder, e.g.: python compare_sentiment_backends.py --report report.json
+"""
+
+
+def fixture_parity(fixtures, backends):
+    """ Classifies the fixtures one at a time with each backend.
+
+    Args:
+        :fixtures: (list[dict]) The fixture tweets ({'id', 'language', 'fullText'}).
+        :backends: (dict) The models, by backend name.
+
+    Returns:
+        :tuple: The probabilities of each backend (one row per fixture), and the latencies (in seconds) of each backend.
+    """
+    probabilities = {name: [] for name in backends}
+    latencies = {name: [] for name in backends}
+    for fixture in fixtures:
+        text = preprocess(fixture['fullText'], remove_http_mentions=True, keep_flag = False)
+        for name, sentiment_model in backends.items():
+            start = time.perf_counter()
+            encoded_input = tokenizer(text, truncation=True, max_length=MAX_LENGTH, return_tensors=sentiment_model.return_tensors)
+            scores = sentiment_model.logits(encoded_input)[0]
+            latencies[name].append(time.perf_counter() - start)
+            probabilities[name].append(softmax(scores))
+    return {name: np.array(p) for name, p in probabilities.items()}, latencies
+
+
+def throughput(texts, sentiment_model, batch_size):
+    """ Returns the number of texts classified per second with the batched inference.
+    """
+    huggingface_sent_batch(texts[:batch_size], batch_size=batch_size, sentiment_model=sentiment_model)
+    start = time.perf_counter()
+    huggingface_sent_batch(texts, batch_size=batch_size, sentiment_model=sentiment_model)
+    return len(texts) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compares the ONNX Runtime and the PyTorch sentiment backends.')
+    parser.add_argument('--fixtures', type=str, default='sentiment_fixtures.json', help='The fixture set (JSON list of tweets).')
+    parser.add_argument('--tweets', type=int, default=2000, help='Number of synthetic tweets for the throughput.')
+    parser.add_argument('--batch_size', type=int, default=ApplicationConfig.SENTIMENT_BATCH_SIZE, help='Batch size for the throughput.')
+    parser.add_argument('--min_agreement', type=float, default=0.95, help='Minimum label agreement on the fixtures.')
+    parser.add_argument('--report', type=str, default=None, help='Optional path of a JSON file to write the report to.')
+    args = parser.parse_args()
+
+    with open(args.fixtures, 'r', encoding='utf-8') as fin:
+        fixtures = json.load(fin)
+    start = time.perf_counter()
+    onnx_model = load_sentiment_model(MODEL, 'onnx')
+    onnx_load_time = time.perf_counter() - start
+    backends = {'torch': torch_model, 'onnx': onnx_model}
+
+    probabilities, latencies = fixture_parity(fixtures, backends)
+    labels = {name: p.argmax(axis=1) for name, p in probabilities.items()}
+    agreement = float((labels['torch'] == labels['onnx']).mean())
+    disagreements = [{'id': fixture['id'], 'fullText': fixture['fullText'], 'torch': config.id2label[int(t)], 'onnx': config.id2label[int(o)]}
+                     for fixture, t, o in zip(fixtures, labels['torch'], labels['onnx']) if t != o]
+
+    texts = [t['fullText'] for t in make_tweets(42, args.tweets).values() if t['language'] in SUPPORTED_LANGUAGES]
+    report = {'fixtures': len(fixtures),
+              'label_agreement': agreement,
+              'max_probability_difference': float(np.abs(probabilities['torch'] - probabilities['onnx']).max()),
+              'mean_probability_difference': float(np.abs(probabilities['torch'] - probabilities['onnx']).mean()),
+              'disagreements': disagreements,
+              'onnx_load_seconds': onnx_load_time,
+              'latency_ms': {name: {'p50': float(np.percentile(l, 50) * 1000), 'p95': float(np.percentile(l, 95) * 1000)} for name, l in latencies.items()},
+              'throughput_tweets_per_second': {name: throughput(texts, m, args.batch_size) for name, m in backends.items()}}
+
+    print(f"Fixtures: {report['fixtures']}, label agreement: {agreement:.4f}, max probability difference: {report['max_probability_difference']:.4f}")
+    for disagreement in disagreements:
+        print(f"  {disagreement}")
+    for name in backends:
+        print(f"{name}: latency p50 {report['latency_ms'][name]['p50']:.1f}ms, p95 {report['latency_ms'][name]['p95']:.1f}ms, "
+              f"throughput {report['throughput_tweets_per_second'][name]:.1f} tweets/s (batch size {args.batch_size})")
+    print(f"Speed-up (throughput): {report['throughput_tweets_per_second']['onnx'] / report['throughput_tweets_per_second']['torch']:.1f}x")
+    if args.report:
+        with open(args.report, 'w') as fout:
+            json.dump(report, fout, indent=1)
+    if agreement < args.min_agreement:
+        sys.exit(1)
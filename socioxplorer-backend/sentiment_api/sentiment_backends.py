@@ -0,0 +1,139 @@
+import os
+import sys
+import json
+import numpy as np
+from transformers import AutoModelForSequenceClassification
+try:
+    source_dir = os.path.abspath(os.path.join('../../'))
+    sys.path.append(source_dir)
+except Exception as exp:
+    print("Solr Class Not Found, please make sure the solr_class.py file exists in the root folder!")
+    sys.exit(-1)
+from configs import ApplicationConfig
+
+"""This file contains the inference backends of the sentiment analyser. Both expose the same interface: return_tensors
+(the tensor type the tokenizer must return for them) and logits(encoded_input), which returns the logits as a numpy
+array of shape (batch, labels).
+ - torch: the Huggingface model run with PyTorch (full precision).
+ - onnx: the same model exported once to ONNX, quantized to int8 (dynamic quantization of the weights) and run with ONNX
+   Runtime. The export is cached in SENTIMENT_ONNX_DIR; delete its folder to re-export the model (e.g. after updating
+   the weights of a local model).
+"""
+
+BACKENDS = ['torch', 'onnx']
+
+
+class TorchSentimentModel:
+    """A sentiment model run with PyTorch.
+    """
+    return_tensors = 'pt'
+
+    def __init__(self, model_path, threads=0):
+        """Loads the model.
+
+        Args:
+            model_path (str): the name or local path of the Huggingface model.
+            threads (int, optional): the number of intra-op threads. Defaults to 0 (the PyTorch default).
+        """
+        import torch
+        self.torch = torch
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_path)
+        self.model.eval()
+
+    def logits(self, encoded_input):
+        """Runs the model.
+
+        Args:
+            encoded_input (dict): the output of the tokenizer (PyTorch tensors).
+
+        Returns:
+            np.ndarray: the logits of each sequence.
+        """
+        with self.torch.inference_mode():
+            return self.model(**encoded_input)[0].numpy()
+
+
+class OnnxSentimentModel:
+    """A sentiment model exported to ONNX, quantized to int8 and run with ONNX Runtime.
+    """
+    return_tensors = 'np'
+
+    def __init__(self, model_path, cache_dir, threads=0):
+        """Loads the quantized model from the cache, exporting it first if needed.
+
+        Args:
+            model_path (str): the name or local path of the Huggingface model.
+            cache_dir (str): the folder where the exported models are cached.
+            threads (int, optional): the number of intra-op threads. Defaults to 0 (the ONNX Runtime default, i.e. \
+                one per physical core).
+        """
+        import onnxruntime
+        self.path = os.path.join(cache_dir, model_path.strip('/').replace('/', '_').replace('.', '_'))
+        quantized_file = os.path.join(self.path, 'model.quant.onnx')
+        if not os.path.exists(quantized_file):
+            self.export(model_path, quantized_file)
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(quantized_file, options, providers=['CPUExecutionProvider'])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def export(self, model_path, quantized_file):
+        """Exports the PyTorch model to ONNX and quantizes its weights to int8. The files are written under \
+        temporary names then renamed, so that concurrent workers never load a partial export.
+
+        Args:
+            model_path (str): the name or local path of the Huggingface model.
+            quantized_file (str): the path of the quantized model.
+        """
+        import torch
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        print(f'Exporting {model_path} to ONNX in {self.path} ...')
+        os.makedirs(self.path, exist_ok=True)
+        model = AutoModelForSequenceClassification.from_pretrained(model_path)
+        model.eval()
+        model_file = os.path.join(self.path, f'model.{os.getpid()}.onnx')
+        tmp_quantized_file = os.path.join(self.path, f'model.quant.{os.getpid()}.onnx')
+        dummy_input = torch.ones((1, 8), dtype=torch.long)
+        torch.onnx.export(model, (dummy_input, dummy_input), model_file, input_names=['input_ids', 'attention_mask'],
+                          output_names=['logits'], opset_version=14,
+                          dynamic_axes={'input_ids': {0: 'batch', 1: 'sequence'}, 'attention_mask': {0: 'batch', 1: 'sequence'}, 'logits': {0: 'batch'}})
+        quantize_dynamic(model_file, tmp_quantized_file, weight_type=QuantType.QInt8)
+        os.remove(model_file)
+        with open(os.path.join(self.path, 'export.json'), 'w') as fout:
+            json.dump({'model': model_path, 'opset': 14, 'weights': 'int8'}, fout)
+        os.replace(tmp_quantized_file, quantized_file)
+        print('Export done.')
+
+    def logits(self, encoded_input):
+        """Runs the model.
+
+        Args:
+            encoded_input (dict): the output of the tokenizer (numpy arrays).
+
+        Returns:
+            np.ndarray: the logits of each sequence.
+        """
+        return self.session.run(['logits'], {name: np.asarray(encoded_input[name], dtype=np.int64) for name in self.input_names})[0]
+
+
+def load_sentiment_model(model_path, backend=None):
+    """A function to load the sentiment model with the selected inference backend.
+
+    Args:
+        model_path (str): the name or local path of the Huggingface model.
+        backend (str, optional): 'torch' or 'onnx'. Defaults to SENTIMENT_BACKEND.
+
+    Returns:
+        TorchSentimentModel or OnnxSentimentModel: the model.
+    """
+    backend = backend or ApplicationConfig.SENTIMENT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f'Unknown sentiment backend {backend}, expected one of {BACKENDS}.')
+    if backend == 'onnx':
+        return OnnxSentimentModel(model_path, ApplicationConfig.SENTIMENT_ONNX_DIR, ApplicationConfig.SENTIMENT_ONNX_THREADS)
+    return TorchSentimentModel(model_path, ApplicationConfig.SENTIMENT_TORCH_THREADS)
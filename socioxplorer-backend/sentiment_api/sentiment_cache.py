@@ -0,0 +1,139 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+"""This file contains the persistent cache of the sentiment predictions. Retweets, copypasta and bot floods mean that
+many of the texts sent to /api/predict are identical once preprocessed, in the same request and across the backfills
+and re-processing runs. The label of each preprocessed text is stored in a SQLite database, keyed on a hash of the
+model id and of the text, and shared by the workers of the API. When the cache holds more than its maximum number of
+entries, the least recently used ones are evicted.
+"""
+
+LOOKUP_CHUNK = 500
+COUNT_CHECK_INTERVAL = 100
+
+
+class PredictionCache:
+    """A persistent LRU cache of sentiment labels, keyed on the preprocessed text and the model id.
+    """
+
+    def __init__(self, path, model_id, max_entries):
+        """Opens (or creates) the cache.
+
+        Args:
+            path (str): the path of the SQLite database.
+            model_id (str): the id of the model (and backend) the labels come from. Labels of other models are ignored.
+            max_entries (int): the maximum number of labels kept in the cache.
+        """
+        self.path = path
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = {'lookups': 0, 'hits': 0, 'evictions': 0}
+        if os.path.dirname(path) and not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS predictions (key BLOB PRIMARY KEY, label TEXT NOT NULL, last_used REAL NOT NULL) WITHOUT ROWID')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS predictions_last_used ON predictions (last_used)')
+        # An upper bound of the number of labels, counted again when it exceeds the maximum or every COUNT_CHECK_INTERVAL
+        # puts (the other workers of the API add labels too), instead of on every put.
+        self._count = self._connection.execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+        self._puts = 0
+
+    def make_key(self, text):
+        """A function to hash a preprocessed text with the model id.
+
+        Args:
+            text (str): the preprocessed text.
+
+        Returns:
+            bytes: the key of the text.
+        """
+        return hashlib.blake2b(f'{self.model_id}\n{text}'.encode('utf-8'), digest_size=16).digest()
+
+    def get_many(self, texts):
+        """A function to look up the labels of a list of preprocessed texts in bulk, marking the ones found as recently used.
+
+        Args:
+            texts (List[str]): the preprocessed texts.
+
+        Returns:
+            dict: the cached label of each text found in the cache.
+        """
+        keys = {self.make_key(text): text for text in texts}
+        found = dict()
+        key_list = list(keys.keys())
+        with self._lock:
+            for start in range(0, len(key_list), LOOKUP_CHUNK):
+                chunk = key_list[start:start + LOOKUP_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._connection.execute(f'SELECT key, label FROM predictions WHERE key IN ({placeholders})', chunk).fetchall()
+                if rows:
+                    self._connection.execute(f'UPDATE predictions SET last_used = ? WHERE key IN ({",".join("?" * len(rows))})',
+                                             [time.time()] + [key for key, _ in rows])
+                for key, label in rows:
+                    found[keys[key]] = label
+            self._stats['lookups'] += len(keys)
+            self._stats['hits'] += len(found)
+        return found
+
+    def put_many(self, labels):
+        """A function to store the labels of preprocessed texts, then evict the least recently used labels if the cache is full. The eviction removes 10% more than the excess, so that it only runs every so often, and the labels are only counted when the cache may be full or every COUNT_CHECK_INTERVAL puts. A failed write is rolled back.
+
+        Args:
+            labels (dict): the label of each preprocessed text.
+        """
+        if len(labels) == 0:
+            return
+        now = time.time()
+        with self._lock:
+            self._connection.execute('BEGIN')
+            try:
+                self._connection.executemany('INSERT OR REPLACE INTO predictions (key, label, last_used) VALUES (?, ?, ?)',
+                                             [(self.make_key(text), label, now) for text, label in labels.items()])
+                self._connection.execute('COMMIT')
+            except Exception:
+                self._connection.execute('ROLLBACK')
+                raise
+            self._count += len(labels)
+            self._puts += 1
+            if self._count > self.max_entries or self._puts % COUNT_CHECK_INTERVAL == 0:
+                self._count = self._connection.execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+            if self._count > self.max_entries:
+                excess = self._count - self.max_entries + self.max_entries // 10
+                self._connection.execute('DELETE FROM predictions WHERE key IN (SELECT key FROM predictions ORDER BY last_used LIMIT ?)', (excess,))
+                self._stats['evictions'] += excess
+                self._count -= excess
+
+    def get_stats(self):
+        """A function to return the counters of the cache since the API started.
+
+        Returns:
+            dict: the number of lookups, hits and evicted labels, and the hit ratio.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats['hit_ratio'] = stats['hits'] / stats['lookups'] if stats['lookups'] > 0 else 0.0
+        return stats
+
+
+def load_prediction_cache(path, model_id, max_entries):
+    """A function to open the prediction cache, or return None if it cannot be opened (the predictions are then computed without cache).
+
+    Args:
+        path (str): the path of the SQLite database.
+        model_id (str): the id of the model (and backend) the labels come from.
+        max_entries (int): the maximum number of labels kept in the cache.
+
+    Returns:
+        PredictionCache: the cache, or None.
+    """
+    try:
+        return PredictionCache(path, model_id, max_entries)
+    except Exception as e:
+        print(f'The prediction cache could not be opened: {e}')
+        return None
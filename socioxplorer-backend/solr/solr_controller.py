@@ -81,7 +81,7 @@ def init_schema(url):
     {"name":"createdAtDays","type":"string","multiValued":False,"stored":True,"omitNorms":True},
     {"name":"createdAtMonths","type":"string","multiValued":False,"stored":True,"omitNorms":True},
     {"name":"createdAtYears","type":"string","multiValued":False,"stored":True,"omitNorms":True},
-    {"name":"userScreenName","type":"string","stored":True,"multiValued":False,"indexed":True},
+    {"name":"userScreenName","type":"string","stored":True,"multiValued":False,"indexed":True,"docValues":True},
     {"name":"userName","type":"string","stored":True,"multiValued":False,"omitNorms":True,"indexed":True},
     {"name":"userId","type":"string","stored":True,"multiValued":False,"omitNorms":True},
     {"name":"usersFollowersCount","type":"pint","stored":True,"multiValued":False,"omitNorms":True},
@@ -103,8 +103,8 @@ def init_schema(url):
     {"name":"text","type":"text_general","stored":True,"multiValued":False,"indexed":True},
     {"name":"hashtags","type":"string","stored":True,"multiValued":True,"indexed":True,"omitNorms":True},
     {"name":"mentions","type":"string","stored":True,"multiValued":True,"indexed":True,"omitNorms":True},
-    {"name":"retweeters","type":"string","stored":True,"multiValued":True,"indexed":True,"omitNorms":True},
-    {"name":"retweetTimes","type":"string","stored":True,"multiValued":True,"indexed":True,"omitNorms":True},
+    {"name":"retweeters","type":"string","stored":True,"multiValued":True,"indexed":True,"omitNorms":True,"docValues":True},
+    {"name":"retweetTimes","type":"string","stored":True,"multiValued":True,"indexed":True,"omitNorms":True,"docValues":True},
     {"name":"usersDescription","type":"text_general","stored":True,"multiValued":False,"indexed":True},
     {"name":"usersLocation","type":"string","stored":True,"multiValued":False,"indexed":True},
     {"name":"inReplyToId","type":"string","stored":True,"multiValued":False,"omitNorms":True,"indexed":False,"uninvertible":False},
@@ -129,7 +129,7 @@ def init_schema(url):
     {"name":"quoteTimes","type":"string","stored":True,"multiValued":True,"indexed":True,"omitNorms":True},
     {"name":"quoteTweets","type":"string","stored":True,"multiValued":True,"indexed":True,"omitNorms":True},
     {"name":"quoters","type":"string","stored":True,"multiValued":True,"indexed":True,"omitNorms":True},
-    {"name":"repliesTimes","type":"string","stored":True,"multiValued":True,"indexed":True,"omitNorms":True},
+    {"name":"repliesTimes","type":"string","stored":True,"multiValued":True,"indexed":True,"omitNorms":True,"docValues":True},
     {"name":"repliesTweets","type":"string","stored":True,"multiValued":True,"indexed":True,"omitNorms":True},
     {"name":"replyCommunity","type":"pint","stored":True,"multiValued":False,"indexed":False,"omitNorms":True},
     {"name":"retweetCommunity","type":"pint","stored":True,"multiValued":False,"indexed":False,"omitNorms":True},
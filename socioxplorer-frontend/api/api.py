@@ -27,6 +27,8 @@ from sna_utils import *
 import traceback
 import re
 from utils import create_logger, print_this, get_tf_idf, get_request_components, initialize_database
+from search_cache import SearchCache
+from jobs import JobManager, JobLimitError
 logger = create_logger(f"API UI-Backend", file=f"api")
 
 reportFolder = ApplicationConfig.REPORTS_FOLDER
@@ -77,6 +79,11 @@ cached_tweets_folder = '../cached_tweets/'
 if os.path.exists(cached_tweets_folder) == False:
     os.mkdir(cached_tweets_folder)
 
+search_cache = SearchCache(max_bytes=ApplicationConfig.SEARCH_CACHE_MAX_BYTES, cache_dir=ApplicationConfig.SEARCH_CACHE_DIR,
+                           max_disk_bytes=ApplicationConfig.SEARCH_CACHE_DISK_MAX_BYTES)
+job_manager = JobManager(max_workers=ApplicationConfig.JOBS_MAX_WORKERS, max_jobs_per_user=ApplicationConfig.JOBS_MAX_PER_USER,
+                         result_ttl=ApplicationConfig.JOBS_RESULT_TTL)
+
 logger.info(f"System is ready!")
 # ================== AUTHENTICATION FUNCTIONS ==================
 
@@ -173,6 +180,21 @@ def get_users():
         return jsonify({"users": [{}]}), 200
     return jsonify({"error": "Unauthorized!"}), 401
 
+@app.route("/api/solr_stats", methods=["GET"])
+@flask_praetorian.auth_required
+def solr_stats():
+    """API endpoint that returns the counters of the Solr connection layer of this worker (admin only).
+
+    Response
+        :dict or tuple: A dictionary with a "pool" field holding the number of requests sent to Solr, the number of \
+            connections opened and reused, and the time spent waiting on the connection pool, and a "search_cache" \
+            field holding the hits, misses and invalidations of the /api/search result cache. Otherwise, return a \
+            dictionary containing the "error" field and an error code.
+    """
+    if 'admin' in flask_praetorian.current_user().roles:
+        return jsonify({"pool": SolrClass(filters={}).get_pool_stats(), "search_cache": search_cache.get_stats()}), 200
+    return jsonify({"error": "Unauthorized!"}), 401
+
 processing_requests_path = 'processing_requests.json'
 
 def add_request(dataSource, dataSourceText, rePreProcessData, reProcessTopics,reProcessSNA):
@@ -488,6 +510,7 @@ def search():
         :sentiment: (str) Sentiment of data (choice between "All", "Positive", "Neutral", "Negative"). By default "All"
         :location: (str) Country of data, by default "All".
         :location_type: (str) Whether country corresponds to "author" or "tweet". By default "author"
+        :bypass_cache: (bool) Whether to recompute the report even if it is in the result cache. By default False.
 
     Response:
         :hits: (int) Total volume of tweets that matched the query.
@@ -560,8 +583,20 @@ def search():
 
             dataSource = SolrClass(filters=filters)
             start = datetime.now()
-            report,hits, datasetOrigin, error_message = dataSource.optimised_json_query_handler(solr_core=source, keywords=keywords_list, operator=operator, limit=limit, top_n=count)
+            bypass_cache = bool(req['data'].get('bypass_cache', False)) or not ApplicationConfig.SEARCH_CACHE_ENABLED
+            index_version = None if bypass_cache else dataSource.get_index_version(source)
+            cache_key = SearchCache.make_key(source, keywords_list, operator, filters, limit, count)
+            cached = None if index_version is None else search_cache.get(cache_key, index_version)
+            if index_version is None:
+                search_cache.record_bypass()
+            if cached is not None:
+                report, hits, datasetOrigin, error_message = cached
+            else:
+                report,hits, datasetOrigin, error_message = dataSource.optimised_json_query_handler(solr_core=source, keywords=keywords_list, operator=operator, limit=limit, top_n=count)
+                if index_version is not None and error_message == "":
+                    search_cache.put(cache_key, index_version, [report, hits, datasetOrigin, error_message])
             end = datetime.now()
+            logger.info(f"Search cache {'hit' if cached is not None else 'miss'}: {search_cache.get_stats()}")
             keywords = [x for x in report.keys() if x != "All"]
             for k in list(report.keys()):
                 if report[k]['count'] == 0:
@@ -654,6 +689,147 @@ def update_db(user_id, interaction, community_names, current_communities):
     if changed:
         db.session.commit()
 
+def run_social_network_analysis(req, user_id, progress=None):
+    """ Computes the social network analysis results of a request (see @social_network_analysis).
+
+    Args:
+        :req: (dict) The "data" field of the request.
+        :user_id: (int) The id of the user, whose community names are used and updated.
+        :progress: (callable, optional) Called with the current stage and percent of the computation.
+
+    Returns:
+        :dict: The results, as returned under the "data" field by @social_network_analysis.
+    """
+    progress = progress or (lambda stage, percent: None)
+    max_label = req["nb_communities"]
+    interaction = req['interaction'] if 'interaction' in req.keys() else 'retweet'
+    community_names = req["community_names"] if 'community_names' in req.keys() else None
+    dataset_origin = req["datasetOrigin"]
+    reset = req["reset"] if "reset" in req else False
+
+    if reset:
+        reset_communities_names(user_id, interaction)
+        community_names = None
+    #Getting current communities from the db:
+    current_communities = get_existing_communities(user_id, interaction)
+
+    #Getting SNA data:
+    progress("Fetching the network", 5)
+    responses = get_sna_data(req, interaction)
+
+    if responses!= None and len(responses) > 0:
+
+        keywords = list(responses.keys())
+        mapping = {
+                'All sentiments': 'All Sentiments',
+                'Positive': 'Positive',
+                'Negative': 'Negative',
+                'Neutral': 'Neutral'}
+        plots_list = dict()
+        colors_list = dict()
+        top_words_list = dict()
+        network_stats_all = dict()
+        communities_traffic = dict()
+        community_names_dict = dict()
+        maps_list = dict()
+        for i, keyword in enumerate(keywords):
+            progress(f"Plotting the network of {keyword}", 40 + 50 * i / len(keywords))
+            logger.info(f"==> {keyword} ==>")
+            resp = responses[keyword]
+
+            df_sub = resp['network_df']
+            nodes_all = resp['nodes_df']
+
+            if nodes_all is not None and len(nodes_all) > 0:
+                nodes_all["community"] = nodes_all["community"].apply(str)
+                labels_all = nodes_all['community'].value_counts().index.to_list()
+
+                if community_names and type(community_names)==dict:
+                    #We got a new community_name, add it to the db.
+                    update_db(user_id, interaction, community_names, current_communities)
+
+                try:
+                    #Getting existing communities from the db:
+                    communities_naming = get_existing_communities(user_id, interaction)
+                    nodes_all["community"] = nodes_all["community"].apply(lambda x: communities_naming[x] if x in communities_naming else x)
+                    nodes_all = nodes_all.drop_duplicates(subset=['node'])
+                    logger.info(f"NB NODES BEFORE FILTERING OUT 0: {len(nodes_all)}")
+                    nodes_all = nodes_all[nodes_all["community"] != 0]
+                    logger.info(f"NB NODES AFTER FILTERING OUT 0: {len(nodes_all)}")
+                    network_stats_all[keyword] = resp['network_stats']['sentiments']
+
+                    #comm_to_rank = {communities_naming[l] if l in communities_naming else l: idx for idx,l in enumerate(labels_all) if idx < max_label}
+                    comm_to_rank = {l: idx for idx,l in enumerate(labels_all) if idx < max_label}
+                    nb_labels = min(len(labels_all),max_label)
+                    cmap = get_cmap('viridis')
+
+                    labels = [l for l in labels_all[0:nb_labels]]
+                    logger.info(f"labels: {labels}")
+                    community_names = {l: communities_naming[l] if l in communities_naming else l for l in labels}
+                    logger.info(f"community_names: {community_names}")
+                    #logger.info(f"community_names2 : {community_names}")
+                    communities_traffic[keyword] = {community_names[k]: resp['network_stats']['communities_traffic'][int(k)] for k in community_names if int(k) in resp['network_stats']['communities_traffic']}
+
+                    community_names_dict[keyword] = community_names.copy()
+                    for k in list(communities_traffic[keyword]):
+                        if k in community_names:
+                            communities_traffic[keyword][community_names[k]] = communities_traffic[keyword].pop(k)
+
+                    category_color_mapping = {x: get_color(comm_to_rank[x], cmap, max_label) if x in comm_to_rank else get_color(-1, cmap, max_label) for x in labels_all}
+                    category_color_mapping = {communities_naming[k] if k in communities_naming else k: v for k,v in category_color_mapping.items()}
+                    nodes_all['color'] = nodes_all['community'].apply(lambda x: category_color_mapping[x])
+                    colors_list[keyword] = {str(c): category_color_mapping[c] for c in category_color_mapping}
+
+                    if df_sub is not None and len(df_sub) > 0:
+                        if len(df_sub) > 0 and len(nodes_all) > 0:
+                            if len(nodes_all) > 0:
+                                nodes = nodes_all
+                                logger.info(f"\tAfter filter 1: {len(nodes)}")
+                                nodes = nodes[nodes['x']!=""]
+                                logger.info(f"\tAfter filter 2: {len(nodes)}")
+                                bokeh_cmap = CategoricalColorMapper(factors=[community_names[l] if l in community_names else str(l) for l in labels], palette=[get_color(comm_to_rank[l if l in community_names else l], cmap, max_label) for l in labels])
+                                bokeh_cmap_cop = copy.deepcopy(bokeh_cmap)
+                                plot = json.dumps(json_item(get_network_plot(nodes, bokeh_cmap_cop, datasetOrigin=dataset_origin)))
+                                top_words = get_tf_idf(nodes, "desc", "community", labels_list=list(community_names_dict[keyword].values()))
+                            else:
+                                plot = None
+                            plots_list[keyword] = plot
+                            top_words_list[keyword] = top_words
+                        else:
+                            plots_list[keyword] = None
+                            top_words_list[keyword] = []
+                except Exception as exp:
+                    logger.warning(f"ERROR :: {exp}")
+                    plots_list[keyword] = None
+                    top_words_list[keyword] = []
+                    community_names = {}
+
+            else:
+                plots_list[keyword] = None
+                top_words_list[keyword] = []
+                community_names = {}
+
+        progress("Fetching the locations and languages of the communities", 90)
+        com_loc_lang_responses = get_communities_location_and_language(req, interaction, community_names_dict)
+
+        if com_loc_lang_responses!= None and len(com_loc_lang_responses) > 0:
+            keywords = list(com_loc_lang_responses.keys())
+            for keyword in keywords:
+                maps_list[keyword] = com_loc_lang_responses[keyword]
+
+
+        return {
+            "sna_figure": plots_list,
+            "network_stats": network_stats_all,
+            "communities_traffic": communities_traffic,
+            "communities_colors": colors_list,
+            "top_words": top_words_list,
+            "communities_map": maps_list,
+            "community_names": community_names_dict,
+            }
+    return {"sna_figure": "", "network_stats": [], "communities_traffic": []}
+
+
 @app.route("/api/social_network_analysis", methods=["POST"])
 @flask_praetorian.auth_required
 def social_network_analysis():
@@ -694,138 +870,215 @@ def social_network_analysis():
             req = request.get_json(force=True)
             req = req.get('data', None)
 
-            max_label = req["nb_communities"]
-            interaction = req['interaction'] if 'interaction' in req.keys() else 'retweet'
-            community_names = req["community_names"] if 'community_names' in req.keys() else None
-            dataset_origin = req["datasetOrigin"]
-            reset = req["reset"] if "reset" in req else False
-
-            #Getting user information from the session:
-            user_id = flask_praetorian.current_user().id
-            
-            if reset:
-                reset_communities_names(user_id, interaction)
-                community_names = None
-            #Getting current communities from the db:
-            current_communities = get_existing_communities(user_id, interaction)
-
-            #Getting SNA data:
-            responses = get_sna_data(req, interaction)
-
-            if responses!= None and len(responses) > 0:
-
-                keywords = list(responses.keys())
-                mapping = {
-                        'All sentiments': 'All Sentiments',
-                        'Positive': 'Positive',
-                        'Negative': 'Negative',
-                        'Neutral': 'Neutral'}
-                plots_list = dict()
-                colors_list = dict()
-                top_words_list = dict()
-                network_stats_all = dict()
-                communities_traffic = dict()
-                community_names_dict = dict()
-                maps_list = dict()
-                for keyword in keywords:
-                    logger.info(f"==> {keyword} ==>")
-                    resp = responses[keyword]
-
-                    df_sub = resp['network_df']
-                    nodes_all = resp['nodes_df']
-                    
-                    if nodes_all is not None and len(nodes_all) > 0:
-                        nodes_all["community"] = nodes_all["community"].apply(str)
-                        labels_all = nodes_all['community'].value_counts().index.to_list()
-
-                        if community_names and type(community_names)==dict:
-                            #We got a new community_name, add it to the db.
-                            update_db(user_id, interaction, community_names, current_communities)
-
-                        try:
-                            #Getting existing communities from the db:
-                            communities_naming = get_existing_communities(user_id, interaction)
-                            nodes_all["community"] = nodes_all["community"].apply(lambda x: communities_naming[x] if x in communities_naming else x)
-                            nodes_all = nodes_all.drop_duplicates(subset=['node'])
-                            logger.info(f"NB NODES BEFORE FILTERING OUT 0: {len(nodes_all)}")
-                            nodes_all = nodes_all[nodes_all["community"] != 0]
-                            logger.info(f"NB NODES AFTER FILTERING OUT 0: {len(nodes_all)}")
-                            network_stats_all[keyword] = resp['network_stats']['sentiments']
-
-                            #comm_to_rank = {communities_naming[l] if l in communities_naming else l: idx for idx,l in enumerate(labels_all) if idx < max_label}
-                            comm_to_rank = {l: idx for idx,l in enumerate(labels_all) if idx < max_label}
-                            nb_labels = min(len(labels_all),max_label)
-                            cmap = get_cmap('viridis')
-
-                            labels = [l for l in labels_all[0:nb_labels]]
-                            logger.info(f"labels: {labels}")
-                            community_names = {l: communities_naming[l] if l in communities_naming else l for l in labels}
-                            logger.info(f"community_names: {community_names}")
-                            #logger.info(f"community_names2 : {community_names}")
-                            communities_traffic[keyword] = {community_names[k]: resp['network_stats']['communities_traffic'][int(k)] for k in community_names if int(k) in resp['network_stats']['communities_traffic']}
-
-                            community_names_dict[keyword] = community_names.copy()
-                            for k in list(communities_traffic[keyword]):
-                                if k in community_names:
-                                    communities_traffic[keyword][community_names[k]] = communities_traffic[keyword].pop(k)
-
-                            category_color_mapping = {x: get_color(comm_to_rank[x], cmap, max_label) if x in comm_to_rank else get_color(-1, cmap, max_label) for x in labels_all}
-                            category_color_mapping = {communities_naming[k] if k in communities_naming else k: v for k,v in category_color_mapping.items()}
-                            nodes_all['color'] = nodes_all['community'].apply(lambda x: category_color_mapping[x])
-                            colors_list[keyword] = {str(c): category_color_mapping[c] for c in category_color_mapping}
-
-                            if df_sub is not None and len(df_sub) > 0:
-                                if len(df_sub) > 0 and len(nodes_all) > 0:
-                                    if len(nodes_all) > 0:
-                                        nodes = nodes_all
-                                        logger.info(f"\tAfter filter 1: {len(nodes)}")
-                                        nodes = nodes[nodes['x']!=""]
-                                        logger.info(f"\tAfter filter 2: {len(nodes)}")
-                                        bokeh_cmap = CategoricalColorMapper(factors=[community_names[l] if l in community_names else str(l) for l in labels], palette=[get_color(comm_to_rank[l if l in community_names else l], cmap, max_label) for l in labels])
-                                        bokeh_cmap_cop = copy.deepcopy(bokeh_cmap)
-                                        plot = json.dumps(json_item(get_network_plot(nodes, bokeh_cmap_cop, datasetOrigin=dataset_origin)))
-                                        top_words = get_tf_idf(nodes, "desc", "community", labels_list=list(community_names_dict[keyword].values()))
-                                    else:
-                                        plot = None
-                                    plots_list[keyword] = plot
-                                    top_words_list[keyword] = top_words
-                                else:
-                                    plots_list[keyword] = None
-                                    top_words_list[keyword] = []
-                        except Exception as exp:
-                            logger.warning(f"ERROR :: {exp}")
-                            plots_list[keyword] = None
-                            top_words_list[keyword] = []
-                            community_names = {}
-                            
-                    else:
-                        plots_list[keyword] = None
-                        top_words_list[keyword] = []
-                        community_names = {}
-
-                com_loc_lang_responses = get_communities_location_and_language(req, interaction, community_names_dict)
-
-                if com_loc_lang_responses!= None and len(com_loc_lang_responses) > 0:
-                    keywords = list(com_loc_lang_responses.keys())
-                    for keyword in keywords:
-                        maps_list[keyword] = com_loc_lang_responses[keyword]
-
-
-                return jsonify({'data':{
-                    "sna_figure": plots_list,
-                    "network_stats": network_stats_all,
-                    "communities_traffic": communities_traffic,
-                    "communities_colors": colors_list,
-                    "top_words": top_words_list,
-                    "communities_map": maps_list,
-                    "community_names": community_names_dict,
-                    }})
-            return jsonify({'data':{"sna_figure": "", "network_stats": [], "communities_traffic": []}})
+            return jsonify({'data': run_social_network_analysis(req, flask_praetorian.current_user().id)})
     except Exception as exp:
         logger.warning(f"Error: {exp}")
         logger.warning(f"Error: {traceback.format_exc()}")
         return jsonify({"Message": "Unauthorized!"}), 401
 
+def run_topic_modelling(req, progress=None):
+    """ Computes the Topic Discovery results of a request (see @topic_modelling).
+
+    Args:
+        :req: (dict) The "data" field of the request.
+        :progress: (callable, optional) Called with the current stage and percent of the computation.
+
+    Returns:
+        :dict: The results, as returned under the "data" field by @topic_modelling.
+    """
+    progress = progress or (lambda stage, percent: None)
+    communitiesList = req["communities_list"] if "communities_list" in req else None
+    interactionCommunity = req["interactionCommunity"] if "interactionCommunity" in req else False
+    focusOnMainCommunities = req["focusOnMainCommunities"] if "focusOnMainCommunities" in req else None
+    datasetOrigin = req["datasetOrigin"] if "datasetOrigin" in req else None
+    core_ = req['dataSource']
+    random_seed = get_request_components(req)[2]["randomSeed"]
+    logger.info(f"THIS IS THE COMMUNITIES: {communitiesList}\nand COMMUNITY INTERACTION: {interactionCommunity}")
+    start = time.time()
+
+    rel_sentiments = ['All sentiments', 'Positive', 'Negative', 'Neutral'] if req["sentiment"] == "All" else [req["sentiment"]]
+
+    # Get relevant data from Solr for the current request
+    progress("Fetching the data", 5)
+    if focusOnMainCommunities:
+        print("FOCUSING ON MAIN COMMUNITIES")
+        print("This is the communitiesList object", communitiesList)
+        responses = get_topic_data(req, interactionCommunity, communitiesList)
+    else:
+        print("NOT FOCUSING ON MAIN COMMUNITIES")
+        responses = get_topic_data(req, interactionCommunity)
+    keywords = list(responses.keys())
+
+    # Generate empty object in which results will be stored
+    plots_list = dict() # Info for Bokeh plots
+    topics_per_com_plots = None if communitiesList is None else {k: dict() for k in keywords} # Topics per community graphs
+    top_words = None if req["nb_topics"] == 0 else {k: dict() for k in keywords} # Info for topic wordclouds
+    # Get the data that corresponds to the "All" keyword
+    progress("Preprocessing the data", 30)
+    if len(keywords) > 1:
+        df_ALL = pd.concat([pd.DataFrame(responses[k]) for k in keywords if k != "All"]).drop_duplicates(["fullText"])
+        df_ALL = preprocess_data(df_ALL, random_seed)
+    else:
+        df_ALL = pd.DataFrame(responses[keywords[0]])
+        df_ALL = preprocess_data(df_ALL, random_seed)
+
+    print("TOTAL NB TWEETS FOUND", len(df_ALL))
+
+    #logger.info(f"COLUMNS IN TM DATA (1): {df_ALL.columns}")
+
+    # If the dataframe with the data does not contain the field "fullText", return an empty results dictionary.
+    if not 'fullText' in df_ALL.columns:
+        return {"figures": "", "top_words": []}
+
+    # Generate the "Topic" field in the dataframe for the data corresponding to the keyword "All"
+    if req["nb_topics"] == 0:
+        # If the number of topics specified is 0, all topics are None
+        df_ALL['Topic'] = [None] * len(df_ALL)
+    else:
+        # Otherwise, tweets are labelled with topic numbers by applying the K-means algorithm to the tweets'
+        # 5d embeddings
+        progress("Clustering the topics", 40)
+        umap_embeddings = df_ALL["embedding_5d"].to_list()
+        model = KMeans(n_clusters=min(req["nb_topics"], len(df_ALL)) if req["nb_topics"] != None else 1)
+        model.fit(umap_embeddings)
+        yhat = model.predict(umap_embeddings)
+        df_ALL['Topic'] = yhat
+
+        # Change topic order
+        df_ALL = change_topic_order(df_ALL)
+
+    # Set the "Size" of all tweets in the scatter plot to be equal to 4
+    df_ALL["size"] = [4] * len(df_ALL)
+
+    # Generate the "color" field in the dataframe for the data corresponding to the keyword "All"
+    if req["nb_topics"] == 0:
+        # If the number of topics specified is 0, all the tweets in the scatter plot are colored in grey
+        df_ALL["color"] = ['#BDBDBD'] * len(df_ALL)
+        bokeh_cmap = None
+        topic_names = {}
+    else:
+        # Otherwise, the color is obtained from the topic number using the "get_color" function
+        labels = sorted(list(set(df_ALL["Topic"].to_list())))
+        topic_names = {l: l for l in labels}
+        max_label = max(labels) + 1
+        cmap = get_cmap('jet')
+        bokeh_cmap = CategoricalColorMapper(factors=[str(l) for l in labels], palette=[get_color(l, cmap, max_label) for l in labels])
+        df_ALL["color"] = df_ALL["Topic"].apply(lambda x: get_color(x, cmap, max_label))
+        df_ALL['Topic'] = df_ALL['Topic'].apply(lambda x: str(int(x)))
+
+    # The following code is concerned with adding a custom claim (from the "claim" argument from query header) onto the
+    # Topic Discovery scatter plot
+    new_row = None
+    if req["claim"].strip() != "":
+
+        # Use the SBERT classifier, the parametric UMAP embedder to reduce 768 dimensional embeddings to 5 dimensions
+        # and that to reduce 5 dimensional embeddings to 2 dimensions
+        global CLASSIFIER
+        global EMBEDDERS_5D
+        global EMBEDDERS_2D
+
+        # Obtain different encodings for the "claim" query argument
+        encoding = CLASSIFIER.encode(req["claim"])
+        if ApplicationConfig.LIMITED_RESOURCE:
+            encoding = CLASSIFIER.encode(req["claim"], batch_size=ApplicationConfig.BATCH_SIZE)
+
+        encoding_5d = EMBEDDERS_5D[core_].transform([encoding])[0]
+        encoding_2d = EMBEDDERS_2D[core_].transform([encoding_5d])[0]
+
+        # Create new row to append to dataframe
+        new_row = {"display_text": req["claim"], "color": "#000000", "x": encoding_2d[0], "y": encoding_2d[1], "size": 12, "Topic": None}
+
+
+    for i, keyword in enumerate(keywords):
+        progress(f"Plotting the topics of {keyword}", 50 + 50 * i / len(keywords))
+        plots_list[keyword] = dict()
+        if not topics_per_com_plots is None:
+            topics_per_com_plots[keyword] = dict()
+
+        # Get the data that corresponds to the current keyword
+        if keyword == "All" or len(keywords) == 1:
+            df_sub = df_ALL
+        else:
+            df = pd.DataFrame(responses[keyword])
+            df_sub = preprocess_data(df, random_seed)
+            # Merge the Topic, color and size fields obtained above from df_ALL with the data for the current keyword
+            # This has been added to solve the empty df_sub DataFrame.
+            if len(df_sub) > 0:
+                if "videoId" in df_ALL.columns and new_row!= None: 
+                    new_row["videoId"] = None
+                df_sub = pd.merge(df_sub, df_ALL[["id", "videoId", "Topic", "color", "size"]], on="id", how="inner") if "videoId" in df_ALL.columns else pd.merge(df_sub, df_ALL[["id", "Topic", "color", "size"]], on="id", how="inner")
+            else:
+                df_sub = df_ALL[["id", "videoId", "sentiment","Topic", "color", "size"]].sample(0) if "videoId" in df_ALL.columns else df_ALL[["id", "sentiment","Topic", "color", "size"]].sample(0)
+        mapping = {
+                'All sentiments': 'All Sentiments',
+                'Positive': 'Positive',
+                'Negative': 'Negative',
+                'Neutral': 'Neutral'
+            }
+
+        # Generate the Topic Discovery scatter plot for each sentiment
+        for sentiment in rel_sentiments:
+
+            plots_list[keyword][mapping[sentiment]] = dict()
+
+            if sentiment == 'All sentiments':
+                df_rel = df_sub
+            else:
+                df_rel = df_sub[df_sub["sentiment"] == sentiment]
+
+            #logger.info(f"Nb tweets: {keyword} - {sentiment}: {len(df_rel)}")
+
+            # Add the datapoint for the "claim" query argument onto the scatter plot
+            if not new_row is None:
+                df_rel = pd.concat([df_rel, pd.DataFrame([new_row])])
+
+            # If tweets are labelled with topics, generate the TF-IDF info for each topic (for topic wordclouds)
+            if req["nb_topics"] and req["nb_topics"] > 0:
+                top_words[keyword][mapping[sentiment]] = get_tf_idf(df_rel, "processed_text", "Topic")
+
+            # Append scatter plot to empty results object
+            if len(df_rel) == 0:
+                plot = None
+            else:
+                bokeh_cmap_cop = copy.deepcopy(bokeh_cmap)
+                plot = json_item(get_plot(df_rel, bokeh_cmap=bokeh_cmap_cop, datasetOrigin=datasetOrigin))
+
+            plots_list[keyword][mapping[sentiment]]["All Communities"] = json.dumps(plot)
+
+            if communitiesList and keyword in communitiesList:
+                logger.info("--> Generating plot of topics per community")
+                logger.info(f"--> Generating plot of topics per community {communitiesList}")
+                logger.info(f"--> interactionCommunity: {communitiesList[keyword] if keyword in communitiesList else communitiesList}")
+                if len(df_rel) == 0 or len(communitiesList[keyword]) == 0 or keyword not in communitiesList:
+                    topics_per_com_plots[keyword][mapping[sentiment]] = None
+                else:
+                    logger.info(f"--> interactionCommunity: {communitiesList[keyword] if keyword in communitiesList else communitiesList}")
+                    topics_per_com_plots[keyword][mapping[sentiment]] = get_topics_per_communities_plot(df_rel, communitiesList[keyword], interactionCommunity)
+                logger.info("--> Generating plot per community")
+
+                if keyword in communitiesList and plot is not None:
+                    doc = Document.from_json(plot["doc"])
+                    new_plot=doc.roots[0]
+                    datasource = new_plot.select(dict(type=ColumnDataSource))[0]
+                    df_rel = pd.DataFrame(datasource.data.copy())
+                    plots_list[keyword][mapping[sentiment]] = filter_topic_modelling_per_community(communitiesList[keyword], interactionCommunity, new_plot, datasource, df_rel)
+                else:
+                    plots_list[keyword][mapping[sentiment]] = []
+                    #plots_list[keyword][mapping[sentiment]][community] = []
+            elif focusOnMainCommunities:
+                plots_list[keyword][mapping[sentiment]] = []
+
+
+        if top_words != None:
+            compute_positive_negative(top_words, keyword)
+
+    end = time.time()
+    logger.info(f"\t\t...time = {(end - start):.1f}")
+
+    resp = {"figures": plots_list, "top_words": top_words, "topic_names": topic_names, "topics_per_community": topics_per_com_plots}
+    return resp
+
+
 @app.route("/api/topic_modelling", methods=["POST"])
 @flask_praetorian.auth_required
 def topic_modelling():
@@ -872,191 +1125,7 @@ def topic_modelling():
             # Get API request header
             req = request.get_json(force=True)
             req = req.get('data', None)
-            communitiesList = req["communities_list"] if "communities_list" in req else None
-            interactionCommunity = req["interactionCommunity"] if "interactionCommunity" in req else False
-            focusOnMainCommunities = req["focusOnMainCommunities"] if "focusOnMainCommunities" in req else None
-            datasetOrigin = req["datasetOrigin"] if "datasetOrigin" in req else None
-            core_ = req['dataSource']
-            logger.info(f"THIS IS THE COMMUNITIES: {communitiesList}\nand COMMUNITY INTERACTION: {interactionCommunity}")
-            start = time.time()
-
-            rel_sentiments = ['All sentiments', 'Positive', 'Negative', 'Neutral'] if req["sentiment"] == "All" else [req["sentiment"]]
-
-            # Get relevant data from Solr for the current request
-            if focusOnMainCommunities:
-                print("FOCUSING ON MAIN COMMUNITIES")
-                print("This is the communitiesList object", communitiesList)
-                responses = get_topic_data(req, interactionCommunity, communitiesList)
-            else:
-                print("NOT FOCUSING ON MAIN COMMUNITIES")
-                responses = get_topic_data(req, interactionCommunity)
-            keywords = list(responses.keys())
-
-            # Generate empty object in which results will be stored
-            plots_list = dict() # Info for Bokeh plots
-            topics_per_com_plots = None if communitiesList is None else {k: dict() for k in keywords} # Topics per community graphs
-            top_words = None if req["nb_topics"] == 0 else {k: dict() for k in keywords} # Info for topic wordclouds
-            # Get the data that corresponds to the "All" keyword
-            if len(keywords) > 1:
-                df_ALL = pd.concat([pd.DataFrame(responses[k]) for k in keywords if k != "All"]).drop_duplicates(["fullText"])
-                df_ALL = preprocess_data(df_ALL)
-            else:
-                df_ALL = pd.DataFrame(responses[keywords[0]])
-                df_ALL = preprocess_data(df_ALL)
-
-            print("TOTAL NB TWEETS FOUND", len(df_ALL))
-
-            #logger.info(f"COLUMNS IN TM DATA (1): {df_ALL.columns}")
-
-            # If the dataframe with the data does not contain the field "fullText", return an empty results dictionary.
-            if not 'fullText' in df_ALL.columns:
-                return jsonify({'data': {"figures": "", "top_words": []}}), 200
-
-            # Generate the "Topic" field in the dataframe for the data corresponding to the keyword "All"
-            if req["nb_topics"] == 0:
-                # If the number of topics specified is 0, all topics are None
-                df_ALL['Topic'] = [None] * len(df_ALL)
-            else:
-                # Otherwise, tweets are labelled with topic numbers by applying the K-means algorithm to the tweets'
-                # 5d embeddings
-                umap_embeddings = df_ALL["embedding_5d"].to_list()
-                model = KMeans(n_clusters=min(req["nb_topics"], len(df_ALL)) if req["nb_topics"] != None else 1)
-                model.fit(umap_embeddings)
-                yhat = model.predict(umap_embeddings)
-                df_ALL['Topic'] = yhat
-
-                # Change topic order
-                df_ALL = change_topic_order(df_ALL)
-
-            # Set the "Size" of all tweets in the scatter plot to be equal to 4
-            df_ALL["size"] = [4] * len(df_ALL)
-
-            # Generate the "color" field in the dataframe for the data corresponding to the keyword "All"
-            if req["nb_topics"] == 0:
-                # If the number of topics specified is 0, all the tweets in the scatter plot are colored in grey
-                df_ALL["color"] = ['#BDBDBD'] * len(df_ALL)
-                bokeh_cmap = None
-                topic_names = {}
-            else:
-                # Otherwise, the color is obtained from the topic number using the "get_color" function
-                labels = sorted(list(set(df_ALL["Topic"].to_list())))
-                topic_names = {l: l for l in labels}
-                max_label = max(labels) + 1
-                cmap = get_cmap('jet')
-                bokeh_cmap = CategoricalColorMapper(factors=[str(l) for l in labels], palette=[get_color(l, cmap, max_label) for l in labels])
-                df_ALL["color"] = df_ALL["Topic"].apply(lambda x: get_color(x, cmap, max_label))
-                df_ALL['Topic'] = df_ALL['Topic'].apply(lambda x: str(int(x)))
-
-            # The following code is concerned with adding a custom claim (from the "claim" argument from query header) onto the
-            # Topic Discovery scatter plot
-            new_row = None
-            if req["claim"].strip() != "":
-
-                # Use the SBERT classifier, the parametric UMAP embedder to reduce 768 dimensional embeddings to 5 dimensions
-                # and that to reduce 5 dimensional embeddings to 2 dimensions
-                global CLASSIFIER
-                global EMBEDDERS_5D
-                global EMBEDDERS_2D
-
-                # Obtain different encodings for the "claim" query argument
-                encoding = CLASSIFIER.encode(req["claim"])
-                if ApplicationConfig.LIMITED_RESOURCE:
-                    encoding = CLASSIFIER.encode(req["claim"], batch_size=ApplicationConfig.BATCH_SIZE)
-                
-                encoding_5d = EMBEDDERS_5D[core_].transform([encoding])[0]
-                encoding_2d = EMBEDDERS_2D[core_].transform([encoding_5d])[0]
-
-                # Create new row to append to dataframe
-                new_row = {"display_text": req["claim"], "color": "#000000", "x": encoding_2d[0], "y": encoding_2d[1], "size": 12, "Topic": None}
-
-            
-            for keyword in keywords:
-                plots_list[keyword] = dict()
-                if not topics_per_com_plots is None:
-                    topics_per_com_plots[keyword] = dict()
-
-                # Get the data that corresponds to the current keyword
-                if keyword == "All" or len(keywords) == 1:
-                    df_sub = df_ALL
-                else:
-                    df = pd.DataFrame(responses[keyword])
-                    df_sub = preprocess_data(df)
-                    # Merge the Topic, color and size fields obtained above from df_ALL with the data for the current keyword
-                    # This has been added to solve the empty df_sub DataFrame.
-                    if len(df_sub) > 0:
-                        if "videoId" in df_ALL.columns and new_row!= None: 
-                            new_row["videoId"] = None
-                        df_sub = pd.merge(df_sub, df_ALL[["id", "videoId", "Topic", "color", "size"]], on="id", how="inner") if "videoId" in df_ALL.columns else pd.merge(df_sub, df_ALL[["id", "Topic", "color", "size"]], on="id", how="inner")
-                    else:
-                        df_sub = df_ALL[["id", "videoId", "sentiment","Topic", "color", "size"]].sample(0) if "videoId" in df_ALL.columns else df_ALL[["id", "sentiment","Topic", "color", "size"]].sample(0)
-                mapping = {
-                        'All sentiments': 'All Sentiments',
-                        'Positive': 'Positive',
-                        'Negative': 'Negative',
-                        'Neutral': 'Neutral'
-                    }
-
-                # Generate the Topic Discovery scatter plot for each sentiment
-                for sentiment in rel_sentiments:
-
-                    plots_list[keyword][mapping[sentiment]] = dict()
-
-                    if sentiment == 'All sentiments':
-                        df_rel = df_sub
-                    else:
-                        df_rel = df_sub[df_sub["sentiment"] == sentiment]
-
-                    #logger.info(f"Nb tweets: {keyword} - {sentiment}: {len(df_rel)}")
-
-                    # Add the datapoint for the "claim" query argument onto the scatter plot
-                    if not new_row is None:
-                        df_rel = pd.concat([df_rel, pd.DataFrame([new_row])])
-
-                    # If tweets are labelled with topics, generate the TF-IDF info for each topic (for topic wordclouds)
-                    if req["nb_topics"] and req["nb_topics"] > 0:
-                        top_words[keyword][mapping[sentiment]] = get_tf_idf(df_rel, "processed_text", "Topic")
-
-                    # Append scatter plot to empty results object
-                    if len(df_rel) == 0:
-                        plot = None
-                    else:
-                        bokeh_cmap_cop = copy.deepcopy(bokeh_cmap)
-                        plot = json_item(get_plot(df_rel, bokeh_cmap=bokeh_cmap_cop, datasetOrigin=datasetOrigin))
-
-                    plots_list[keyword][mapping[sentiment]]["All Communities"] = json.dumps(plot)
-
-                    if communitiesList and keyword in communitiesList:
-                        logger.info("--> Generating plot of topics per community")
-                        logger.info(f"--> Generating plot of topics per community {communitiesList}")
-                        logger.info(f"--> interactionCommunity: {communitiesList[keyword] if keyword in communitiesList else communitiesList}")
-                        if len(df_rel) == 0 or len(communitiesList[keyword]) == 0 or keyword not in communitiesList:
-                            topics_per_com_plots[keyword][mapping[sentiment]] = None
-                        else:
-                            logger.info(f"--> interactionCommunity: {communitiesList[keyword] if keyword in communitiesList else communitiesList}")
-                            topics_per_com_plots[keyword][mapping[sentiment]] = get_topics_per_communities_plot(df_rel, communitiesList[keyword], interactionCommunity)
-                        logger.info("--> Generating plot per community")
-
-                        if keyword in communitiesList and plot is not None:
-                            doc = Document.from_json(plot["doc"])
-                            new_plot=doc.roots[0]
-                            datasource = new_plot.select(dict(type=ColumnDataSource))[0]
-                            df_rel = pd.DataFrame(datasource.data.copy())
-                            plots_list[keyword][mapping[sentiment]] = filter_topic_modelling_per_community(communitiesList[keyword], interactionCommunity, new_plot, datasource, df_rel)
-                        else:
-                            plots_list[keyword][mapping[sentiment]] = []
-                            #plots_list[keyword][mapping[sentiment]][community] = []
-                    elif focusOnMainCommunities:
-                        plots_list[keyword][mapping[sentiment]] = []
-
-
-                if top_words != None:
-                    compute_positive_negative(top_words, keyword)
-
-            end = time.time()
-            logger.info(f"\t\t...time = {(end - start):.1f}")
-
-            resp = {"figures": plots_list, "top_words": top_words, "topic_names": topic_names, "topics_per_community": topics_per_com_plots}
-            return jsonify({'data':resp}), 200
+            return jsonify({'data': run_topic_modelling(req)}), 200
     except Exception as exp:
         logger.warning(f"Error: {exp}")
         logger.warning(f"Error: {traceback.format_exc()}")
@@ -1262,5 +1331,85 @@ def update_topic_names():
         return jsonify({"Message": "Unauthorized!"}), 401
 
 
+# ================== ASYNCHRONOUS JOBS ==================
+
+def run_job_in_app_context(func, *args):
+    """ Runs the work of a job inside the application context (needed by the database session).
+    """
+    with app.app_context():
+        return func(*args)
+
+
+@app.route("/api/jobs/<kind>", methods=["POST"])
+@flask_praetorian.auth_required
+def submit_job(kind):
+    """API endpoint to run the topic modelling or the social network analysis as a background job. The request is the \
+    same as for the synchronous endpoint (/api/topic_modelling or /api/social_network_analysis). Submitting the same \
+    request as an unfinished job returns that job.
+
+    Path
+        :kind: (str) "topic_modelling" or "social_network_analysis".
+
+    Response
+        :dict or tuple: A dictionary with the "job_id" and the progress of the job (see @job_progress), with code 202. \
+            Code 429 if the user already has JOBS_MAX_PER_USER unfinished jobs, and 404 for an unknown kind of job.
+    """
+    try:
+        if flask_praetorian.current_user().is_valid:
+            user_id = flask_praetorian.current_user().id
+            req = request.get_json(force=True)
+            req = req.get('data', None)
+            if kind == 'topic_modelling':
+                key = JobManager.make_key(kind, req)
+                job, created = job_manager.submit(kind, key, user_id, run_job_in_app_context, run_topic_modelling, req)
+            elif kind == 'social_network_analysis':
+                # The results depend on the community names of the user.
+                key = JobManager.make_key(kind, req, user_id)
+                job, created = job_manager.submit(kind, key, user_id, run_job_in_app_context, run_social_network_analysis, req, user_id)
+            else:
+                return jsonify({"error": f"Unknown job: {kind}"}), 404
+            return jsonify(dict(job.get_progress(), coalesced=not created)), 202
+    except JobLimitError as exp:
+        return jsonify({"error": str(exp)}), 429
+    except Exception as exp:
+        logger.warning(f"Error: {exp}")
+        logger.warning(f"Error: {traceback.format_exc()}")
+    return jsonify({"Message": "Unauthorized!"}), 401
+
+
+@app.route("/api/jobs/<job_id>/progress", methods=["GET"])
+@flask_praetorian.auth_required
+def job_progress(job_id):
+    """API endpoint that returns the progress of a job.
+
+    Response
+        :dict or tuple: A dictionary with the "job_id", "kind", "status" ("queued", "running", "done" or "failed"), \
+            "stage" (description of the current step), "percent" and "error" fields. Code 404 if the job does not exist, \
+            has expired or was not submitted by the user.
+    """
+    job = job_manager.get(job_id, flask_praetorian.current_user().id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.get_progress()), 200
+
+
+@app.route("/api/jobs/<job_id>/result", methods=["GET"])
+@flask_praetorian.auth_required
+def job_result(job_id):
+    """API endpoint that returns the result of a job.
+
+    Response
+        :dict or tuple: The result under the "data" field (as returned by the synchronous endpoint) once the job is \
+            done. Otherwise, the progress of the job with code 202 if it is still running, 500 if it failed and 404 if \
+            the job does not exist, has expired or was not submitted by the user.
+    """
+    job = job_manager.get(job_id, flask_praetorian.current_user().id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job.status == 'done':
+        return jsonify({'data': job.result}), 200
+    return jsonify(job.get_progress()), 500 if job.status == 'failed' else 202
+
+
 if __name__ == "main":
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
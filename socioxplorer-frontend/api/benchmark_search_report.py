@@ -0,0 +1,107 @@
+import sys
+import copy
+import json
+import time
+import random
+import argparse
+from os.path import abspath, join
+try:
+    source_dir = abspath(join('../../'))
+    sys.path.append(source_dir)
+except Exception as exp:
+    print("Solr Class Not Found, please make sure the solr_class.py file exists in the root folder!")
+    print("exiting...")
+    sys.exit(-1)
+from configs import ApplicationConfig
+from solr_class import SolrClass
+
+"""This script benchmarks the post-processing of the search report facets (SolrClass.build_keyword_report) with the
+loop-based and the vectorised (facet_report) implementations, on synthetic facet responses shaped like the ones that
+Solr returns for the search report. It checks that both implementations produce byte-identical reports.
+
+Run it from the socioxplorer-frontend/api folder, e.g.: python benchmark_search_report.py --buckets 10000 --top_n 500
+"""
+
+SENTIMENTS = ['Positive', 'Negative', 'Neutral']
+LANGUAGES = ['english', 'french', 'arabic', 'spanish']
+TERM_FIELDS = ['urls', 'mentions', 'retweeters', 'hashtags', 'userScreenName', 'media', 'emojis', 'processedTokens', 'processedDescTokens']
+LOCATION_FIELDS = ['tweets_locations_by_sentiments', 'users_locations_by_sentiments']
+
+
+def make_buckets(rng, prefix, vocabulary, nb_buckets):
+    """ Returns nb_buckets facet buckets drawn from a shared vocabulary, sorted by count as Solr returns them.
+    """
+    vals = rng.sample(range(vocabulary), min(nb_buckets, vocabulary))
+    buckets = [{'val': f"{prefix}{v}", 'count': rng.randint(1, 5000)} for v in vals]
+    return sorted(buckets, key=lambda x: x['count'], reverse=True)
+
+
+def make_report(seed, nb_buckets):
+    """ Builds the report groups and the facets of one keyword.
+
+    Args:
+        :seed: (int) Random seed.
+        :nb_buckets: (int) Number of buckets of each term facet, per sentiment.
+
+    Returns:
+        :tuple: The report groups and the facets, as expected by build_keyword_report.
+    """
+    rng = random.Random(seed)
+    sentiment_buckets = []
+    for sentiment in SENTIMENTS:
+        bucket = {'val': sentiment, 'count': rng.randint(10000, 100000)}
+        bucket['Sentiments_Distributions'] = {'buckets': [{'val': f"2024-01-{d:02d}", 'count': rng.randint(1, 500)} for d in range(1, 29)]}
+        for field in LOCATION_FIELDS:
+            bucket[field] = {'buckets': make_buckets(rng, 'C', 250, 200)}
+        for field in TERM_FIELDS:
+            bucket[field] = {'buckets': make_buckets(rng, field[:3], int(nb_buckets * 1.5), nb_buckets)}
+        bucket['processedTokens']['buckets'] += [{'val': 'the', 'count': 1}, {'val': 'a', 'count': 1}]
+        sentiment_buckets.append(bucket)
+    language_buckets = []
+    for language in LANGUAGES:
+        language_buckets.append({'val': language, 'count': rng.randint(100, 10000),
+                                 'tweets_locations_by_languages': {'buckets': make_buckets(rng, 'C', 250, 200)},
+                                 'users_locations_by_languages': {'buckets': make_buckets(rng, 'C', 250, 200)}})
+    report_groups = {sentiment: [{'id': f"{sentiment}{i}", 'fullText': 'text', 'createdAtDays': '2024-01-01', 'userScreenName': f"user{i % 7}",
+                                  'retweetCount': rng.randint(0, 99), 'language': 'english', 'sentiment': sentiment} for i in range(20)]
+                     for sentiment in SENTIMENTS}
+    facets = {'count': rng.randint(10000, 50000),
+              'traffic': {'buckets': [{'val': f"2024-01-{d:02d}", 'count': d} for d in range(1, 29)]},
+              'Sentiments': {'buckets': sentiment_buckets},
+              'Languages': {'buckets': language_buckets}}
+    return report_groups, facets
+
+
+def run(solr, report_groups, facets, top_n, vectorised, repeats):
+    """ Runs build_keyword_report on fresh copies of the inputs and returns the best time and the serialised report.
+    """
+    ApplicationConfig.SOLR_VECTORISED_REPORTS = vectorised
+    best, output = None, None
+    for _ in range(repeats):
+        groups, report = copy.deepcopy(report_groups), copy.deepcopy(facets)
+        start = time.perf_counter()
+        output = solr.build_keyword_report(groups, report, top_n)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, json.dumps(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the post-processing of the search report facets.')
+    parser.add_argument('--buckets', type=int, default=10000, help='Number of buckets of each term facet, per sentiment.')
+    parser.add_argument('--top_n', type=int, default=500, help='Number of top results kept per field.')
+    parser.add_argument('--repeats', type=int, default=3, help='Number of runs per implementation (the best is reported).')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed of the synthetic facets.')
+    args = parser.parse_args()
+
+    solr = SolrClass(filters={})
+    report_groups, facets = make_report(args.seed, args.buckets)
+    loop_time, loop_report = run(solr, report_groups, facets, args.top_n, False, args.repeats)
+    vectorised_time, vectorised_report = run(solr, report_groups, facets, args.top_n, True, args.repeats)
+
+    print(f"Buckets per facet: {args.buckets}, top_n: {args.top_n}")
+    print(f"Loop-based post-processing: {loop_time:.3f}s")
+    print(f"Vectorised post-processing: {vectorised_time:.3f}s ({loop_time / vectorised_time:.1f}x)")
+    print(f"Byte-identical reports: {loop_report == vectorised_report} ({len(loop_report)} bytes)")
+    if loop_report != vectorised_report:
+        sys.exit(1)
@@ -0,0 +1,173 @@
+import json
+import time
+import uuid
+import hashlib
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from utils import create_logger
+logger = create_logger(f"Jobs", file=f"api")
+
+"""This file contains the job subsystem used by the asynchronous topic modelling and social network analysis endpoints.
+Jobs run on a bounded thread pool (threads rather than processes, as the jobs need the Flask application context, the
+database session and the embedding models already loaded by the API). Each user can only have a limited number of
+unfinished jobs, and submitting a job with the same parameters as an unfinished one returns that job instead of
+starting a new one. The jobs are held in the memory of the API process, so the API must run as a single process (e.g.
+flask run, or gunicorn with one worker and several threads) for their progress and result to be found.
+"""
+
+
+class JobLimitError(Exception):
+    """ Raised when a user submits a job while already having the maximum number of unfinished jobs.
+    """
+    pass
+
+
+class Job:
+    """ A job and its progress.
+    """
+
+    def __init__(self, job_id, kind, key, user_id):
+        self.id = job_id
+        self.kind = kind
+        self.key = key
+        self.owners = {user_id}
+        self.status = 'queued'
+        self.stage = 'Queued'
+        self.percent = 0
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.finished = None
+
+    def is_finished(self):
+        return self.status in ['done', 'failed']
+
+    def get_progress(self):
+        """ Returns the progress of the job.
+
+        Returns:
+            :dict: The job id, kind, status ("queued", "running", "done" or "failed"), stage, percent and error.
+        """
+        return {'job_id': self.id, 'kind': self.kind, 'status': self.status, 'stage': self.stage,
+                'percent': self.percent, 'error': self.error}
+
+
+class JobManager:
+    """ Runs jobs on a bounded thread pool, with per-user limits and coalescing of duplicate submissions.
+    """
+
+    def __init__(self, max_workers, max_jobs_per_user, result_ttl):
+        """ Initialises the manager.
+
+        Args:
+            :max_workers: (int) Number of jobs that run at the same time.
+            :max_jobs_per_user: (int) Maximum number of unfinished jobs per user.
+            :result_ttl: (int) Number of seconds that the results of finished jobs are kept for.
+        """
+        self.max_jobs_per_user = max_jobs_per_user
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = dict()
+        self._unfinished = dict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(kind, params, user_id=None):
+        """ Builds the key identifying duplicate submissions.
+
+        Args:
+            :kind: (str) The kind of job (e.g. "topic_modelling").
+            :params: (dict) The parameters of the job.
+            :user_id: (int, optional) The user, for jobs whose result depends on the user.
+
+        Returns:
+            :str: The hexadecimal digest identifying the job.
+        """
+        return hashlib.sha256(json.dumps({'kind': kind, 'params': params, 'user': user_id}, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _purge(self):
+        """ Drops the finished jobs whose results have expired. Must be called with the lock held.
+        """
+        now = time.time()
+        for job_id in [k for k, job in self._jobs.items() if job.is_finished() and job.finished is not None and now - job.finished > self.result_ttl]:
+            self._jobs.pop(job_id)
+
+    def submit(self, kind, key, user_id, func, *args):
+        """ Submits a job, or joins the unfinished job with the same key.
+
+        Args:
+            :kind: (str) The kind of job.
+            :key: (str) Key as returned by make_key.
+            :user_id: (int) The user submitting the job.
+            :func: (callable) The work, called as func(*args, progress), where progress(stage, percent) reports its \
+                progress. Its return value is the result of the job.
+
+        Returns:
+            :tuple: The job, and whether it was newly created (False if the submission was coalesced).
+
+        Raises:
+            :JobLimitError: If the user already has max_jobs_per_user unfinished jobs.
+        """
+        with self._lock:
+            self._purge()
+            job = self._unfinished.get(key)
+            if job is not None:
+                job.owners.add(user_id)
+                logger.info(f"Job {job.id} ({kind}) joined by user {user_id}")
+                return job, False
+            user_jobs = sum(1 for job in self._unfinished.values() if user_id in job.owners)
+            if user_jobs >= self.max_jobs_per_user:
+                raise JobLimitError(f"You already have {user_jobs} jobs running. Please wait for them to finish.")
+            job = Job(uuid.uuid4().hex, kind, key, user_id)
+            self._jobs[job.id] = job
+            self._unfinished[key] = job
+        self._executor.submit(self._run, job, func, args)
+        logger.info(f"Job {job.id} ({kind}) submitted by user {user_id}")
+        return job, True
+
+    def _run(self, job, func, args):
+        def progress(stage, percent):
+            job.stage = stage
+            job.percent = int(max(job.percent, min(99, percent)))
+
+        job.status = 'running'
+        job.stage = 'Started'
+        start = time.time()
+        result, error = None, None
+        try:
+            result = func(*args, progress)
+        except Exception as exp:
+            logger.warning(f"Job {job.id} ({job.kind}) failed: {exp}")
+            logger.warning(traceback.format_exc())
+            error = 'An error occured while processing the request.'
+        finally:
+            # The status and the end time are set together, as _purge reads the end time of the finished jobs.
+            with self._lock:
+                if error is None:
+                    job.result = result
+                    job.stage = 'Done'
+                    job.percent = 100
+                    job.status = 'done'
+                else:
+                    job.error = error
+                    job.status = 'failed'
+                job.finished = time.time()
+                if self._unfinished.get(job.key) is job:
+                    self._unfinished.pop(job.key)
+            logger.info(f"Job {job.id} ({job.kind}) {job.status} in {job.finished - start:.1f}s")
+
+    def get(self, job_id, user_id):
+        """ Returns a job of a user.
+
+        Args:
+            :job_id: (str) The job id.
+            :user_id: (int) The user asking for the job.
+
+        Returns:
+            :Job: The job, or None if it does not exist (or expired) or the user did not submit it.
+        """
+        with self._lock:
+            self._purge()
+            job = self._jobs.get(job_id)
+        return job if job is not None and user_id in job.owners else None
@@ -0,0 +1,184 @@
+import os
+import json
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from os.path import join, exists, getsize, getmtime
+from utils import create_logger
+logger = create_logger(f"Search Cache", file=f"api")
+
+"""This file contains the result cache used by the /api/search endpoint. Reports are stored gzipped and keyed on the
+normalised request. Each entry remembers the Solr index version of its core at the time it was computed, and is
+dropped as soon as the core's index version changes (i.e. when the updaters commit new data).
+"""
+
+
+class SearchCache:
+    """ LRU cache of search reports with a memory budget, an optional on-disk tier and hit/miss counters.
+    """
+
+    def __init__(self, max_bytes, cache_dir=None, max_disk_bytes=0):
+        """ Initialises the cache.
+
+        Args:
+            :max_bytes: (int) Memory budget of the cache, in bytes of compressed reports.
+            :cache_dir: (str, optional) Folder of the on-disk tier. The disk tier is disabled if None.
+            :max_disk_bytes: (int, optional) Size budget of the on-disk tier, in bytes.
+        """
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'bypassed': 0, 'invalidations': 0, 'evictions': 0}
+        if self.cache_dir is not None and not exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    @staticmethod
+    def make_key(source, keywords_list, operator, filters, limit, top_n):
+        """ Builds the cache key of a search request from its normalised components.
+
+        Args:
+            :source: (str) Name of the Solr core.
+            :keywords_list: (list[str]) Keywords of the request.
+            :operator: (str) Operator between the keywords ("AND" or "OR").
+            :filters: (dict) Filters as returned by get_request_components.
+            :limit: (int) Maximum number of datapoints requested.
+            :top_n: (int) Maximum number of results for the top content fields.
+
+        Returns:
+            :str: The hexadecimal digest identifying the request.
+        """
+        normalised = {
+            'source': source,
+            'keywords': sorted(set(k.strip() for k in keywords_list if k.strip() != "")),
+            'operator': operator,
+            'filters': filters,
+            'limit': limit,
+            'top_n': top_n,
+        }
+        return hashlib.sha256(json.dumps(normalised, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def record_bypass(self):
+        """ Counts a request that skipped the cache (bypass flag set, or index version unavailable).
+        """
+        self._count('bypassed')
+
+    def _disk_path(self, key):
+        return join(self.cache_dir, f"{key}.json.gz")
+
+    def _read_disk(self, key):
+        try:
+            with open(self._disk_path(key), 'rb') as fin:
+                version, payload = fin.read().split(b'\n', 1)
+            return version.decode('utf-8'), payload
+        except Exception:
+            return None, None
+
+    def _write_disk(self, key, version, payload):
+        try:
+            tmp_path = f"{self._disk_path(key)}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as fout:
+                fout.write(version.encode('utf-8') + b'\n' + payload)
+            os.replace(tmp_path, self._disk_path(key))
+            self._trim_disk()
+        except Exception as exp:
+            logger.warning(f"Error writing search cache entry to disk: {exp}")
+
+    def _remove_disk(self, key):
+        try:
+            os.remove(self._disk_path(key))
+        except Exception:
+            pass
+
+    def _trim_disk(self):
+        """ Removes the least recently written files of the on-disk tier until it fits its budget.
+        """
+        files = [join(self.cache_dir, f) for f in os.listdir(self.cache_dir) if f.endswith('.json.gz')]
+        files = sorted(files, key=getmtime)
+        total = sum(getsize(f) for f in files)
+        while total > self.max_disk_bytes and len(files) > 0:
+            oldest = files.pop(0)
+            total -= getsize(oldest)
+            os.remove(oldest)
+
+    def _put_memory(self, key, version, payload):
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key)[1])
+            if len(payload) > self.max_bytes:
+                return
+            self._entries[key] = (version, payload)
+            self._size += len(payload)
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self._stats['evictions'] += 1
+
+    def get(self, key, version):
+        """ Returns the cached value for a key if it was computed against the given index version.
+
+        Args:
+            :key: (str) Key as returned by make_key.
+            :version: (str) Current index version of the core.
+
+        Returns:
+            :obj: The cached value, or None on a miss.
+        """
+        invalidated = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == version:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return json.loads(gzip.decompress(entry[1]).decode('utf-8'))
+                self._size -= len(self._entries.pop(key)[1])
+                self._stats['invalidations'] += 1
+                invalidated = True
+        if self.cache_dir is not None:
+            disk_version, payload = self._read_disk(key)
+            if disk_version == version:
+                self._put_memory(key, version, payload)
+                self._count('disk_hits')
+                return json.loads(gzip.decompress(payload).decode('utf-8'))
+            if disk_version is not None:
+                self._remove_disk(key)
+                if not invalidated:
+                    self._count('invalidations')
+        self._count('misses')
+        return None
+
+    def put(self, key, version, value):
+        """ Stores a value computed against the given index version.
+
+        Args:
+            :key: (str) Key as returned by make_key.
+            :version: (str) Index version of the core when the value was computed.
+            :value: (obj) JSON-serialisable value to cache.
+        """
+        payload = gzip.compress(json.dumps(value).encode('utf-8'), compresslevel=1)
+        self._put_memory(key, version, payload)
+        if self.cache_dir is not None:
+            self._write_disk(key, version, payload)
+
+    def get_stats(self):
+        """ Returns the cache counters.
+
+        Returns:
+            :dict: Hits (memory and disk), misses, bypassed requests, invalidations, evictions, the hit ratio and the \
+                number and size of the entries held in memory.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._size
+        lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['hits'] + stats['disk_hits']) / lookups if lookups > 0 else 0.0
+        return stats
@@ -116,13 +116,14 @@ def get_sna_data(req, interaction='retweet'):
     responses = dict()
 
     query = dataSource.solr_query_builder(keywords_list, operator, limit, "SNA Utils")
+    networks_stats = dataSource.get_networks_stats(solr_core=source, query=query, interaction=interaction, limit=limit)
 
     for keyword in query.keys():
         query_term = query[keyword]
         logger.info(query_term)
 
         network_df, nodes_df = dataSource.get_network_of_users(solr_core=source, keyword=query_term, interaction=interaction)
-        network_stats = dataSource.get_network_stats(solr_core=source, keyword=query_term, interaction=interaction, limit=limit)
+        network_stats = networks_stats[keyword]
 
         if keyword == None or keyword == "" or keyword == "All":
             responses["All"] = {'network_df': network_df, 'nodes_df': nodes_df, 'network_stats': network_stats}
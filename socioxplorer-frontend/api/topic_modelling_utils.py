@@ -590,7 +590,7 @@ def get_topic_data(req, interactionCommunity=None, communitiesList=None):
         print("THESE ARE THE COMMUNITIES INSIDE TOPIC_MODELLING_UTILS", keywordsCommunitiesList)
         query_term = query[keyword]
 #         response, hits = dataSource.optimised_json_query_handler_topics(solr_core=source, keyword=query_term, rows= limit, interactionCommunity=interactionCommunity, communitiesList=communitiesList)
-        response, hits = dataSource.optimised_json_query_handler_topics(solr_core=source, keyword=query_term, rows=100000, interactionCommunity=interactionCommunity, communitiesList=keywordsCommunitiesList)
+        response, hits = dataSource.optimised_json_query_handler_topics(solr_core=source, keyword=query_term, rows=MAX_VOL, interactionCommunity=interactionCommunity, communitiesList=keywordsCommunitiesList)
 
         if keyword == "" or keyword == None or keyword == "All":
             responses["All"] = response
@@ -599,7 +599,7 @@ def get_topic_data(req, interactionCommunity=None, communitiesList=None):
 
     return responses
 
-def preprocess_data(df):
+def preprocess_data(df, random_seed=None):
     """Function that creates the new columns "processed_text", "display_text", "x" and "y" in the dataframe containing
     the data used to generate the Topic Discovery scatterplot, and filters out duplicate tweets based on the field
     "process_text" (i.e. removes all duplicates when ignoring URLs and twitter handles).
@@ -608,6 +608,8 @@ def preprocess_data(df):
         :df: (pandas.DataFrame) Dataframe containing the tweets which will be used to generate the Topic Discovery \
             plot. It must contain the columns "fullText" (str, the tweet text) and "embedding_2d" (list, the two \
             dimensional embedding of the tweet).
+        :random_seed: (int, optional) Random seed of the sample taken when there are more than MAX_VOL tweets, so \
+            that the same request gives the same sample.
 
     Returns:
         :pandas.DataFrame: The pre-processed dataframe containing the new fields "processed_text", "display_text", \
@@ -623,12 +625,13 @@ def preprocess_data(df):
         logger.info(f"Check 2: {len(df)}")
         # Sample 100K tweets if the total volume is greater than that
         if len(df) > MAX_VOL:
-            df = df.sample(n=MAX_VOL)
+            df = df.sample(n=MAX_VOL, random_state=random_seed)
         logger.info(f"Check 3: {len(df)}")
         # Create a separate "x" and "y" coordinate field from the 2 dimensional tweet embedding
         df = df.dropna(subset=['embedding_2d'])
-        df['x'] = df["embedding_2d"].apply(lambda x: x[0])
-        df['y'] = df["embedding_2d"].apply(lambda x: x[1])
+        coordinates = np.vstack(df["embedding_2d"].to_list()).astype(float) if len(df) > 0 else np.empty((0, 2))
+        df['x'] = coordinates[:, 0]
+        df['y'] = coordinates[:, 1]
         return df
     except Exception as exp:
         logger.warning(f"Exp: {exp}")
@@ -4,23 +4,30 @@ import numpy as np
 import pandas as pd
 import json
 import re
+import codecs
+from array import array
 import urllib
-from urllib.parse import quote
 import urllib.parse
 import time
 import random
 from datetime import datetime, timedelta
-import pysolr
+import requests
 import textwrap
 import sys
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 import traceback
 from utils import create_logger, print_this
+from solr_session import get_solr_session_pool
+from embedding_store import get_embedding_store, EMBEDDING_FIELDS
+import facet_report
 logger = create_logger(f"Solr Class", file=f"solr_class")
 
 groupsLimit = 500
 queryLimit = 10000
 rowsLimit = 100000
+searchFields = 'id,fullText,videoId,createdAtDays,userScreenName,usersDescription,locationGps,userLocation,usersFollowersCount,retweetCommunity,replyCommunity,embedding_5d,processedTokens,retweetCount,replyCount,language,topics'
+searchGroupSort = 'retweetCount desc,userLocation asc,locationGps asc'
 
 from os.path import join, isfile
 from os import getcwd
@@ -41,6 +48,7 @@ try:
 except Exception as exp:
     logger.warning(f"Stopwords not loaded.\n: {exp}")
     pass
+stopwords_set = frozenset(stopwords)
 
 def get_mapping_dict_to_count(name, target='count'):
     """An auxiliary function that returns a dictionary that holds the passed name of the feature and the title count. \
@@ -100,6 +108,7 @@ class SolrClass:
         self.solr_communities = ApplicationConfig.SOLR_COMMUNITIES
         for core in solr_cores:
             self.solrs[core] = f"{solr_url}:{solr_port}/solr/{core}/"
+        self.solr_pool = get_solr_session_pool()
         self.random_seed =  filters["randomSeed"] if "randomSeed" in filters else 666
         self.date_range = self.stringify_date_range(filters["date_start"] if "date_start" in filters else "", filters["date_end"] if "date_end" in filters else "")
         self.language_filter = self.stringify_filter(filters["language"] if "language" in filters else "", "language")
@@ -119,7 +128,78 @@ class SolrClass:
             dict: a dictionary that holds the solr networks as configured in the system.
         """
         return dict(self.solr_networks)
-        
+
+    def get_pool_stats(self):
+        """An auxiliary function that returns the counters of the shared Solr connection pool.
+
+        Returns:
+            dict: the number of requests sent, connections opened and reused, and the time spent waiting on the pool.
+        """
+        return self.solr_pool.get_stats()
+
+    def get_index_version(self, solr_core):
+        """A function that returns the version of the index currently searched in a Solr core. The version changes \
+        every time a (soft or hard) commit opens a new searcher, so it is used to invalidate cached results.
+
+        Args:
+            :solr_core: (str) the name of the solr core.
+
+        Returns:
+            str: the index version, or None if it could not be retrieved.
+        """
+        if solr_core not in self.solrs:
+            return None
+        try:
+            response = self.solr_pool.get_json(f"{self.solrs[solr_core]}admin/luke?numTerms=0&show=index&wt=json", timeout=10)
+            return str(response['index']['version'])
+        except Exception as exp:
+            logger.warning(f"Error getting the index version of {solr_core}: {exp}")
+            return None
+
+    def json_query(self, solr_core, body, timeout=None):
+        """A function that sends a query to a Solr core through the JSON Request API, i.e. as a JSON body sent via POST \
+        rather than as URL parameters. The request and response sizes are logged and counted by the connection pool.
+
+        Args:
+            :solr_core: (str) the name of the solr core.
+            :body: (dict) the JSON request (query, filter, limit, fields, sort, facet and params).
+            :timeout: (int, optional) request timeout in seconds.
+
+        Returns:
+            dict: the decoded Solr response.
+        """
+        return self.solr_pool.post_json(f"{self.solrs[solr_core]}select", body, timeout=timeout)
+
+    def get_filter_queries(self, *extra_filters):
+        """ An auxiliary function that returns the filters of the class (language, sentiment, location and dates) and \
+        the given extra filters as a list of filter queries (fq). Each filter is a separate clause, so that Solr caches \
+        it on its own in its filterCache and reuses it across keywords, sections and users.
+
+        Args:
+            :extra_filters: (str) Extra filter queries, as built by @stringify_filter.
+
+        Returns:
+            list[str]: The filter queries.
+        """
+        filters = [self.language_filter, self.sentiment_filter, self.country_filter, self.date_range] + list(extra_filters)
+        return [f for f in filters if f != ""]
+
+    def get_query_components(self, query):
+        """ An auxiliary function that returns the main query (q) and the filter queries (fq) of a query as built by \
+        @solr_query_builder. A plain query string is also accepted, in which case the filters of the class are used.
+
+        Args:
+            :query: (dict or str) The query.
+
+        Returns:
+            tuple(str, list[str]): The main query and the filter queries.
+        """
+        if type(query) == dict:
+            return query['q'], list(query['fq'])
+        if query == None or query.strip() == "" or query.strip() == "()" or query.strip() == "*":
+            return '*:*', self.get_filter_queries()
+        return urllib.parse.unquote(query), self.get_filter_queries()
+
     def create_facet(self, limit):
         """ An auxiliary function that creates the facet json for the query.
 
@@ -138,7 +218,7 @@ class SolrClass:
                     'Sentiments_Distributions':{'limit':limit,'type':'terms','field':'createdAtDays'},
                     'tweets_locations_by_sentiments':{'limit':limit,'type':'terms','field':'locationGps'},
                     'users_locations_by_sentiments':{'limit':limit,'type':'terms','field':'userLocation'},
-                    'retweeted': {'limit':limit,'type':'terms','field':'userScreenName', 'facet': {'retweeted':{'limit':limit,'type':'func','func':"'countvals(retweeters)'"}}},
+                    'retweeted': {'limit':limit,'type':'terms','field':'userScreenName', 'facet': {'retweeted':{'limit':limit,'type':'func','func':'countvals(retweeters)'}}},
                     'Sentiment_per_Language':{'limit':limit,'type':'terms','field':'language'},
                 }
             },
@@ -165,11 +245,12 @@ class SolrClass:
                 words we expect the query to be separated with a space.
             
         Returns:
-            :list: The list of unique tokens/phrases.
+            :list: The sorted list of unique tokens/phrases (sorted so that the queries built from it, and the order of \
+                the report, are deterministic).
         """
         if type(keywords) == list:
-            return list(set([re.sub("[ \t\n]+", '%20', re.sub("[?!=.$\/%]+", '', x.strip()).strip()) for x in keywords if len(x.strip()) > 0 and x != '']))
-        return list(set([re.sub("[ \t\n]+", '%20', re.sub("[?!=.$\/%]+", '', x.strip()).strip()) for x in keywords.strip().split(',') if len(x.strip()) > 0 and x != '']))
+            return sorted(set([re.sub("[ \t\n]+", '%20', re.sub("[?!=.$\/%]+", '', x.strip()).strip()) for x in keywords if len(x.strip()) > 0 and x != '']))
+        return sorted(set([re.sub("[ \t\n]+", '%20', re.sub("[?!=.$\/%]+", '', x.strip()).strip()) for x in keywords.strip().split(',') if len(x.strip()) > 0 and x != '']))
     
     def check_date_entry(self, date_text, time_pattern="T00:00:00Z"):
         """ An auxiliary function that checks if the date is valid or not.
@@ -186,72 +267,66 @@ class SolrClass:
             return ""
         
     def stringify_date_range(self, date_start, date_end):
-        """ An auxiliary function that handles the date range in the query. It creates the required string for the date \
-        range in Solr query.
+        """ An auxiliary function that handles the date range in the query. It creates the filter query for the date \
+        range. The range is rounded to whole days (the end day is included up to midnight, excluded), so that the same \
+        dates always produce the same filter and hit Solr's filterCache.
 
         Args:
             :date_start: (str) The start of the time period of interest (None if no date_start is specified)
             :date_end: (str) The end of the time period of interest (None is no date_end is specified)
 
         Returns:
-            str: The string that is used in the query to filter the date range.
+            str: The filter query on the date range, or "" if the range is not limited.
         """
-        date_range = ''
+        date_start = self.check_date_entry(date_start, time_pattern="T00:00:00Z") if date_start != None and date_start != '' else ""
+        date_end = self.check_date_entry(date_end, time_pattern="") if date_end != None and date_end != '' else ""
+        if date_end != "":
+            date_end = (datetime.strptime(date_end, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%dT00:00:00Z')
 
-        #print("This is DATE_START:", date_start)
-        #print("This is DATE_END:", date_end)
-        
-        if(date_start != None  and date_start != ''):
-            date_start = self.check_date_entry(date_start, time_pattern="T00:00:00Z")
-            date_range = '%20AND%20createdAt:[' + str(date_start + '%20TO%20') if len(date_start) > 1 else '*%20TO%20'
-            #print("DATE BUILDER 1:", date_range)
-#           #  del date_start
-
-        if not date_range or date_range=="":
-            date_range = '%20AND%20createdAt:[*%20TO%20'
-            #print("DATE BUILDER 2:", date_range)
-
-        if(date_end != None and date_end != ''):
-            date_end = self.check_date_entry(date_end, time_pattern="T23:59:59Z")
-            date_range += (str(date_end) +']') if (len(date_end) > 1) else '*]'
-            #print("DATE BUILDER 3:", date_range)
-        else:
-            date_range += '*]'
-            #print("DATE BUILDER 4:", date_range)
-#             del date_end
-        
-        if "* TO *" in date_range or '*%20TO%20*'  in date_range:
-            date_range = ''
-            #print("DATE BUILDER 5:", date_range)
-        return date_range.replace(" ","%20").replace("\"","").replace("'","")
+        if date_start == "" and date_end == "":
+            return ''
+        return f'createdAt:[{date_start if date_start != "" else "*"} TO {date_end if date_end != "" else "*"}}}'
+
+    def escape_term(self, term):
+        """ An auxiliary function that escapes a value to be used inside a quoted Solr term (i.e. field:"value").
+
+        Args:
+            :term: (str) The value.
+
+        Returns:
+            str: The escaped value.
+        """
+        return str(term).replace('\\', '\\\\').replace('"', '\\"')
 
     def stringify_filter(self, filter, filter_name):
-        """ An auxiliary function that formats filters for the Solr query.
+        """ An auxiliary function that formats filters as Solr filter queries.
 
         Args:
             :filter: (str) The value of the filter of interest.
             :filter_name: (str) The name of the filter of interest.
 
         Returns:
-            str: The string that is used in the Solr query to filter.
+            str: The filter query, or "" if there is no filter.
         """
         filter_str = ''
 
         if filter != "All" and filter != None:
             if filter_name == "language":
-                filter_str = '%20AND%20' + filter_name + ':%22' + filter.lower().replace(" ", "%20") + '%22'
+                filter_str = filter_name + ':"' + self.escape_term(filter.lower()) + '"'
             elif "community" in filter_name.lower():
-                filter_str = str('%20AND%20' + filter_name + ':%28' + "%20OR%20".join(filter) + '%29') if len(filter) > 0 else ''
+                filter_str = str(filter_name + ':(' + " OR ".join([str(x) for x in filter]) + ')') if len(filter) > 0 else ''
             elif "Times" in filter_name:
-                filter_str = '%20AND%20' + filter_name + ':*'
+                filter_str = filter_name + ':*'
             else:
-                filter_str = '%20AND%20' + filter_name + ':%22' + filter.replace(" ", "%20") + '%22'
-        return filter_str.replace(" ","%20").replace("\"","").replace("'","")
+                filter_str = filter_name + ':"' + self.escape_term(filter) + '"'
+        return filter_str
                     
                     
     def solr_query_builder(self, keywords, operator='AND', limit=queryLimit, caller = ""):
         """A function that handles the query with relevant filters and keywords. It generates a dictionary of the \
-        keywords and the corresponding JSON query. The dict of queries is added it to the class attribute @query.
+        keywords and the corresponding structured query, i.e. a dict holding the keyword clauses as the main query \
+        ("q") and each filter as its own filter query ("fq"). The filters being the same for all the keywords (and \
+        for the search, SNA and topics sections), Solr computes them once and reuses them from its filterCache.
 
         Args:
             :keywords: (str) The set of words that the user wants to query separated by comma (,). For the combined \
@@ -260,60 +335,53 @@ class SolrClass:
                 to 'AND'.
             :limit: (int, optional) Maximum size (in count) of the retrieved data from Solr.
             :caller: (str, optional) The name of the function that called this function. Defaults to "".
-            
+
+        Returns:
+            :dict: The structured query ({"q": str, "fq": list[str]}) per keyword, and for all the keywords combined \
+                ("All") when there are several of them.
         """
         term_list = self.get_term_list_from_keywords(keywords)
         logger.info(f"{caller}: term_list: {term_list}")
         hashtags = [x for x in term_list if x.startswith('#')]
         users = [x for x in term_list if x.startswith('@')]
         terms = [x for x in term_list if  x not in hashtags and  x not in users]
+        filter_queries = ['sentiment:(Neutral OR Negative OR Positive)'] + self.get_filter_queries()
         query = dict()
 
+        def quoted(values):
+            return f' {operator} '.join(['"' + self.escape_term(x.replace('%20', ' ').replace('#', '').replace('@', '')) + '"' for x in values])
+
+        def term_query(term):
+            if term.startswith('#'):
+                return f'hashtags:({quoted([term])})'
+            elif term.startswith('@'):
+                return f'(userScreenName:({quoted([term])}) OR usersDescription:({quoted([term])}))'
+            return f'fullText:({quoted([term])})'
+
         # stop condition to stop creating wrong query
         if (len(term_list) == 0):
-            query['All'] = 'sentiment:(Neutral%20OR%20Negative%20OR%20Positive)'#'*:*'
+            query['All'] = '*:*'
         elif (len(term_list) > 1):
             try:
-                query_str = "sentiment:(Neutral%20OR%20Negative%20OR%20Positive)%20AND%20"
+                clauses = []
                 if len(terms) > 0:
-                    query_str += "fullText:(%22" + f'%22%20{operator}%20%22'.join(terms).replace('#','').replace('@','') + "%22)"
-                    if len(terms)<len(term_list):
-                        query_str += f"%20{operator}%20"
-                    logger.info(f"(SOLR): {query_str}")
+                    clauses.append(f"fullText:({quoted(terms)})")
                 if len(users) > 0:
-                    query_str += str("(userScreenName:(%22" + f'%22%20{operator}%20%22'.join(users) + "%22)").replace('@', '')
-                    query_str += str(f"%20OR%20" + " usersDescription:(%22" + f'%22%20{operator}%20%22'.join(users) + "%22))").replace('@', '')
-                    logger.info(f"(SOLR): {query_str}")
-                    if len(hashtags) > 0:
-                        query_str += f"%20{operator}%20"
+                    clauses.append(f"(userScreenName:({quoted(users)}) OR usersDescription:({quoted(users)}))")
                 if len(hashtags) > 0:
-                    query_str += str("hashtags:(%22" + f'%22%20{operator}%20%22'.join(hashtags) + "%22)").replace('#', '')
-
-                query['All'] = query_str
-                logger.info(f"(SOLR): {query_str}")
+                    clauses.append(f"hashtags:({quoted(hashtags)})")
+                query['All'] = f' {operator} '.join(clauses)
+                logger.info(f"(SOLR): {query['All']}")
                 for term in term_list:
-                    if term.startswith('#'):
-                        query[term] = f"sentiment:(Neutral%20OR%20Negative%20OR%20Positive)%20AND%20hashtags:%22{term.replace('#','')}%22"
-                    elif term.startswith('@'):
-                        query[term] = f"sentiment:(Neutral%20OR%20Negative%20OR%20Positive)%20AND%20(userScreenName:%22{term.replace('@','')}%22%20OR%20usersDescription:%22{term.replace('@','')}%22)"
-                    else:
-                        query[term] = f"sentiment:(Neutral%20OR%20Negative%20OR%20Positive)%20AND%20fullText:%22{term}%22"
-
-
-
+                    query[term] = term_query(term)
             except Exception as exp:
                 logger.warning(exp)
         else:
             term = term_list[0]
-            if term.startswith('#'):
-                query[term] = f"sentiment:(Neutral%20OR%20Negative%20OR%20Positive)%20AND%20hashtags:%22{term.replace('#','')}%22"
-            elif term.startswith('@'):
-                query[term] = f"sentiment:(Neutral%20OR%20Negative%20OR%20Positive)%20AND%20(userScreenName:%22{term.replace('@','')}%22%20OR%20usersDescription:%22{term.replace('@','')}%22)"
-            else:
-                query[term] = f"sentiment:(Neutral%20OR%20Negative%20OR%20Positive)%20AND%20fullText:%22{term}%22"
+            query[term] = term_query(term)
 
         for k in query.keys():
-            query[k] = query[k] + self.language_filter + self.sentiment_filter + self.country_filter + self.date_range
+            query[k] = {'q': query[k], 'fq': list(filter_queries)}
 
         return query
 
@@ -506,6 +574,9 @@ class SolrClass:
         """ It is the optimised function that is based on JSON query requests. It needs the query, solr object and top_n
         as input. It also uses the query built by calling @solr_query_builder. This query is a dictionary
         of the keywords and the corresponding JSON query. The outcomes are limited to top 150 for performance reasons.
+        When the keywords can be faceted in a single request (see @use_combined_facets), the report is computed by \
+        @combined_json_query_handler. Otherwise, the per-keyword requests run concurrently (up to SOLR_QUERY_PARALLELISM \
+        at a time, each bounded by SOLR_QUERY_DEADLINE seconds) and are processed by @keyword_report_handler.
 
         Args:
             :solr_core: (str) Name of the Solr core to query from.
@@ -520,107 +591,263 @@ class SolrClass:
         report = dict()
         error_message = ""
         hits = 0
-        random.seed(self.random_seed)
-        random_number = random.randint(0,9999)
-
         query = self.solr_query_builder(keywords, operator=operator, limit=limit, caller = "(SOLR)")
 
         facet_json_timelines = self.create_facet(limit=limit)
-        for query_k in query.keys():
-            facet_json_query = {'query': f"'{query[query_k]}'", 'limit':limit , 'facet': facet_json_timelines}
-            query[query_k] = facet_json_query
+        if self.use_combined_facets(query, facet_json_timelines):
+            return self.combined_json_query_handler(solr_core, query, facet_json_timelines, limit, top_n)
 
-        logger.info(f"query --> {query}")
+        keyword_requests = []
         for query_term in query:
-            facet_url = str(self.solrs[solr_core]) + f"select?random_{random_number}" + "&fl=id%2C%20fullText%2C%20videoId%2C%20createdAtDays%2C%20userScreenName%2C%20usersDescription%2C%20locationGps%2C%20userLocation%2C%20usersFollowersCount%2C%20retweetCommunity%2C%20replyCommunity%2C%20embedding_5d%2C%20processedTokens%2C%20retweetCount%2C%20replyCount%2Clanguage%2Ctopics&group.field=sentiment&group.limit=" + str(limit) + "&group.sort=retweetCount%20desc%2CuserLocation%20asc%2ClocationGps%20asc&group=true&indent=true&q.op=OR&q=sentiment%3A(Neutral%20OR%20Negative%20OR%20Positive)&rows=0&sort=retweetCount%20desc"
-            facet_url = facet_url.replace(" ","%20").replace("\"","").replace("'","")+"&json="+json.dumps(query[query_term]).replace(" ","").replace("\"","")
-            query_term = query_term.replace('%22', '').replace('%20', ' ')
+            body = {
+                'query': query[query_term]['q'],
+                'filter': query[query_term]['fq'],
+                'limit': limit,
+                'fields': searchFields,
+                'sort': 'retweetCount desc',
+                'facet': facet_json_timelines,
+                'params': {'group': 'true', 'group.field': 'sentiment', 'group.limit': limit, 'group.sort': searchGroupSort, 'q.op': 'OR'},
+            }
+            logger.info(f"SEARCH QUERY: {body['query']} | filters: {body['filter']}")
+            keyword_requests.append((query_term.replace('%22', '').replace('%20', ' '), body))
+
+        # The per-keyword requests are sent concurrently, the report is then merged in the order of the query.
+        datasetOrigin = 'Tweets'
+        deadline = ApplicationConfig.SOLR_QUERY_DEADLINE
+        executor = ThreadPoolExecutor(max_workers=max(1, min(ApplicationConfig.SOLR_QUERY_PARALLELISM, len(keyword_requests))))
+        futures = [(query_term, executor.submit(self.keyword_report_handler, solr_core, body, top_n, deadline)) for query_term, body in keyword_requests]
+        deadline_at = time.monotonic() + deadline
+        try:
+            for query_term, future in futures:
+                try:
+                    report[query_term], datasetOrigin = future.result(timeout=max(0, deadline_at - time.monotonic()))
+                    hits = max(hits, report[query_term]['count'])
+                except Exception as exp:
+                    logger.warning(f"ERROR: {exp}")
+                    if isinstance(exp, FuturesTimeoutError):
+                        error_message = f'The query for "{query_term}" took longer than {deadline} seconds.'
+                    elif getattr(getattr(exp, 'response', None), 'status_code', None) == 404:
+                        error_message = f'Data collection {solr_core} is not avaiable. Please check that Solr is running and the core {solr_core} is available.'
+                    else:
+                        error_message = 'An error occured while fetching the data.'
+                    datasetOrigin = 'Tweets'
+        finally:
+            for _, future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
 
-            print("SEARCH QUERY:", facet_url)
-            
-            try:
-                #logger.info( f"<>{facet_url}<>")
-                report[query_term] = json.loads(urllib.request.urlopen(urllib.request.Request(facet_url)).read().decode('utf-8'))
-                report_groups = {items['groupValue']: items['doclist']['docs'] for items in report[query_term]['grouped']['sentiment']['groups']}
-                report_groups_users, report_groups_tweets = self.combine_all_sentiments(report_groups)
-                report[query_term] = report[query_term]['facets']
-                logger.info(f"Report Len: {len(report[query_term])}")
-                for mainFeature in list(report[query_term].keys()):
-                    if type(report[query_term][mainFeature]) == dict:
-                        if 'buckets' in report[query_term][mainFeature].keys():
-                            report[query_term][mainFeature] =  report[query_term][mainFeature]['buckets']
-                            
-                        if mainFeature == 'traffic':
-                            report[query_term][mainFeature] = list({'Date': item['val'], 'Count': item['count']} for item in report[query_term][mainFeature])
-                            report[query_term][mainFeature] = sorted(report[query_term][mainFeature], key=lambda x: x['Date'], reverse=False)
-                        
-                        elif mainFeature in ['Sentiments', 'Languages']:
-                            
-                            for item in report[query_term][mainFeature]:
-                                val = item['val']
-                                for feature in item.keys():
-                                    if feature not in ['val', 'count']:
-                                        if feature not in report[query_term].keys():
-                                            report[query_term][feature] = dict()
-                                        report[query_term][feature][val] = item[feature]['buckets']
-                            if mainFeature == "Languages":
-                                report[query_term]['Languages_Distributions'] = list({'Language': item['val'][0].upper() + item['val'][1:].lower(), 'Count': item['count']} for item in report[query_term][mainFeature])
-                                report[query_term]['Languages_Distributions'] = sorted(report[query_term]['Languages_Distributions'], key=lambda x: x['Count'], reverse=True)
-                            report[query_term].pop(mainFeature, None)
-                
-                for feature in list(report[query_term].keys()) :
-                    if feature in ['tweets_languages_by_sentiments']:
-                        for language in report[query_term][feature].keys():
-                            if type(report[query_term][feature][language]) == list:
-                                report[query_term][feature][language] =  {object_['val']: object_['createdAtDays']['buckets'] for object_ in report[query_term][feature][language]} 
-                    
-                    if feature in ['users_locations_by_sentiments', 'tweets_locations_by_sentiments', 'userScreenName', 'urls', 'retweeters', 'retweeted', 'processedTokens', 'processedDescTokens', 'mentions', 'hashtags', 'media', 'emojis']:
-                        self.compute_positive_negative(report[query_term][feature], feature, top_n)
-                            
-                    if feature in ['tweets_locations_by_languages', 'users_locations_by_languages']:
-                        self.get_all_languages(report[query_term][feature], top_n)
-                    
-                    if feature in ['hashtags', 'processedDescTokens', 'processedTokens', 'emojis']:
-                        for item in report[query_term][feature].keys():
-                            logger.warning(f"report[query_term][feature][item][0:5]: {report[query_term][feature][item][0:5]}")
-                            try:
-                                report[query_term][feature][item] = [{'text': object_['val'], 'value': object_['count']} for object_ in report[query_term][feature][item]]
-                            except Exception as exp:
-                                logger.warning(f"ERROR: {exp}")
-                                
-
-                    if feature in ['processedDescTokens', 'processedTokens']:
-                        if f"{feature}Stopped" not in report[query_term].keys():
-                            report[query_term][f"{feature}Stopped"] = dict()
-                        for item in report[query_term][feature].keys():
-                            report[query_term][f"{feature}Stopped"][item] = [{'text': object_['text'], 'value': object_['value']} for object_ in report[query_term][feature][item] if object_['text'].lower() not in stopwords and len(object_['text']) > 1]
-
-
-                    # terminate at top 150 items...
-                    if feature in ['hashtags', 'emojis', 'media', 'mentions', 'urls', 'processedTokens', 'processedDescTokens', 'userScreenName', 'retweeters', 'retweeted']:
-                        for sentiment in report[query_term][feature].keys():
-                            report[query_term][feature][sentiment] = report[query_term][feature][sentiment][0:150]
+        return report, hits, datasetOrigin, error_message
 
-                
-                report[query_term]['top_tweets'] = report_groups_tweets
-                report[query_term]['top_users'] = report_groups_users
-                
+    def facet_cost(self, facet):
+        """ An auxiliary function that estimates the cost of a JSON facet as its number of facets (nested ones included).
+
+        Args:
+            :facet: (dict) The JSON facet, as a dict of named facets.
+
+        Returns:
+            :int: The number of facets.
+        """
+        return sum(1 + self.facet_cost(item.get('facet', {})) for item in facet.values() if type(item) == dict)
+
+    def use_combined_facets(self, query, facet):
+        """ A function that decides whether the keywords of a query can be faceted in a single request, with one query \
+        facet per keyword. This requires the keywords to share the same filters, and the combined facet to cost less \
+        than SOLR_COMBINED_FACETS_MAX_COST (its cost being the cost of the facet times the number of keywords).
+
+        Args:
+            :query: (dict) The query, as built by @solr_query_builder.
+            :facet: (dict) The JSON facet computed for each keyword.
+
+        Returns:
+            :bool: Whether to use a single combined request.
+        """
+        if not ApplicationConfig.SOLR_COMBINED_FACETS or len(query) < 2:
+            return False
+        if any(query[k]['fq'] != query[list(query.keys())[0]]['fq'] for k in query):
+            return False
+        cost = len(query) * self.facet_cost(facet)
+        if cost > ApplicationConfig.SOLR_COMBINED_FACETS_MAX_COST:
+            logger.info(f"Combined facet cost {cost} exceeds {ApplicationConfig.SOLR_COMBINED_FACETS_MAX_COST}, querying the keywords separately.")
+            return False
+        return True
+
+    def combined_facet_query(self, solr_core, query, facet, body=None, timeout=None):
+        """ Sends a single JSON request that nests the given facet under one query facet per keyword, and splits the \
+        response back per keyword. The keywords must share the same filters (see @use_combined_facets).
+
+        Args:
+            :solr_core: (str) Name of the Solr core to query from.
+            :query: (dict) The query, as built by @solr_query_builder.
+            :facet: (dict) The JSON facet to compute for each keyword.
+            :body: (dict, optional) Extra parameters of the JSON request (e.g. params for grouping).
+            :timeout: (int, optional) Deadline in seconds for the request.
+
+        Returns:
+            :tuple(dict, dict): The facets of each keyword (as they would be returned by a request for that keyword only), \
+                and the full Solr response.
+        """
+        domains = {f"kw{i}": k for i, k in enumerate(query.keys())}
+        request = dict(body or {})
+        request['query'] = '*:*'
+        request['filter'] = query[list(query.keys())[0]]['fq']
+        request.setdefault('limit', 0)
+        request['facet'] = {domain: {'type': 'query', 'q': query[k]['q'], 'facet': facet} for domain, k in domains.items()}
+        logger.info(f"COMBINED QUERY: {[query[k]['q'] for k in query]} | filters: {request['filter']}")
+        response = self.json_query(solr_core, request, timeout=timeout)
+        facets = response.get('facets', {})
+        return {k: facets.get(domain, {'count': 0}) for domain, k in domains.items()}, response
+
+    def combined_json_query_handler(self, solr_core, query, facet, limit, top_n):
+        """ Computes the search report of all the keywords with a single Solr request: the facets of each keyword are \
+        nested under a query facet, and the top documents of each keyword and sentiment are retrieved with one \
+        group.query each. The per-keyword report is then rebuilt by @build_keyword_report.
+
+        Args:
+            :solr_core: (str) Name of the Solr core to query from.
+            :query: (dict) The query, as built by @solr_query_builder.
+            :facet: (dict) The JSON facet computed for each keyword.
+            :limit: (int) Maximum number of datapoints to be returned per keyword and sentiment.
+            :top_n: (int) Maximum number of results to return for the top content fields.
+
+        Returns:
+            :tuple: The report, the total number of tweets found, the dataset origin and an error message (as returned by \
+                @optimised_json_query_handler).
+        """
+        report = dict()
+        hits = 0
+        error_message = ""
+        datasetOrigin = 'Tweets'
+        sentiments = ['Positive', 'Negative', 'Neutral']
+        group_queries = {(k, sentiment): f'({query[k]["q"]}) AND sentiment:"{sentiment}"' for k in query for sentiment in sentiments}
+        body = {
+            'limit': limit,
+            'fields': searchFields,
+            'sort': 'retweetCount desc',
+            'params': {'group': 'true', 'group.query': list(group_queries.values()), 'group.limit': limit, 'group.sort': searchGroupSort, 'q.op': 'OR'},
+        }
+        try:
+            facets, response = self.combined_facet_query(solr_core, query, facet, body=body, timeout=ApplicationConfig.SOLR_QUERY_DEADLINE)
+            grouped = response.get('grouped', {})
+            for k in query:
+                query_term = k.replace('%22', '').replace('%20', ' ')
+                report_groups = [(sentiment, grouped[group_queries[(k, sentiment)]]['doclist']['docs']) for sentiment in sentiments
+                                 if group_queries[(k, sentiment)] in grouped and len(grouped[group_queries[(k, sentiment)]]['doclist']['docs']) > 0]
+                # Groups are ordered as a field grouping would order them, i.e. by their top document.
+                report_groups = dict(sorted(report_groups, key=lambda group: group[1][0].get('retweetCount', 0), reverse=True))
+                report[query_term], datasetOrigin = self.build_keyword_report(report_groups, facets[k], top_n)
                 hits = max(hits, report[query_term]['count'])
-                if len(report_groups_tweets['All Sentiments']) > 0:
-                    datasetOrigin = 'Comment' if 'videoId' in report_groups_tweets['All Sentiments'][0].keys() and report_groups_tweets['All Sentiments'][0]['videoId'] != None else 'Tweets'
+        except Exception as exp:
+            logger.warning(f"ERROR: {exp}")
+            if isinstance(exp, requests.exceptions.Timeout):
+                error_message = f'The query took longer than {ApplicationConfig.SOLR_QUERY_DEADLINE} seconds.'
+            elif getattr(getattr(exp, 'response', None), 'status_code', None) == 404:
+                error_message = f'Data collection {solr_core} is not avaiable. Please check that Solr is running and the core {solr_core} is available.'
+            else:
+                error_message = 'An error occured while fetching the data.'
+            datasetOrigin = 'Tweets'
+        return report, hits, datasetOrigin, error_message
+
+    def keyword_report_handler(self, solr_core, body, top_n, timeout=None):
+        """ Sends the grouped and faceted request of a single keyword (as prepared by @optimised_json_query_handler) \
+        and turns the Solr response into the report entry of that keyword.
+
+        Args:
+            :solr_core: (str) Name of the Solr core to query from.
+            :body: (dict) The JSON request for the keyword.
+            :top_n: (int) Maximum number of results to return for the top content fields.
+            :timeout: (int, optional) Deadline in seconds for the request.
+
+        Returns:
+            :tuple: The report entry of the keyword, and the dataset origin ("Tweets" or "Comment").
+        """
+        keyword_report = self.json_query(solr_core, body, timeout=timeout)
+        report_groups = {items['groupValue']: items['doclist']['docs'] for items in keyword_report['grouped']['sentiment']['groups']}
+        return self.build_keyword_report(report_groups, keyword_report['facets'], top_n)
+
+    def build_keyword_report(self, report_groups, keyword_report, top_n):
+        """ Turns the top documents per sentiment and the facets of a keyword into the report entry of that keyword.
+
+        Args:
+            :report_groups: (dict) The top documents of the keyword per sentiment.
+            :keyword_report: (dict) The facets of the keyword, as returned by Solr.
+            :top_n: (int) Maximum number of results to return for the top content fields.
+
+        Returns:
+            :tuple: The report entry of the keyword, and the dataset origin ("Tweets" or "Comment").
+        """
+        report_groups_users, report_groups_tweets = self.combine_all_sentiments(report_groups)
+        logger.info(f"Report Len: {len(keyword_report)}")
+        for mainFeature in list(keyword_report.keys()):
+            if type(keyword_report[mainFeature]) == dict:
+                if 'buckets' in keyword_report[mainFeature].keys():
+                    keyword_report[mainFeature] =  keyword_report[mainFeature]['buckets']
+                    
+                if mainFeature == 'traffic':
+                    keyword_report[mainFeature] = list({'Date': item['val'], 'Count': item['count']} for item in keyword_report[mainFeature])
+                    keyword_report[mainFeature] = sorted(keyword_report[mainFeature], key=lambda x: x['Date'], reverse=False)
+                
+                elif mainFeature in ['Sentiments', 'Languages']:
+                    
+                    for item in keyword_report[mainFeature]:
+                        val = item['val']
+                        for feature in item.keys():
+                            if feature not in ['val', 'count']:
+                                if feature not in keyword_report.keys():
+                                    keyword_report[feature] = dict()
+                                keyword_report[feature][val] = item[feature]['buckets']
+                    if mainFeature == "Languages":
+                        keyword_report['Languages_Distributions'] = list({'Language': item['val'][0].upper() + item['val'][1:].lower(), 'Count': item['count']} for item in keyword_report[mainFeature])
+                        keyword_report['Languages_Distributions'] = sorted(keyword_report['Languages_Distributions'], key=lambda x: x['Count'], reverse=True)
+                    keyword_report.pop(mainFeature, None)
+        
+        for feature in list(keyword_report.keys()) :
+            if feature in ['tweets_languages_by_sentiments']:
+                for language in keyword_report[feature].keys():
+                    if type(keyword_report[feature][language]) == list:
+                        keyword_report[feature][language] =  {object_['val']: object_['createdAtDays']['buckets'] for object_ in keyword_report[feature][language]} 
+            
+            if feature in ['users_locations_by_sentiments', 'tweets_locations_by_sentiments', 'userScreenName', 'urls', 'retweeters', 'retweeted', 'processedTokens', 'processedDescTokens', 'mentions', 'hashtags', 'media', 'emojis']:
+                if ApplicationConfig.SOLR_VECTORISED_REPORTS:
+                    facet_report.compute_positive_negative(keyword_report[feature], feature, top_n)
                 else:
-                    datasetOrigin = 'Tweets'
-            except Exception as exp:
-                logger.warning(f"ERROR: {exp}")
-                if 'HTTP Error 404' in str(exp):
-                    error_message = f'Data collection {solr_core} is not avaiable. Please check that Solr is running and the core {solr_core} is available.'
+                    self.compute_positive_negative(keyword_report[feature], feature, top_n)
+                    
+            if feature in ['tweets_locations_by_languages', 'users_locations_by_languages']:
+                if ApplicationConfig.SOLR_VECTORISED_REPORTS:
+                    facet_report.get_all_languages(keyword_report[feature], top_n)
                 else:
-                    error_message = 'An error occured while fetching the data.'
-                datasetOrigin = 'Tweets'
-                if query_term in report:
-                    report.pop(query_term)
+                    self.get_all_languages(keyword_report[feature], top_n)
+            
+            if feature in ['hashtags', 'processedDescTokens', 'processedTokens', 'emojis']:
+                for item in keyword_report[feature].keys():
+                    logger.warning(f"keyword_report[feature][item][0:5]: {keyword_report[feature][item][0:5]}")
+                    try:
+                        keyword_report[feature][item] = [{'text': object_['val'], 'value': object_['count']} for object_ in keyword_report[feature][item]]
+                    except Exception as exp:
+                        logger.warning(f"ERROR: {exp}")
+                        
 
-        return report, hits, datasetOrigin, error_message
+            if feature in ['processedDescTokens', 'processedTokens']:
+                if f"{feature}Stopped" not in keyword_report.keys():
+                    keyword_report[f"{feature}Stopped"] = dict()
+                for item in keyword_report[feature].keys():
+                    keyword_report[f"{feature}Stopped"][item] = [{'text': object_['text'], 'value': object_['value']} for object_ in keyword_report[feature][item] if object_['text'].lower() not in stopwords_set and len(object_['text']) > 1]
+
+
+            # terminate at top 150 items...
+            if feature in ['hashtags', 'emojis', 'media', 'mentions', 'urls', 'processedTokens', 'processedDescTokens', 'userScreenName', 'retweeters', 'retweeted']:
+                for sentiment in keyword_report[feature].keys():
+                    keyword_report[feature][sentiment] = keyword_report[feature][sentiment][0:150]
+
+        
+        keyword_report['top_tweets'] = report_groups_tweets
+        keyword_report['top_users'] = report_groups_users
+
+        if len(report_groups_tweets['All Sentiments']) > 0:
+            datasetOrigin = 'Comment' if 'videoId' in report_groups_tweets['All Sentiments'][0].keys() and report_groups_tweets['All Sentiments'][0]['videoId'] != None else 'Tweets'
+        else:
+            datasetOrigin = 'Tweets'
+        return keyword_report, datasetOrigin
     
     
     def optimised_json_query_handler_topics(self, solr_core, keyword, rows=5000, interactionCommunity=None, communitiesList = None):
@@ -630,10 +857,15 @@ class SolrClass:
 
         Args:
             :solr_core (str):  Name of the Solr core to query from.
-            :keyword (str): Comma-separated list of keywords to query.
+            :keyword (dict or str): The query, as built by @solr_query_builder.
             :rows: (int, optional) Maximum number of datapoints to be returned for the topics query. Defaults to 5000.
-            :random_seed: (int, optional) Random seed to control the random selection of data when number of results \
-                exceeds the maximum number of rows. Defaults to 42.
+            :interactionCommunity: (str, optional) The community field ("retweetCommunity" or "replyCommunity").
+            :communitiesList: (list, optional) The communities to restrict the data to.
+
+        When more than rows documents match, they are sampled inside Solr (see @sample_topic_documents) according \
+        to SOLR_TOPIC_SAMPLING, using the randomSeed of the filters so that the same request returns the same sample.
+        When the core has an embedding store, the embeddings are not requested from Solr but gathered from the store \
+        (see @attach_embeddings).
 
         Returns:
             :tuple: Contains a dictionary with the report that corresponds to the query, and the total number of \
@@ -641,47 +873,133 @@ class SolrClass:
         """
 
         logger.info(f"THESE ARE THE COMMUNITIES --> {communitiesList}")
-        # getting a random number from 0 to 10000, the seed is loaded form the interface.
-        random.seed(self.random_seed)
-        random_number = random.randint(0,9999)
-
         report = dict()
-
-        if keyword == None:
-            keyword = "*"
-        elif keyword.strip() == "" or keyword.strip() == "()":
-            keyword = "*"
-        
         hits = 0
-        term_q = json.dumps(keyword)
-        term_q = f'{str(term_q if term_q.isascii() else urllib.parse.quote(term_q))}'.replace("\"", "")
-
-        facet_url = str(self.solrs[solr_core]) +  \
-            f"select?random_{random_number}" + \
-            f"&sort={interactionCommunity}%20desc%2CretweetCount%20desc%2CreplyCount%20desc&fl=id%2C%20videoId%2C%20fullText%2C%20embedding_5d%2C%20embedding_2d%2C%20sentiment%2C%20replyCommunity%2C%20retweetCommunity%2C%20" + \
-            "&q.op=OR&q=" + term_q + \
-            (f"%20AND%20{interactionCommunity}:(" + "%20OR%20".join(communitiesList) + ")" if communitiesList != None and len(communitiesList)>0 and type(communitiesList) == list and interactionCommunity != None and interactionCommunity in ["retweetCommunity","replyCommunity"] else "") + \
-            "&rows=" + str(int(1.1*rows)) + "&indent=true"
+        q, filter_queries = self.get_query_components(keyword)
+        if communitiesList != None and len(communitiesList)>0 and type(communitiesList) == list and interactionCommunity != None and interactionCommunity in ["retweetCommunity","replyCommunity"]:
+            filter_queries.append(self.stringify_filter(communitiesList, interactionCommunity))
+
+        embedding_store = get_embedding_store(solr_core)
+        body = {
+            'query': q,
+            'filter': filter_queries,
+            'limit': rows,
+            'fields': 'id,videoId,fullText,sentiment,replyCommunity,retweetCommunity' + ('' if embedding_store is not None else ',embedding_5d,embedding_2d'),
+            'sort': (f"{interactionCommunity} desc," if interactionCommunity != None else "") + "retweetCount desc,replyCount desc",
+            'params': {'q.op': 'OR'},
+        }
 
-        logger.info(f" THIS IS THE TOPIC MOD QUERY <=-=> \n{facet_url}\n <=-=>")
+        logger.info(f" THIS IS THE TOPIC MOD QUERY <=-=> \n{body}\n <=-=>")
         start = time.time()
-        response = json.loads(urllib.request.urlopen(urllib.request.Request(facet_url)).read().decode('utf-8'))
+        sampling = ApplicationConfig.SOLR_TOPIC_SAMPLING
+        strata_field = None
+        if sampling == 'stratified':
+            strata_field = interactionCommunity if interactionCommunity in ["retweetCommunity", "replyCommunity"] else 'sentiment'
+        report, hits = None, 0
+        if sampling in ['random', 'stratified']:
+            report, hits = self.sample_topic_documents(solr_core, body, strata_field)
+        if report is None:
+            response = self.json_query(solr_core, body)
+            hits = response['response']['numFound']
+            report = list(response['response']['docs'])
+        if embedding_store is not None:
+            self.attach_embeddings(solr_core, report, embedding_store)
 
         end = time.time()
-        if keyword == "*":
-            keyword = "All"
         logger.info(f"time taken: {end - start}")
-        
+        return report, hits
+
+    def attach_embeddings(self, solr_core, docs, embedding_store):
+        """ Adds the embeddings (embedding_5d and embedding_2d, as float32 arrays) of the given documents from the \
+        embedding store of the core. The documents missing from the store (e.g. imported into Solr after the store was \
+        last written) get their embeddings from Solr instead.
+
+        Args:
+            :solr_core: (str) Name of the Solr core.
+            :docs: (list[dict]) The documents, updated in place.
+            :embedding_store: (EmbeddingStore) The embedding store of the core.
+        """
+        found, vectors = embedding_store.gather([doc['id'] for doc in docs])
+        found_docs = [doc for doc, is_found in zip(docs, found) if is_found]
+        for field, matrix in vectors.items():
+            for doc, vector in zip(found_docs, matrix):
+                doc[field] = vector
+        missing = {doc['id']: doc for doc, is_found in zip(docs, found) if not is_found}
+        logger.info(f"Embeddings of {len(found_docs)} documents gathered from the store, {len(missing)} fetched from Solr")
+        missing_ids = list(missing.keys())
+        for i in range(0, len(missing_ids), ApplicationConfig.BATCH_SIZE * 10):
+            batch = missing_ids[i:i + ApplicationConfig.BATCH_SIZE * 10]
+            body = {'query': '*:*', 'filter': [f"{{!terms f=id}}{','.join(batch)}"], 'limit': len(batch),
+                    'fields': ','.join(['id'] + list(EMBEDDING_FIELDS.keys()))}
+            for item in self.json_query(solr_core, body)['response']['docs']:
+                missing[item['id']].update({field: item[field] for field in EMBEDDING_FIELDS if field in item})
+
+    def sample_topic_documents(self, solr_core, body, strata_field=None):
+        """ Draws a seeded random sample of the documents matching a topics request inside Solr, so that only the \
+        sampled documents are transferred. The documents are sorted on the random_<seed> dynamic field (a \
+        RandomSortField of the default configset), which orders them reproducibly for a given seed and index. For a \
+        stratified sample, the sample is split between the values of the strata field (including the documents \
+        without any value) in proportion to their counts.
+
+        Args:
+            :solr_core: (str) Name of the Solr core to query from.
+            :body: (dict) The JSON request of the topics query. Its limit is the size of the sample.
+            :strata_field: (str, optional) The field to stratify the sample on (e.g. "sentiment" or "retweetCommunity").
+
+        Returns:
+            :tuple: The sampled documents and the total number of documents found, or (None, hits) if no more \
+                documents than the sample size match the request (in which case they should all be fetched).
+        """
+        size = body['limit']
+        count_body = {'query': body['query'], 'filter': body['filter'], 'limit': 0, 'params': body['params']}
+        if strata_field is not None:
+            count_body['facet'] = {'strata': {'type': 'terms', 'field': strata_field, 'limit': -1, 'missing': True}}
+        response = self.json_query(solr_core, count_body)
         hits = response['response']['numFound']
-        report = list(response['response']['docs'])
+        if hits <= size:
+            return None, hits
+
+        sample_body = dict(body, sort=f"random_{self.random_seed} asc")
+        if strata_field is None:
+            return list(self.json_query(solr_core, sample_body)['response']['docs']), hits
+
+        strata = response.get('facets', {}).get('strata', {})
+        counts = [(f'{strata_field}:"{self.escape_term(b["val"])}"', b['count']) for b in strata.get('buckets', [])]
+        if strata.get('missing', {}).get('count', 0) > 0:
+            counts.append((f"-{strata_field}:[* TO *]", strata['missing']['count']))
+        report = []
+        for stratum_filter, quota in self.allocate_sample(counts, size):
+            if quota > 0:
+                stratum_body = dict(sample_body, filter=body['filter'] + [stratum_filter], limit=quota)
+                report += self.json_query(solr_core, stratum_body)['response']['docs']
+        logger.info(f"Sampled {len(report)} of {hits} documents, stratified on {strata_field}")
         return report, hits
+
+    def allocate_sample(self, counts, size):
+        """ Splits a sample size between strata in proportion to their counts (largest remainder method).
+
+        Args:
+            :counts: (list[tuple]) The strata and their number of documents.
+            :size: (int) The size of the sample.
+
+        Returns:
+            :list[tuple]: The strata and the number of documents to sample from each of them.
+        """
+        total = sum(count for _, count in counts)
+        if total == 0:
+            return [(stratum, 0) for stratum, _ in counts]
+        shares = [size * count / total for _, count in counts]
+        quotas = [int(share) for share in shares]
+        for i in sorted(range(len(counts)), key=lambda i: shares[i] - quotas[i], reverse=True)[:size - sum(quotas)]:
+            quotas[i] += 1
+        return [(stratum, min(quota, count)) for (stratum, count), quota in zip(counts, quotas)]
     
     def get_network_of_users(self, solr_core, keyword, interaction):
         """A function that returns the network of users based on the interaction (retweet or reply) and the keyword.
 
         Args:
             :solr_core: (str) Solr core to be used.
-            :keyword: (str) the search term.
+            :keyword: (dict or str) the query, as built by @solr_query_builder.
             :interaction: (str) the network interaction (either retweet or reply).
 
         Returns:
@@ -691,28 +1009,16 @@ class SolrClass:
         """
         # retweet ( retweetTimes ), reply ( repliesTimes )?
         interaction_maps = {'retweet': 'retweetNetworkNodes', 'reply': 'replyNetworkNodes'}
-        random.seed(self.random_seed)
-        random_number = random.randint(0,9999)
-
-        if keyword == None:
-            keyword = "*"
-        elif keyword.strip() == "" or keyword.strip() == "()":
-            keyword = "*"
-
-        try:
-            term_q = json.dumps(keyword)
-            term_q = f'{str(term_q if term_q.isascii() else urllib.parse.quote(term_q))}'.replace("\"", "")
-            facet_url = f'{str(self.solrs[solr_core])}select?random_{random_number}&sort=retweetCount%20desc&fl=userScreenName%2C%20usersDescription%2C%20{str(interaction_maps[interaction])}&rows={rowsLimit}&indent=true&q.op=OR&q={str(interaction_maps[interaction])}:*%20AND%20{term_q}'
-            response = json.loads(urllib.request.urlopen(urllib.request.Request(facet_url)).read().decode('utf-8'))
-
-
-
-        except Exception as exp:
-            logger.warning(f"Error: {exp}")
-            facet_url = f'{str(self.solrs[solr_core])}select?random_{random_number}&sort=retweetCount%20desc&fl=userScreenName%2C%20usersDescription%2C%20{str(interaction_maps[interaction])}&rows={rowsLimit}&indent=true&q.op=OR&q={str(interaction_maps[interaction])}:*%20AND%20({quote(keyword)}){str(self.date_range)}{self.language_filter}{self.sentiment_filter}{self.country_filter}'
-            response = json.loads(urllib.request.urlopen(urllib.request.Request(facet_url)).read().decode('utf-8'))
-        
-        keyword = "All" if keyword == "*" else keyword
+        q, filter_queries = self.get_query_components(keyword)
+        body = {
+            'query': q,
+            'filter': filter_queries + [f"{interaction_maps[interaction]}:*"],
+            'limit': rowsLimit,
+            'fields': f"userScreenName,usersDescription,{interaction_maps[interaction]}",
+            'sort': 'retweetCount desc',
+            'params': {'q.op': 'OR'},
+        }
+        response = self.json_query(solr_core, body)
 
         logger.info(f"len(response['response']['docs']) : {len(response['response']['docs'])}")
         if len(response['response']['docs']) > 0:
@@ -767,7 +1073,7 @@ class SolrClass:
 
 
         try:
-            response = json.loads(urllib.request.urlopen(urllib.request.Request(facet_url)).read().decode('utf-8'))
+            response = self.solr_pool.get_json(facet_url)
         except Exception as exp:
             response = {"msg" : f"Error: {exp}"}
         finally:
@@ -778,24 +1084,58 @@ class SolrClass:
         It is used by the interface backend to get the network stats.
         Args:
             :solr_core: (str) the name of the solr core to be used to search data from.
-            :keyword: (str)
+            :keyword: (dict or str) the query, as built by @solr_query_builder.
             :interaction: (str) the interaction name, either retweet or reply, to be mapped with the corresponding field in Solr.
 
         Returns:
             :dict: dict of data that holds both sentiments and communities_traffic.
         """
-        random.seed(self.random_seed)
-        random_number = random.randint(0,9999)
-        
-        if keyword == None:
-            keyword = "*"
-        elif keyword.strip() == "" or keyword.strip() == "()":
-            keyword = "*"
-        
+        q, filter_queries = self.get_query_components(keyword)
+        try:
+            body = {'query': q, 'filter': filter_queries, 'limit': 0, 'facet': self.get_network_stats_facet(interaction, limit)}
+            facets = self.json_query(solr_core, body)['facets']
+        except Exception as exp:
+            logger.warning(f"Error: {exp}")
+            facets = None
+        return self.parse_network_stats(facets)
+
+    def get_networks_stats(self, solr_core, query, interaction='retweet', limit=queryLimit):
+        """A function that retrieves the network stats of all the keywords of a query. The stats of all the keywords are \
+        computed by a single Solr request when possible (see @use_combined_facets), and by @get_network_stats otherwise.
+
+        Args:
+            :solr_core: (str) the name of the solr core to be used to search data from.
+            :query: (dict) the query, as built by @solr_query_builder.
+            :interaction: (str) the interaction name, either retweet or reply.
+            :limit: (int, optional) maximum number of communities and accounts.
+
+        Returns:
+            :dict: the network stats (as returned by @get_network_stats) per keyword.
+        """
+        facet = self.get_network_stats_facet(interaction, limit)
+        if not self.use_combined_facets(query, facet):
+            return {k: self.get_network_stats(solr_core, query[k], interaction=interaction, limit=limit) for k in query}
+        try:
+            facets, _ = self.combined_facet_query(solr_core, query, facet)
+        except Exception as exp:
+            logger.warning(f"Error: {exp}")
+            facets = {k: None for k in query}
+        return {k: self.parse_network_stats(facets[k]) for k in query}
+
+    def get_network_stats_facet(self, interaction, limit):
+        """An auxiliary function that creates the JSON facet of the network stats.
+
+        Args:
+            :interaction: (str) the interaction name, either retweet or reply.
+            :limit: (int) maximum number of communities and accounts.
+
+        Returns:
+            :dict: the JSON facet.
+        """
         interactionCommunity = self.solr_communities[interaction]['interactionCommunity']
         interactionCount = self.solr_communities[interaction]['interactionCount']
         
-        func_ = "%27sum(" + interactionCount + ")%27"
+        func_ = "sum(" + interactionCount + ")"
         stats_json = {
             'limit':limit,
             'type':'terms',
@@ -807,7 +1147,7 @@ class SolrClass:
                     'func':func_
                 }, 'nb_accounts': {
                     'type':'func',
-                    'func':'%27countvals(userScreenName)%27'
+                    'func':'countvals(userScreenName)'
                 },'most_ret_accounts': {
                     'limit':limit,
                     'type':'terms',
@@ -837,22 +1177,20 @@ class SolrClass:
             }
         }
         
-        try:
-            try:
-                term_q = json.dumps(keyword)
-                term_q = f'{str(term_q if term_q.isascii() else urllib.parse.quote(term_q)).replace("%22", "").replace(" ", "%20")}'.replace("\"", "")
-                query = term_q + self.language_filter + self.sentiment_filter + self.date_range + self.country_filter
-                facet_url = str(self.solrs[solr_core]) + "select?json={query:'" + str(query) + "',limit:" + str(0) + ",facet:{stats:" + json.dumps(stats_json).replace('"', '').replace(' ', '') + ",communities_traffic:" + json.dumps(communities_traffic_json).replace('"', '').replace(' ', '') + "}}"
+        return {'stats': stats_json, 'communities_traffic': communities_traffic_json}
 
-                #logger.info( f"<11>{facet_url}<11>")
-                response = json.loads(urllib.request.urlopen(urllib.request.Request(facet_url)).read().decode('utf-8'))
-            except Exception as exp:
-                query = str(quote(keyword)) + self.language_filter + self.sentiment_filter + self.date_range + self.country_filter
-                facet_url = str(self.solrs[solr_core]) + "select?json={query:'" + str(query) + "',limit:" + str(rowsLimit) + ",facet:{stats:" + json.dumps(stats_json).replace('"', '').replace(' ', '') + ",communities_traffic:" + json.dumps(communities_traffic_json).replace('"', '').replace(' ', '') + "}}"
-                logger.info( f"<22>{facet_url}<22>")
-                response = json.loads(urllib.request.urlopen(urllib.request.Request(facet_url)).read().decode('utf-8'))
-            stats_facet = response['facets']['stats']['buckets'] if 'buckets' in response['facets']['stats'] else None if 'stats' in response['facets'] else [] if 'facets' in response else []
-            communities_traffic_facet = response['facets']['communities_traffic']['buckets'] if 'buckets' in response['facets']['communities_traffic'] else None  if 'communities_traffic' in response['facets'] else [] if 'facets' in response else []
+    def parse_network_stats(self, facets):
+        """An auxiliary function that turns the facets of the network stats into the stats returned to the interface.
+
+        Args:
+            :facets: (dict) the facets returned by Solr, None if the request failed.
+
+        Returns:
+            :dict: dict of data that holds both sentiments and communities_traffic.
+        """
+        try:
+            stats_facet = facets['stats']['buckets'] if 'buckets' in facets['stats'] else None
+            communities_traffic_facet = facets['communities_traffic']['buckets'] if 'buckets' in facets['communities_traffic'] else None
         except Exception as exp:
             logger.warning(f"Error: {exp}")
             stats_facet = None
@@ -880,20 +1218,14 @@ class SolrClass:
         """A function that retrieves the map information for a given interaction (retweet or reply).
         Args:
             :solr_core: (str) the name of the solr core to be used to search data from.
-            :keyword: (str)
+            :keyword: (dict or str) the query, as built by @solr_query_builder.
             :interaction: (str) the interaction name, either retweet or reply, to be mapped with the corresponding field in Solr.
 
         Returns:
             :dict: dict of data that holds the geolocation information per community
         """
         interaction_maps = {'retweet': 'retweetCommunity', 'reply': 'replyCommunity'}
-        random.seed(self.random_seed)
-        random_number = random.randint(0,9999)
-
-        if keyword == None:
-            keyword = "*"
-        elif keyword.strip() == "" or keyword.strip() == "()":
-            keyword = "*"
+        q, filter_queries = self.get_query_components(keyword)
 
         comm = interaction_maps[interaction]
 
@@ -901,6 +1233,8 @@ class SolrClass:
         logger.info(communities)
 
         communities_filter = self.stringify_filter(communities, comm)
+        if communities_filter != "":
+            filter_queries.append(communities_filter)
 
         stats_json = {
             'type':'terms',
@@ -921,21 +1255,10 @@ class SolrClass:
                 }
             }
         }
-        try:
-            term_q = json.dumps(keyword)
-            term_q = f'{str(term_q if term_q.isascii() else urllib.parse.quote(term_q)).replace("%22", "").replace(" ", "%20")}'.replace("\"", "")
-            query = term_q + self.language_filter + self.sentiment_filter + self.date_range + self.country_filter + communities_filter
-            facet_url = str(self.solrs[solr_core]) + "select?json={query:'" + str(query) + "',limit:" + str(0) + ",facet:{stats:" + json.dumps(stats_json).replace('"', '').replace(' ', '') + "}}"
+        body = {'query': q, 'filter': filter_queries, 'limit': 0,
+                'facet': {'stats': stats_json}}
+        response = self.json_query(solr_core, body)
 
-            #logger.info( f"<11>{facet_url}<11>")
-            response = json.loads(urllib.request.urlopen(urllib.request.Request(facet_url)).read().decode('utf-8'))
-        except Exception as exp:
-            query = str(quote(keyword)) + self.language_filter + self.sentiment_filter + self.date_range + self.country_filter + communities_filter
-            facet_url = str(self.solrs[solr_core]) + "select?json={query:'" + str(query) + "',limit:" + str(rowsLimit) + ",facet:{stats:" + json.dumps(stats_json).replace('"', '').replace(' ', '') + "}}"
-            logger.info( f"<22>{facet_url}<22>")
-            response = json.loads(urllib.request.urlopen(urllib.request.Request(facet_url)).read().decode('utf-8'))
-        
-        
         stats_facet = response['facets']['stats']['buckets'] if 'facets' in response and 'stats' in response['facets'] and 'buckets' in response['facets']['stats']  else []
 
         results = {
@@ -989,40 +1312,84 @@ class SolrClass:
             logger.warning(exp)
             return ""
 
-    def get_no_sentiment_items(self, solr_core, queryString = None):
-        """ A function to count the number of datapoints in the Solr that do not have a sentiment label. This is used \
-        to identify the data that still needs to be preprocessed.
+    def iter_documents(self, solr_core, q="*:*", fl="id", rows=20000, cursor_mark="*", sort="id asc", fq=None):
+        """ A generator that streams the documents matching a query from a Solr core, one batch at a time, using \
+        Solr's cursorMark deep paging. Unlike start/rows paging, every page costs the same no matter how deep it is, \
+        and documents updated while iterating (e.g. once they are processed) are neither skipped nor returned twice.
 
         Args:
             :solr_core: (str) the Solr core to search data from.
-            :queryString: (str) Solr query used to exclude data to take into account from Solr core
+            :q: (str, optional) the Solr query. Defaults to "*:*".
+            :fl: (str, optional) comma-separated list of fields to return. Defaults to "id".
+            :rows: (int, optional) number of documents per batch. Defaults to 20000.
+            :cursor_mark: (str, optional) the cursor mark to start from, as yielded by a previous run. Defaults to "*" \
+                (i.e. from the beginning).
+            :sort: (str, optional) the sort, which must end on the unique key "id". Defaults to "id asc".
+            :fq: (str or list(str), optional) filter queries.
+
+        Yields:
+            :tuple(list(dict), int, str): A batch of documents, the total number of hits, and the cursor mark to resume \
+                from once this batch has been processed.
+        """
+        if solr_core not in self.solrs:
+            logger.warning("Selected core is not registered in the system!")
+            return
+        solr = self.solr_pool.get_solr(self.solrs[solr_core], timeout=120)
+        params = {'fl': fl, 'rows': rows, 'sort': sort}
+        if fq:
+            params['fq'] = fq
+        while True:
+            results = solr.search(q=q, cursorMark=cursor_mark, **params)
+            next_cursor_mark = results.nextCursorMark
+            if len(results.docs) > 0:
+                yield list(results.docs), results.hits, next_cursor_mark
+            if next_cursor_mark is None or next_cursor_mark == cursor_mark:
+                break
+            cursor_mark = next_cursor_mark
+
+    def get_dates_range_filter(self, solr):
+        """ An auxiliary function that returns the createdAt range covering all the data of a core, as used to limit \
+        the pre-processing queries.
+
+        Args:
+            :solr: (pysolr.Solr) the solr object used to search data from.
 
         Returns:
-            :tuple(list(dict), int): A tuple containing the list of results and their count.
+            :str: The range query, or "" if the dates could not be retrieved.
+        """
+        start_time = self.get_date(solr, query="*:*")
+        end_time = self.get_date(solr, query="*:*", reverse=True)
+        logger.info(f"start_time: {start_time}")
+        if start_time != "" and end_time != "":
+            return f'createdAt:[{str(start_time)} TO {str(end_time)}]'
+        return ""
+
+    def iter_no_sentiment_items(self, solr_core, queryString=None, fl='id,fullText,language,languagePlatform', rows=20000, cursor_mark="*"):
+        """ A generator over the datapoints in Solr that do not have a sentiment label. This is used to stream the data \
+        that still needs to be preprocessed.
+
+        Args:
+            :solr_core: (str) the Solr core to search data from.
+            :queryString: (str) Solr query used to exclude data to take into account from Solr core
+            :fl: (str, optional) comma-separated list of fields to return.
+            :rows: (int, optional) number of documents per batch.
+            :cursor_mark: (str, optional) the cursor mark to resume from. Defaults to "*".
+
+        Yields:
+            :tuple(list(dict), int, str): A batch of documents, the total number of hits, and the next cursor mark.
         """
-        start = 0
-        rows = 20000
         if solr_core not in self.solrs:
             logger.warning("Selected core is not registered in the system!")
-            return [], 0
-        url = self.solrs[solr_core]
-        solr = pysolr.Solr(url, timeout=120)
-        start_time = self.get_date (solr, query="*:*")
+            return
         q = f"NOT sentiment_s:{queryString}" if queryString else "NOT sentiment_s:Done"
-        end_time = self.get_date (solr, query="*:*", reverse=True)
-
+        dates_range = self.get_dates_range_filter(self.solr_pool.get_solr(self.solrs[solr_core], timeout=120))
+        if dates_range != "":
+            q = f'{q} AND {dates_range}'
         logger.info('Get tweets with no processed sentiments from Solr ...')
-        if start_time != "" and end_time != "":
-            q = f'{q} AND createdAt:[{str(start_time)} TO {str(end_time)}]'
-        
-        logger.info(f"start_time: {start_time}")
-        result = solr.search(q=q, **{'fl':'id, fullText, language, languagePlatform','start':start , 'rows':rows})
-        max_row = result.hits
-        logger.info(f'Number of hits : {max_row}')
-        return list(result.docs), max_row
+        yield from self.iter_documents(solr_core, q=q, fl=fl, rows=rows, cursor_mark=cursor_mark)
 
-    def get_no_location_items(self, solr_core, queryString=None):
-        """ A function to count the number of datapoints in the Solr that do not have a location label. This is used \
+    def get_no_sentiment_items(self, solr_core, queryString = None):
+        """ A function to count the number of datapoints in the Solr that do not have a sentiment label. This is used \
         to identify the data that still needs to be preprocessed.
 
         Args:
@@ -1030,45 +1397,67 @@ class SolrClass:
             :queryString: (str) Solr query used to exclude data to take into account from Solr core
 
         Returns:
-            :tuple(list(dict), int): A tuple containing the list of results and their count.
+            :tuple(list(dict), int): A tuple containing the first batch of results and their count.
+        """
+        for docs, max_row, _ in self.iter_no_sentiment_items(solr_core, queryString=queryString):
+            logger.info(f'Number of hits : {max_row}')
+            return docs, max_row
+        return [], 0
+
+    def iter_no_location_items(self, solr_core, queryString=None, fl='id,placeCountry,placeFullName,userLocationOriginal', rows=20000, cursor_mark="*"):
+        """ A generator over the datapoints in Solr that do not have a location label. This is used to stream the data \
+        that still needs to be preprocessed.
+
+        Args:
+            :solr_core: (str) the Solr core to search data from.
+            :queryString: (str) Solr query used to exclude data to take into account from Solr core
+            :fl: (str, optional) comma-separated list of fields to return.
+            :rows: (int, optional) number of documents per batch.
+            :cursor_mark: (str, optional) the cursor mark to resume from. Defaults to "*".
+
+        Yields:
+            :tuple(list(dict), int, str): A batch of documents, the total number of hits, and the next cursor mark.
         """
-        start = 0
-        rows = 20000
         if solr_core not in self.solrs:
             logger.warning("Selected core is not registered in the system!")
-            return [], 0
-        url = self.solrs[solr_core]
-        solr = pysolr.Solr(url, timeout=120)
-        start_time = self.get_date (solr)
+            return
         q = f"NOT location_s:{queryString}" if queryString else "NOT (locationGps:* AND userLocation:*)"
+        dates_range = self.get_dates_range_filter(self.solr_pool.get_solr(self.solrs[solr_core], timeout=120))
+        if dates_range != "":
+            q = f'{q} AND {dates_range}'
+        logger.info('Getting documents with no processed location from Solr ...')
+        yield from self.iter_documents(solr_core, q=q, fl=fl, rows=rows, cursor_mark=cursor_mark)
 
-        end_time = self.get_date (solr, reverse=True)
+    def get_no_location_items(self, solr_core, queryString=None):
+        """ A function to count the number of datapoints in the Solr that do not have a location label. This is used \
+        to identify the data that still needs to be preprocessed.
 
-        logger.info('Getting documents with no processed location from Solr ...')
-        if start_time != "" and end_time != "":
-            q = f'{q} AND createdAt:[{str(start_time)} TO {str(end_time)}]'
-        result = solr.search(q=q, **{'fl':'id, placeCountry, placeFullName, userLocationOriginal','start':start , 'rows':rows})
-        max_row = result.hits
-        logger.info(f'Number of hits : {max_row}')
-        return list(result.docs), max_row
+        Args:
+            :solr_core: (str) the Solr core to search data from.
+            :queryString: (str) Solr query used to exclude data to take into account from Solr core
+
+        Returns:
+            :tuple(list(dict), int): A tuple containing the first batch of results and their count.
+        """
+        for docs, max_row, _ in self.iter_no_location_items(solr_core, queryString=queryString):
+            logger.info(f'Number of hits : {max_row}')
+            return docs, max_row
+        return [], 0
         
-    def get_network_interaction(self, solr_core, interaction='retweet'):
+    def get_network_interaction(self, solr_core, interaction='retweet', rows=20000):
         """ A function to extract the edges information from Solr (i.e. retweets between individual accounts).
 
         Args:
             :solr_core: (str) the Solr core to search data from.
             :interaction: (str) the type network to get the data from (either "retweet" or "reply").
+            :rows: (int, optional) number of documents fetched per batch.
 
         Returns:
             :tuple(list(dict), int): A tuple containing the list of results and their count.
         """
-        start = 0
-        rows = 20000
         if solr_core not in self.solrs:
             logger.warning("Selected core is not registered in the system!")
             return {}, 0
-        url = self.solrs[solr_core]
-        solr = pysolr.Solr(url, timeout=120)
         if interaction == 'reply':
             q = 'repliesTimes:*'
             fl_ = 'id,userScreenName,repliesTimes'
@@ -1078,13 +1467,11 @@ class SolrClass:
             fl_ = 'id,userScreenName,retweeters,retweetTimes'
         interaction_maps = {'retweet': 'retweetTimes', 'reply': 'repliesTimes'}
 
-        result = solr.search(q=q, **{'start':start , 'rows':0})
-        hits = result.hits
+        hits = 0
         logger.info('Get network interaction from Solr ...')
         users_edges = dict()
-        while start < hits:
-            results = solr.search(q=q, **{'fl':fl_,'start':start , 'rows':rows})
-            for item in results.docs:
+        for docs, hits, _ in self.iter_documents(solr_core, q=q, fl=fl_, rows=rows):
+            for item in docs:
                 if 'userScreenName' in item and item['userScreenName'] not in users_edges:
                     users_edges[item['userScreenName']] = dict()
 
@@ -1094,7 +1481,7 @@ class SolrClass:
                         accounts_.append(interactionTime.split(' ')[0])
 
                 if interaction == 'retweet':
-                    accounts_ = set(accounts_ + item['retweeters'])
+                    accounts_ = set(accounts_ + item.get('retweeters', []))
                 else:
                     accounts_ = set(accounts_)
                 for account_ in accounts_:
@@ -1104,46 +1491,213 @@ class SolrClass:
                         else:
                             users_edges[item['userScreenName']][account_] += 1
 
-            start+= rows
-
         logger.info(f"Number of hits : {hits}")
         return users_edges, hits
 
-    def get_text_data(self, solr_core, considerAll=False):
-        """ A function to extracts text information from a given Solr core.
+    def get_fields_without_docvalues(self, solr_core, fields):
+        """ A function that checks, through the Schema API, which of the given fields do not have docValues enabled (and thus \
+        cannot be streamed through the /export handler).
 
         Args:
-            :solr_core: (str) the Solr core to search data from.
-            :considerAll: (bool) Whether or not to return data for which 5D and 2D embeddings already exist in Solr (i.e. \
-                data that already has been pre-processed in the past)
+            :solr_core: (str) the Solr core to check.
+            :fields: (list(str)) the names of the fields.
 
         Returns:
-            :tuple(list(str), int): A tuple containing the list of results and their count.
+            :list(str): The fields without docValues. Fields that cannot be checked are reported as missing docValues.
+        """
+        missing = []
+        for field in fields:
+            try:
+                response = self.solr_pool.get_json(f"{self.solrs[solr_core]}schema/fields/{field}?showDefaults=true&wt=json", timeout=10)
+                if not response['field'].get('docValues', False):
+                    missing.append(field)
+            except Exception as exp:
+                logger.warning(f"Error checking docValues of {field}: {exp}")
+                missing.append(field)
+        return missing
+
+    def iter_export_documents(self, solr_core, q, fl, sort='id asc', chunk_size=1 << 16):
+        """ A generator over the documents streamed by Solr's /export handler. The response is parsed incrementally, so \
+        only the document being decoded is held in memory. All the fields in fl and sort must have docValues.
+
+        Args:
+            :solr_core: (str) the Solr core to export data from.
+            :q: (str) the Solr query.
+            :fl: (str) comma-separated list of fields to return.
+            :sort: (str, optional) the sort of the exported documents. Defaults to "id asc".
+            :chunk_size: (int, optional) number of bytes read from the response at a time.
+
+        Yields:
+            :tuple(dict, int): A document and the total number of documents being exported.
         """
-        start = 0
+        response = self.solr_pool.request('GET', f"{self.solrs[solr_core]}export", params={'q': q, 'fl': fl, 'sort': sort, 'wt': 'json'}, stream=True)
+        decoder = json.JSONDecoder()
+        utf8_decoder = codecs.getincrementaldecoder('utf-8')()
+        whitespace = re.compile(r'[\s,]*')
+        buffer = ''
+        position = 0
+        hits = None
+        finished = False
+        try:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                buffer = buffer[position:] + utf8_decoder.decode(chunk)
+                position = 0
+                if hits is None:
+                    header = re.search(r'"numFound"\s*:\s*(\d+).*?"docs"\s*:\s*\[', buffer, re.S)
+                    if header is None:
+                        continue
+                    hits = int(header.group(1))
+                    position = header.end()
+                while True:
+                    position = whitespace.match(buffer, position).end()
+                    if position >= len(buffer):
+                        break
+                    if buffer[position] == ']':
+                        finished = True
+                        break
+                    try:
+                        doc, position = decoder.raw_decode(buffer, position)
+                    except ValueError:
+                        break
+                    if 'EXCEPTION' in doc:
+                        raise Exception(f"Solr export failed: {doc['EXCEPTION']}")
+                    yield doc, hits
+                if finished:
+                    break
+        finally:
+            response.close()
+        if not finished:
+            raise Exception("Solr export ended before the end of the documents list.")
+
+    def export_network_interaction(self, solr_core, output_prefix, interaction='retweet', partitions=16, buffer_size=65536):
+        """ A function that streams the edges information (i.e. retweets or replies between individual accounts) through Solr's \
+        /export handler and writes them to a compact on-disk edge list, so that cores with tens of millions of interactions \
+        are processed in bounded memory. Accounts are interned: each account name is written once to the nodes file (its \
+        line number being its id), and every edge is written as a pair of uint32 (target id, source id) to one of the \
+        edge files, partitioned on the target id. The pairs are not aggregated: the weight of an edge is its number of pairs.
 
-        rows = 20000
+        Args:
+            :solr_core: (str) the Solr core to export data from.
+            :output_prefix: (str) the prefix of the output files.
+            :interaction: (str) the type network to get the data from (either "retweet" or "reply").
+            :partitions: (int, optional) number of edge files.
+            :buffer_size: (int, optional) number of pairs buffered per edge file before writing it to disk.
+
+        Returns:
+            :dict: The paths of the nodes file and the edge files, the number of documents, nodes and edges, or None if the \
+                fields cannot be exported (i.e. they do not have docValues).
+        """
         if solr_core not in self.solrs:
             logger.warning("Selected core is not registered in the system!")
-            return [], 0
-        url = self.solrs[solr_core]
-        solr = pysolr.Solr(url, timeout=120)
+            return None
+        if interaction == 'reply':
+            q = 'repliesTimes:*'
+            fields = ['id', 'userScreenName', 'repliesTimes']
+        else:
+            interaction = 'retweet'
+            q = 'retweeters:* OR retweetTimes:*'
+            fields = ['id', 'userScreenName', 'retweeters', 'retweetTimes']
+        missing = self.get_fields_without_docvalues(solr_core, fields)
+        if len(missing) > 0:
+            logger.warning(f"The fields {missing} of the core {solr_core} do not have docValues, and cannot be exported.")
+            return None
+        interaction_maps = {'retweet': 'retweetTimes', 'reply': 'repliesTimes'}
+
+        nodes_file = f"{output_prefix}.nodes"
+        edge_files = [f"{output_prefix}.edges.{i}" for i in range(partitions)]
+        node_ids = dict()
+        buffers = [array('I') for _ in range(partitions)]
+        hits, nb_edges = 0, 0
+        logger.info('Export network interaction from Solr ...')
+        outputs = [open(edge_file, 'wb') for edge_file in edge_files]
+        try:
+            with open(nodes_file, 'w', encoding='utf-8') as nodes_out:
+                def intern(account):
+                    if account not in node_ids:
+                        node_ids[account] = len(node_ids)
+                        nodes_out.write(f"{account}\n")
+                    return node_ids[account]
+
+                for item, hits in self.iter_export_documents(solr_core, q=q, fl=','.join(fields)):
+                    if 'userScreenName' not in item:
+                        continue
+                    target = intern(item['userScreenName'])
+                    accounts_ = set(interactionTime.split(' ')[0] for interactionTime in item.get(interaction_maps[interaction], []))
+                    if interaction == 'retweet':
+                        accounts_.update(item.get('retweeters', []))
+                    partition = target % partitions
+                    for account_ in accounts_:
+                        buffers[partition].append(target)
+                        buffers[partition].append(intern(account_))
+                    nb_edges += len(accounts_)
+                    if len(buffers[partition]) >= 2 * buffer_size:
+                        buffers[partition].tofile(outputs[partition])
+                        buffers[partition] = array('I')
+            for partition in range(partitions):
+                buffers[partition].tofile(outputs[partition])
+        finally:
+            for output in outputs:
+                output.close()
+        logger.info(f"Number of hits : {hits}, nodes: {len(node_ids)}, edges: {nb_edges}")
+        return {'nodes_file': nodes_file, 'edge_files': edge_files, 'hits': hits, 'nodes': len(node_ids), 'edges': nb_edges}
+
+    def iter_text_data(self, solr_core, considerAll=False, fl='id,fullText', rows=20000, cursor_mark="*"):
+        """ A generator over the text information of a given Solr core.
+
+        Args:
+            :solr_core: (str) the Solr core to search data from.
+            :considerAll: (bool) Whether or not to return data for which 5D and 2D embeddings already exist in Solr (i.e. \
+                data that already has been pre-processed in the past)
+            :fl: (str, optional) comma-separated list of fields to return. Defaults to "id,fullText".
+            :rows: (int, optional) number of documents per batch.
+            :cursor_mark: (str, optional) the cursor mark to resume from. Defaults to "*".
+
+        Yields:
+            :tuple(list(dict), int, str): A batch of documents, the total number of hits, and the next cursor mark.
+        """
         q = '*:*' if considerAll else 'NOT embedding_2d:* OR NOT embedding_5d:*'
-        
-        result = solr.search(q='*:*', **{'start':start , 'rows':0})
-        hits = result.hits
         logger.info('Get documents from Solr ...')
+        yield from self.iter_documents(solr_core, q=q, fl=fl, rows=rows, cursor_mark=cursor_mark)
+
+    def get_text_data(self, solr_core, considerAll=False):
+        """ A function to extracts text information from a given Solr core. Prefer @iter_text_data for large cores, as \
+        this function holds all the documents in memory.
+
+        Args:
+            :solr_core: (str) the Solr core to search data from.
+            :considerAll: (bool) Whether or not to return data for which 5D and 2D embeddings already exist in Solr (i.e. \
+                data that already has been pre-processed in the past)
+
+        Returns:
+            :tuple(list(str), int): A tuple containing the list of results and their count.
+        """
         documents = []
-        while start < hits:
-            results = solr.search(q='*:*', **{'fl':'id,fullText','start':start , 'rows':rows})
-            #for item in results.docs:
-            documents += list(results.docs)
+        hits = 0
+        for docs, hits, _ in self.iter_text_data(solr_core, considerAll):
+            documents += docs
             logger.info(f"Getting documents from Solr {len(documents)} done out of {hits}")
-            start+= rows
 
         logger.info(f"Number of hits : {hits}")
         return documents, hits
 
+    def iter_network_interactions(self, solr_core, interaction='retweet', interaction_options={'retweet': 'retweetTimes', 'reply': 'repliesTimes'}, rows=20000, cursor_mark="*"):
+        """A generator over the tweets authors and their interactions (retweet or reply), as used by backend processes \
+        to attach the detected communities to the data. Unlike @get_network_interactions, it is not limited to the first \
+        rowsLimit documents.
+
+        Args:
+            solr_core (str): the Solr core to be used.
+            interaction (str): the interaction type as specified in Solr (interaction field).
+            rows (int, optional): number of documents per batch.
+            cursor_mark (str, optional): the cursor mark to resume from. Defaults to "*".
+
+        Yields:
+            tuple(list(dict), int, str): A batch of documents, the total number of hits, and the next cursor mark.
+        """
+        interactionMap = {'reply': 'userScreenName:* AND repliesTimes:*', 'retweet':'userScreenName:* AND (retweetTimes:* OR retweeters:*)' }
+        fl_ = f'id,userScreenName,createdAtDays,usersDescription,{interaction_options[interaction]},retweeters,sentiment'
+        yield from self.iter_documents(solr_core, q=interactionMap[interaction], fl=fl_, rows=rows, cursor_mark=cursor_mark)
+
     def write_location_to_solr(self, documents_list, solr_core, max_row):
         """ updated the location of the tweets in the solr core. The function recieves the tweets list and the solr core name and update the location of the tweets in the solr core. The tweets list includes the id and the location details.
         
@@ -1160,7 +1714,7 @@ class SolrClass:
                 logger.warning("Selected core is not registered in the system!")
                 return False
             url = self.solrs[solr_core]
-            solr = pysolr.Solr(url, timeout=120)
+            solr = self.solr_pool.get_solr(url, timeout=120)
             status = ''
             i = 0
             logger.info(f"write data to solr, {len(documents_list)}")
@@ -1218,7 +1772,7 @@ class SolrClass:
             try:
                 if solr_core in self.solrs:
                     url = self.solrs[solr_core]
-                    solr = pysolr.Solr(url, timeout=300)
+                    solr = self.solr_pool.get_solr(url, timeout=300)
                     distinct_items = ["domains", "emoji", "emojis", "emotion_distribution", "features", "hashtags", "mentions", "retweeters", "retweetTimes", "matchingRule", "media", "processedDescTokens", "processedTokens", "quoteTimes", "quoteTweets", "quoters", "repliesTimes", "repliesTweets", "replyNetworkNodes", "retweetNetworkNodes", "sentiment_distribution", "topic", "urls"]
                     fieldUpdates = {k: 'set' if k not in distinct_items else 'add-distinct' for k in list(videos[0].keys()) if k != 'id'}
                     documents = []
@@ -1264,7 +1818,7 @@ class SolrClass:
             try:
                 if solr_core in self.solrs:
                     url = self.solrs[solr_core]
-                    solr = pysolr.Solr(url, timeout=300)
+                    solr = self.solr_pool.get_solr(url, timeout=300)
                     distinct_items = ["domains", "emoji", "emojis", "emotion_distribution", "features", "hashtags", "mentions", "retweeters", "retweetTimes", "matchingRule", "media", "processedDescTokens", "processedTokens", "quoteTimes", "quoteTweets", "quoters", "repliesTimes", "repliesTweets", "replyNetworkNodes", "retweetNetworkNodes", "sentiment_distribution", "topic", "urls"]
                     fieldUpdates = {k: 'set' if k not in distinct_items else 'add-distinct' for k in list(items[0].keys()) if k != 'id'}
 
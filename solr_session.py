@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+from configs import ApplicationConfig
+import os
+import json
+import gzip
+import time
+import threading
+import pysolr
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from utils import create_logger
+logger = create_logger(f"Solr Session", file=f"solr_class")
+
+"""This file contains the shared HTTP session layer used by SolrClass (and thus by both the Flask API and the backend
+updaters) to talk to Solr. One keep-alive session is kept per core, and the number of concurrent connections toward
+each core is bounded by the configured pool size.
+"""
+
+
+class _SolrRetry(Retry):
+    """ A Retry that retries the connection errors and the unavailable responses of every request, but the read errors \
+    (e.g. read timeouts) only of GET requests: a POST may have been processed by Solr (an update) or be a heavy JSON \
+    facet query, so it is not sent again once it reached the server.
+    """
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if error is not None and method != 'GET' and self._is_read_error(error):
+            return super(_SolrRetry, self.new(read=False)).increment(method, url, response, error, _pool, _stacktrace)
+        return super(_SolrRetry, self).increment(method, url, response, error, _pool, _stacktrace)
+
+
+class _BoundedHTTPAdapter(HTTPAdapter):
+    """ An HTTPAdapter that bounds the number of in-flight requests to the size of its connection pool and records \
+    the time spent waiting for a free slot.
+    """
+    def __init__(self, owner, pool_size, **kwargs):
+        self._owner = owner
+        self._slots = threading.BoundedSemaphore(pool_size)
+        super(_BoundedHTTPAdapter, self).__init__(pool_connections=1, pool_maxsize=pool_size, pool_block=True, **kwargs)
+
+    def send(self, request, **kwargs):
+        wait_start = time.perf_counter()
+        self._slots.acquire()
+        self._owner._record_wait(time.perf_counter() - wait_start)
+        try:
+            return super(_BoundedHTTPAdapter, self).send(request, **kwargs)
+        finally:
+            self._slots.release()
+
+    def connection_counts(self):
+        """ Returns the number of requests sent and connections opened by the underlying urllib3 pools.
+        """
+        nb_requests, nb_connections = 0, 0
+        for key in list(self.poolmanager.pools.keys()):
+            pool = self.poolmanager.pools.get(key)
+            if pool is not None:
+                nb_requests += pool.num_requests
+                nb_connections += pool.num_connections
+        return nb_requests, nb_connections
+
+
+class SolrSessionPool:
+    """ Thread-safe pool of keep-alive HTTP sessions, one per Solr core, with retries and backoff.
+    """
+
+    def __init__(self, pool_size=None, timeout=None, max_retries=None, backoff_factor=None, gzip_requests=None):
+        """ Initialises the pool. Missing values are read from ApplicationConfig.
+
+        Args:
+            :pool_size: (int, optional) Maximum number of concurrent connections per core.
+            :timeout: (int, optional) Default request timeout in seconds.
+            :max_retries: (int, optional) Number of retries on connection errors and 502/503/504 responses, and on read errors of GET requests.
+            :backoff_factor: (float, optional) Backoff factor between retries (0.5 waits 0.5s, 1s, 2s, ...).
+            :gzip_requests: (bool, optional) Whether to gzip the JSON request bodies of at least SOLR_GZIP_MIN_BYTES. \
+                Solr only accepts them if its Jetty GzipHandler inflates requests (jetty.gzip.inflateBufferSize > 0).
+        """
+        self.pool_size = pool_size or ApplicationConfig.SOLR_POOL_SIZE
+        self.timeout = timeout or ApplicationConfig.SOLR_TIMEOUT
+        self.max_retries = max_retries if max_retries is not None else ApplicationConfig.SOLR_MAX_RETRIES
+        self.backoff_factor = backoff_factor if backoff_factor is not None else ApplicationConfig.SOLR_RETRY_BACKOFF
+        self.gzip_requests = gzip_requests if gzip_requests is not None else ApplicationConfig.SOLR_GZIP_REQUESTS
+        self.gzip_min_bytes = ApplicationConfig.SOLR_GZIP_MIN_BYTES
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        """ Drops all sessions and counters. Called at start-up and after a fork (e.g. in gunicorn workers) so that \
+        sockets are never shared between processes.
+        """
+        self._pid = os.getpid()
+        self._sessions = dict()
+        self._adapters = dict()
+        self._solrs = dict()
+        self._pool_acquisitions = 0
+        self._pool_wait_time = 0.0
+        self._json_requests = 0
+        self._request_bytes = 0
+        self._response_bytes = 0
+        self._response_bytes_decoded = 0
+
+    def _record_wait(self, wait_time):
+        with self._lock:
+            self._pool_acquisitions += 1
+            self._pool_wait_time += wait_time
+
+    def _core_key(self, url):
+        """ Returns the core base URL (i.e. ".../solr/<core>/") from any URL pointing at that core.
+        """
+        marker = '/solr/'
+        if marker in url:
+            prefix, rest = url.split(marker, 1)
+            return f"{prefix}{marker}{rest.split('/', 1)[0]}/"
+        return url
+
+    def get_session(self, url):
+        """ Returns the shared session for the core that the given URL points at.
+
+        Args:
+            :url: (str) A Solr core URL, or any URL under it.
+
+        Returns:
+            :requests.Session: The keep-alive session for that core.
+        """
+        key = self._core_key(url)
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if key not in self._sessions:
+                retry = _SolrRetry(total=self.max_retries, connect=self.max_retries, read=self.max_retries,
+                              backoff_factor=self.backoff_factor, status_forcelist=(502, 503, 504),
+                              allowed_methods=frozenset(['GET', 'POST']), raise_on_status=False)
+                adapter = _BoundedHTTPAdapter(self, self.pool_size, max_retries=retry)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[key] = session
+                self._adapters[key] = adapter
+            return self._sessions[key]
+
+    def get_solr(self, url, timeout=None):
+        """ Returns a pysolr.Solr object for the given core that sends its requests through the shared session.
+
+        Args:
+            :url: (str) The Solr core URL.
+            :timeout: (int, optional) Request timeout in seconds. Defaults to the pool timeout.
+
+        Returns:
+            :pysolr.Solr: The Solr object.
+        """
+        timeout = timeout or self.timeout
+        session = self.get_session(url)
+        with self._lock:
+            if (url, timeout) not in self._solrs:
+                self._solrs[(url, timeout)] = pysolr.Solr(url, timeout=timeout, session=session)
+            return self._solrs[(url, timeout)]
+
+    def request(self, method, url, timeout=None, **kwargs):
+        """ Sends a request through the session of the core that the URL points at.
+
+        Args:
+            :method: (str) HTTP method.
+            :url: (str) The request URL.
+            :timeout: (int, optional) Request timeout in seconds. Defaults to the pool timeout.
+
+        Returns:
+            :requests.Response: The response, after raise_for_status has been called on it.
+        """
+        response = self.get_session(url).request(method, url, timeout=timeout or self.timeout, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def get_json(self, url, timeout=None, **kwargs):
+        """ Sends a GET request and returns the decoded JSON body.
+        """
+        return json.loads(self.request('GET', url, timeout=timeout, **kwargs).content.decode('utf-8'))
+
+    def post_json(self, url, body, timeout=None):
+        """ Sends a JSON body (e.g. a JSON Request API query) via POST and returns the decoded JSON response. The body is \
+        gzipped if enabled and large enough, and the response is requested gzipped. The sizes of the request and of the \
+        response (as sent over the wire, and decoded) are logged and added to the pool counters.
+
+        Args:
+            :url: (str) The request URL.
+            :body: (dict) The JSON-serialisable body.
+            :timeout: (int, optional) Request timeout in seconds. Defaults to the pool timeout.
+
+        Returns:
+            :dict: The decoded JSON response.
+        """
+        payload = json.dumps(body).encode('utf-8')
+        headers = {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'}
+        if self.gzip_requests and len(payload) >= self.gzip_min_bytes:
+            payload = gzip.compress(payload, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+        response = self.request('POST', url, timeout=timeout, data=payload, headers=headers)
+        content = response.content
+        try:
+            response_bytes = int(response.raw.tell())
+        except Exception:
+            response_bytes = 0
+        response_bytes = response_bytes or int(response.headers.get('Content-Length', len(content)))
+        with self._lock:
+            self._json_requests += 1
+            self._request_bytes += len(payload)
+            self._response_bytes += response_bytes
+            self._response_bytes_decoded += len(content)
+        logger.info(f"POST {url}: request {len(payload)} bytes{' (gzip)' if 'Content-Encoding' in headers else ''}, response {response_bytes} bytes ({len(content)} decoded)")
+        return json.loads(content.decode('utf-8'))
+
+    def get_stats(self):
+        """ Returns the pool counters.
+
+        Returns:
+            :dict: Number of requests sent, connections opened and reused, and the number of pool acquisitions and the total time \
+                (in seconds) spent waiting for a free connection, overall and per core, as well as the number of JSON requests \
+                and their request and response sizes in bytes.
+        """
+        with self._lock:
+            adapters = dict(self._adapters)
+            stats = {'pool_size': self.pool_size, 'pool_acquisitions': self._pool_acquisitions,
+                     'pool_wait_time': round(self._pool_wait_time, 4), 'cores': dict(),
+                     'json_requests': self._json_requests, 'request_bytes': self._request_bytes,
+                     'response_bytes': self._response_bytes, 'response_bytes_decoded': self._response_bytes_decoded}
+        total_requests, total_connections = 0, 0
+        for key, adapter in adapters.items():
+            nb_requests, nb_connections = adapter.connection_counts()
+            stats['cores'][key] = {'requests': nb_requests, 'connections_opened': nb_connections,
+                                   'connections_reused': max(0, nb_requests - nb_connections)}
+            total_requests += nb_requests
+            total_connections += nb_connections
+        stats['requests'] = total_requests
+        stats['connections_opened'] = total_connections
+        stats['connections_reused'] = max(0, total_requests - total_connections)
+        return stats
+
+
+_solr_session_pool = None
+_solr_session_pool_lock = threading.Lock()
+
+
+def get_solr_session_pool():
+    """ Returns the process-wide SolrSessionPool, creating it on first use.
+
+    Returns:
+        :SolrSessionPool: The shared pool.
+    """
+    global _solr_session_pool
+    if _solr_session_pool is None:
+        with _solr_session_pool_lock:
+            if _solr_session_pool is None:
+                _solr_session_pool = SolrSessionPool()
+    return _solr_session_pool